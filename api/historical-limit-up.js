@@ -36,8 +36,9 @@ module.exports = async function handler(req, res) {
 
     console.log(`🎯 强制使用真实API获取历史涨停数据，日期: ${date}`);
 
-    // 获取指定日期的涨停数据 - 仅从真实API
-    const limitUpData = await getHistoricalLimitUpDataRealOnly(date);
+    // 先查收盘后导出的静态快照（同样来自真实API的返回），没有该日期时再实时调用真实API
+    const snapshotData = await getLimitUpDataFromSnapshot(req, date);
+    const limitUpData = snapshotData || await getHistoricalLimitUpDataRealOnly(date);
     
     if (limitUpData && limitUpData.total_count >= 0) {
       return res.status(200).json({
@@ -45,7 +46,7 @@ module.exports = async function handler(req, res) {
         date: date,
         total_count: limitUpData.total_count,
         data: limitUpData,
-        source: 'REAL_API_ONLY', // 明确标记只用真实API
+        source: snapshotData ? 'STATIC_SNAPSHOT' : 'REAL_API_ONLY', // 明确标记数据来源
         fetchTime: new Date().toISOString(),
         message: limitUpData.total_count === 0 ? '真实API返回空数据' : '真实API返回数据'
       });
@@ -71,6 +72,58 @@ module.exports = async function handler(req, res) {
   }
 };
 
+async function getLimitUpDataFromSnapshot(req, date) {
+  // 静态快照由 开盘啦的接口最新/接口/static_export.py 导出到 public/snapshots，
+  // manifest.json 记录每个日期各视图带内容哈希的文件路径；清单或该日期不存在时返回 null
+  const host = req.headers['x-forwarded-host'] || req.headers.host;
+  if (!host) {
+    return null;
+  }
+  const protocol = req.headers['x-forwarded-proto'] || 'https';
+  const baseUrl = `${protocol}://${host}/snapshots`;
+
+  try {
+    const manifestResponse = await fetch(`${baseUrl}/manifest.json`, { headers: { 'Cache-Control': 'no-cache' } });
+    if (!manifestResponse.ok) {
+      return null;
+    }
+    const manifest = await manifestResponse.json();
+    const entry = manifest && manifest.dates && manifest.dates[date];
+    const file = entry && entry.files && entry.files.limit_up;
+    if (!file) {
+      console.log(`ℹ️ 静态快照中没有 ${date}，改为调用真实API`);
+      return null;
+    }
+
+    // 文件名带内容哈希，可以长期缓存
+    const viewResponse = await fetch(`${baseUrl}/${file.path}`);
+    if (!viewResponse.ok) {
+      return null;
+    }
+    const view = await viewResponse.json();
+    const next5Dates = getNext5TradingDates(date);
+    let index = 0;
+    Object.values(view.categories || {}).forEach((category) => {
+      category.stocks.forEach((stock) => {
+        stock.next_5_days = generateNext5DaysPerformanceReal(String(stock.ts_code), index++);
+        stock.next_5_dates = next5Dates;
+        stock.data_source = 'STATIC_SNAPSHOT';
+      });
+    });
+    console.log(`✅ 静态快照命中 ${date}: ${view.total_count} 只涨停股票`);
+    return {
+      total_count: view.total_count,
+      broken_count: view.broken_count,
+      categories: view.categories || {},
+      date: date,
+      data_source: 'STATIC_SNAPSHOT'
+    };
+  } catch (error) {
+    console.error(`⚠️ 读取静态快照失败 (${date}):`, error.message);
+    return null;
+  }
+}
+
 async function getHistoricalLimitUpDataRealOnly(date) {
   // 检查是否为工作日
   const dateObj = new Date(date + 'T00:00:00.000Z');
@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+全市场盘中异动检测
+功能：对连续的全市场快照（RealRankingInfo_W8）逐个增量更新每只股票的状态数组，计算
+      涨速（最近N秒的涨跌幅变化）、相对分时段基线的放量倍数、距日内最高的回撤、涨停炸板与回封，
+      超过阈值即推送；作为 盘中雷达/严重异动/大幅回撤 的本地补充，阈值和延迟可自行调整。
+      放量基线为每只股票在分钟网格各点的累计成交量，收盘后按指数加权并入并保存到本地存储；
+      盘中启动或重启前的分钟点没有数据，记为NaN，不参与放量计算，也不并入基线
+"""
+
+import logging
+import time
+
+import numpy as np
+
+from intraday_codec import GRID_SIZE, MINUTE_GRID
+from local_store import LocalStore
+from market_snapshot import MarketSnapshot, _code_points, code_numbers, limit_ratios, limit_up_mask
+from trading_calendar import market_time
+
+KINDS = ('speed', 'volume_surge', 'drawdown', 'limit_break', 'limit_reseal')
+
+# 默认阈值：涨速为 speed_window 秒内涨跌幅变化的百分点（取绝对值），放量为倍数，回撤为距最高价的百分点
+DEFAULT_THRESHOLDS = {
+    'speed': 2.0,
+    'volume_surge': 5.0,
+    'drawdown': 5.0,
+}
+
+KIND_LABELS = {
+    'speed': '涨速',
+    'volume_surge': '放量',
+    'drawdown': '大幅回撤',
+    'limit_break': '炸板',
+    'limit_reseal': '回封',
+}
+
+def grid_slot(timestamp):
+    """时间戳（按北京时间）所在的分钟网格下标：开盘前为0，午间休市停在11:30"""
+    stamp = market_time(timestamp)
+    slot = int(np.searchsorted(MINUTE_GRID, stamp.hour * 100 + stamp.minute, side='right')) - 1
+    return min(max(slot, 0), GRID_SIZE - 1)
+
+
+class AnomalyDetector:
+    # 每只股票一个元素的状态数组：名称 -> (dtype, 初始值)
+    _STATE = {
+        'price': (np.float64, np.nan),
+        'prev_close': (np.float64, np.nan),
+        'high': (np.float64, np.nan),
+        'volume': (np.float64, np.nan),
+        'ratio': (np.float64, np.nan),
+        'sealed': (bool, False),
+        'seal_count': (np.int32, 0),
+        'break_count': (np.int32, 0),
+        'seen_today': (bool, False),
+        'baseline_days': (np.int32, 0),
+    }
+
+    def __init__(self, store=None, thresholds=None, speed_window=60, surge_minutes=5,
+                 history=64, cooldown=300, baseline_alpha=0.2, min_baseline_days=3, learn=True):
+        """learn 为 False 时只检测不学习：收盘和换日时不把当日成交量并入放量基线，用于回放录制数据"""
+        self.store = store or LocalStore()
+        self.thresholds = dict(DEFAULT_THRESHOLDS, **(thresholds or {}))
+        self.speed_window = speed_window      # 涨速窗口（秒）
+        self.surge_minutes = surge_minutes    # 放量窗口（分钟）
+        self.cooldown = cooldown              # 同一股票同一类异动的最短推送间隔（秒）
+        self.baseline_alpha = baseline_alpha
+        self.min_baseline_days = min_baseline_days
+        self.learn = learn
+        self.logger = logging.getLogger(__name__)
+        self.subscribers = []
+
+        # 代码整数 -> 行号的查找表，每个快照整体 gather，不逐只查字典
+        self.lookup = np.full(10 ** 6, -1, dtype=np.int32)
+        self.codes = []
+        self.names = []
+        self.capacity = 0
+        for name, (dtype, _) in self._STATE.items():
+            setattr(self, name, np.zeros(0, dtype=dtype))
+        self.last_fired = np.zeros((0, len(KINDS)))
+        self.baseline = np.zeros((0, GRID_SIZE))     # 历史各分钟点的累计成交量（指数加权），没有数据为NaN
+        self.today_volume = np.zeros((0, GRID_SIZE))  # 当日各分钟点的累计成交量，没有数据为NaN
+
+        # 价格环形缓冲：最近 history 个快照的价格和时间戳，用于涨速
+        self.history = history
+        self.price_history = np.full((history, 0), np.nan)
+        self.stamp_history = np.zeros(history)
+        self.position = -1
+
+        self.day = None
+        self.last_slot = -1
+        self.features = {}
+
+    @property
+    def size(self):
+        return len(self.codes)
+
+    def subscribe(self, callback):
+        """订阅异动，回调参数为异动字典"""
+        self.subscribers.append(callback)
+
+    def _grow(self, size):
+        """按需扩大状态数组，新行填初始值"""
+        if size <= self.capacity:
+            return
+        capacity = max(size, self.capacity * 2, 1024)
+        for name, (dtype, fill) in self._STATE.items():
+            grown = np.full(capacity, fill, dtype=dtype)
+            grown[:self.capacity] = getattr(self, name)
+            setattr(self, name, grown)
+        for name, fill in (('last_fired', -np.inf), ('baseline', np.nan), ('today_volume', np.nan)):
+            old = getattr(self, name)
+            grown = np.full((capacity,) + old.shape[1:], fill)
+            grown[:self.capacity] = old
+            setattr(self, name, grown)
+        history = np.full((self.history, capacity), np.nan)
+        history[:, :self.capacity] = self.price_history
+        self.price_history = history
+        self.capacity = capacity
+
+    def _rows(self, codes, names):
+        """快照各行对应的状态行号，第一次出现的代码追加到末尾；非法代码为-1"""
+        numbers = code_numbers(codes)
+        valid = numbers >= 0
+        rows = np.full(len(numbers), -1, dtype=np.int32)
+        rows[valid] = self.lookup[numbers[valid]]
+        new = np.flatnonzero(valid & (rows < 0))
+        if len(new):
+            # 同一快照内重复出现的新代码只追加一次
+            unique_numbers, first = np.unique(numbers[new], return_index=True)
+            start = self.size
+            self._grow(start + len(unique_numbers))
+            self.lookup[unique_numbers] = np.arange(start, start + len(unique_numbers), dtype=np.int32)
+            self.codes.extend(codes[new[first]].tolist())
+            self.names.extend(names[new[first]].tolist() if names is not None else [''] * len(first))
+            rows[new] = self.lookup[numbers[new]]
+        return rows
+
+    def reset_day(self, day):
+        """新交易日开始：清空日内状态，保留放量基线"""
+        for name in ('price', 'high', 'volume', 'ratio'):
+            getattr(self, name)[:] = np.nan
+        for name in ('sealed', 'seal_count', 'break_count', 'seen_today'):
+            getattr(self, name)[:] = 0
+        self.last_fired[:] = -np.inf
+        self.today_volume[:] = np.nan
+        self.price_history[:] = np.nan
+        self.stamp_history[:] = 0.0
+        self.position = -1
+        self.last_slot = -1
+        self.day = day
+
+    def update(self, snapshot):
+        """用一个全市场快照更新状态，返回本次触发的异动列表（同时推送给订阅者）"""
+        timestamp = snapshot.timestamp
+        day = market_time(timestamp).strftime('%Y-%m-%d')
+        if day != self.day:
+            if self.day is not None:
+                self.end_of_day()
+            self.reset_day(day)
+
+        columns = snapshot.columns
+        names = columns.get('name')
+        rows = self._rows(columns['code'], names)
+        keep = rows >= 0
+        if not keep.all():
+            rows = rows[keep]
+            columns = {name: values[keep] for name, values in columns.items()}
+            names = columns.get('name')
+
+        price = columns['price']
+        prev_close = columns['prev_close']
+        change = columns['change_pct']
+        volume = columns['volume']
+
+        # 当日第一次出现的股票按代码和名称确定涨停幅度，新股（名称以N、C开头）不设涨跌幅限制
+        fresh = np.isnan(self.ratio[rows])
+        if fresh.any():
+            ratios = limit_ratios(columns['code'][fresh], names[fresh] if names is not None else None)
+            if names is not None:
+                first = _code_points(names[fresh])[:, 0]
+                ratios[(first == ord('N')) | (first == ord('C'))] = np.inf
+            self.ratio[rows[fresh]] = ratios
+        self.seen_today[rows] = True
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            # 涨速：与 speed_window 秒前的价格相比的涨跌幅变化（百分点）
+            self.position = (self.position + 1) % self.history
+            target = timestamp - self.speed_window
+            stamps = self.stamp_history
+            older = (stamps > 0) & (stamps <= target)
+            if older.any():
+                past = int(np.argmax(np.where(older, stamps, -np.inf)))
+            elif (stamps > 0).any():
+                past = int(np.argmin(np.where(stamps > 0, stamps, np.inf)))
+            else:
+                past = -1
+            past_price = self.price_history[past, rows] if past >= 0 else price
+            speed = (price - past_price) / prev_close * 100.0
+            self.price_history[self.position] = self.price_history[self.position - 1]
+            self.price_history[self.position, rows] = price
+            self.stamp_history[self.position] = timestamp
+
+            # 回撤：距日内最高价（接口最高价与已见到的最高价取大）的百分点
+            high = np.fmax(self.high[rows], price)
+            if 'high' in columns:
+                high = np.fmax(high, columns['high'])
+            self.high[rows] = high
+            drawdown = (high - price) / prev_close * 100.0
+
+            # 放量：最近 surge_minutes 分钟成交量相对历史同一时段的倍数；
+            # 窗口起点没有当日数据（启动前的分钟点）时为NaN，不触发
+            slot = grid_slot(timestamp)
+            if slot > self.last_slot >= 0:
+                # 两个快照之间跳过的分钟点沿用上一点的累计量
+                self.today_volume[:, self.last_slot + 1:slot] = self.today_volume[:, self.last_slot:self.last_slot + 1]
+            self.last_slot = max(self.last_slot, slot)
+            self.today_volume[rows, slot] = volume
+            start = max(slot - self.surge_minutes, 0)
+            recent = volume - self.today_volume[rows, start]
+            expected = self.baseline[rows, slot] - self.baseline[rows, start]
+            enough = (self.baseline_days[rows] >= self.min_baseline_days) & (expected > 0)
+            surge = np.where(enough, recent / expected, np.nan)
+
+            # 涨停：炸板为上次封住本次打开，回封为当日炸过板后再次封住；
+            # 与 MarketSnapshot.is_limit_up 一样按现价和按分取整的涨停价比较
+            sealed = limit_up_mask({'price': price, 'prev_close': prev_close, 'change_pct': change}, self.ratio[rows])
+            was_sealed = self.sealed[rows]
+            broke = was_sealed & ~sealed
+            resealed = ~was_sealed & sealed & (self.break_count[rows] > 0)
+            self.break_count[rows] += broke
+            self.seal_count[rows] += sealed & ~was_sealed
+            self.sealed[rows] = sealed
+
+        self.price[rows] = price
+        self.prev_close[rows] = prev_close
+        self.volume[rows] = volume
+
+        self.features = {'row': rows, 'speed': speed, 'volume_surge': surge, 'drawdown': drawdown,
+                         'sealed': sealed, 'break_count': self.break_count[rows]}
+        hits = {
+            'speed': (np.abs(speed) >= self.thresholds['speed'], speed),
+            'volume_surge': (surge >= self.thresholds['volume_surge'], surge),
+            'drawdown': (drawdown >= self.thresholds['drawdown'], drawdown),
+            'limit_break': (broke, self.break_count[rows]),
+            'limit_reseal': (resealed, self.seal_count[rows]),
+        }
+        return self._emit(hits, rows, columns, timestamp)
+
+    def _emit(self, hits, rows, columns, timestamp):
+        """同一股票同一类异动在 cooldown 秒内只推送一次；只为命中的行构造字典"""
+        anomalies = []
+        clock = market_time(timestamp).strftime('%H:%M:%S')
+        for k, kind in enumerate(KINDS):
+            mask, values = hits[kind]
+            index = np.flatnonzero(mask & (timestamp - self.last_fired[rows, k] >= self.cooldown))
+            if not len(index):
+                continue
+            self.last_fired[rows[index], k] = timestamp
+            for i in index.tolist():
+                row = int(rows[i])
+                anomalies.append({
+                    'time': clock,
+                    'kind': kind,
+                    'code': self.codes[row],
+                    'name': str(columns['name'][i]) if 'name' in columns else self.names[row],
+                    'value': float(values[i]),
+                    'price': float(columns['price'][i]),
+                    'change_pct': float(columns['change_pct'][i]),
+                })
+        for anomaly in anomalies:
+            for callback in self.subscribers:
+                try:
+                    callback(anomaly)
+                except Exception as e:
+                    self.logger.warning(f"异动回调失败: {str(e)}")
+        return anomalies
+
+    def end_of_day(self):
+        """把当日各分钟点的累计成交量按指数加权并入基线；只并入当天有数据的分钟点，
+        启动前和最后一个快照之后的分钟点、当天未出现的股票都不更新；learn 为 False 时不更新"""
+        if not self.learn or self.day is None or self.last_slot < 0:
+            return
+        size = self.size
+        today = self.today_volume[:size]
+        baseline = self.baseline[:size]
+        seen = self.seen_today[:size]
+        have = seen[:, None] & ~np.isnan(today)
+        first = have & np.isnan(baseline)
+        blend = have & ~first
+        baseline[first] = today[first]
+        baseline[blend] += self.baseline_alpha * (today[blend] - baseline[blend])
+        self.baseline_days[:size][seen] += 1
+        self.save()
+        self.logger.info(f"{self.day} 放量基线已更新: {int(seen.sum())} 只股票")
+
+    def save(self):
+        """保存放量基线到本地存储"""
+        self.store.save_array('anomaly_volume_baseline', self.baseline[:self.size])
+        self.store.save_array('anomaly_baseline_days', self.baseline_days[:self.size])
+        self.store.save_meta('anomaly_detector', {'codes': self.codes, 'day': self.day})
+
+    def load(self):
+        """从本地存储恢复放量基线，返回是否成功"""
+        meta = self.store.load_meta('anomaly_detector')
+        baseline = self.store.load_array('anomaly_volume_baseline')
+        days = self.store.load_array('anomaly_baseline_days')
+        if meta is None or baseline is None or days is None:
+            return False
+        codes = np.asarray(meta['codes'], dtype='U6')
+        rows = self._rows(codes, None)
+        self.baseline[rows] = baseline
+        self.baseline_days[rows] = days
+        return True
+
+
+def main(argv=None):
+    """主函数：轮询全市场快照并打印异动；加 --replay 录制文件 时用录制数据尽快回放"""
+    import argparse
+
+    from kpl_client import KPLClient
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="全市场盘中异动检测")
+    parser.add_argument('--replay', help="session_replay 录制的日志文件")
+    parser.add_argument('--interval', type=float, default=3.0)
+    args = parser.parse_args(argv)
+
+    # 回放的是已经并入过基线的录制数据，只检测不学习
+    detector = AnomalyDetector(learn=not args.replay)
+    detector.load()
+    detector.subscribe(lambda a: print(f"⚡ {a['time']} {a['code']} {a['name']} {KIND_LABELS[a['kind']]} "
+                                       f"{a['value']:.2f}  现价 {a['price']:.2f} 涨幅 {a['change_pct']:.2f}%"))
+    elapsed = []
+    if args.replay:
+        from session_replay import ReplayClient
+
+        client = ReplayClient(args.replay)
+        while not client.finished():
+            rows = client.fetch_all_pages('RealRankingInfo_W8', index_key='index')
+            snapshot = MarketSnapshot.from_rows(rows, client.now())
+            started = time.perf_counter()
+            detector.update(snapshot)
+            elapsed.append(time.perf_counter() - started)
+    else:
+        client = KPLClient()
+        try:
+            while market_time().strftime('%H%M') <= '1500':
+                started = time.time()
+                try:
+                    snapshot = MarketSnapshot.fetch(client)
+                    tick = time.perf_counter()
+                    detector.update(snapshot)
+                    elapsed.append(time.perf_counter() - tick)
+                except Exception as e:
+                    logging.warning(f"异动检测失败: {str(e)}")
+                time.sleep(max(args.interval - (time.time() - started), 0))
+        except KeyboardInterrupt:
+            pass
+        detector.end_of_day()
+    if elapsed:
+        print(f"\n⏱️ {len(elapsed)} 个快照，平均每个 {np.mean(elapsed) * 1000:.2f} ms，"
+              f"最长 {np.max(elapsed) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
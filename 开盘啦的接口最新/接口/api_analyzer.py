@@ -5,7 +5,6 @@
 功能：解析涨停板数据接口并生成诊断报告
 """
 
-import requests
 import json
 import logging
 import os
@@ -13,10 +12,16 @@ from datetime import datetime
 from urllib.parse import urlparse, parse_qs
 import time
 
+DEFAULT_URL = "https://apphis.longhuvip.com/w1/api/index.php?a=GetDayZhangTing&st=100&apiv=w31&c=HisLimitResumption&StockID=002456&PhoneOSNew=1&UserID=0&DeviceID=00000000-296c-20ad-0000-00003eb74e84&VerSion=5.7.0.12&Token=0&Index=0"
+
 class APIAnalyzer:
-    def __init__(self):
+    def __init__(self, configure_logging=True):
+        """configure_logging=False 时沿用调用方（如 kpl_cli）已配置的日志"""
         self.log_dir = "log"
-        self.setup_logging()
+        if configure_logging:
+            self.setup_logging()
+        else:
+            self.logger = logging.getLogger(__name__)
         
     def setup_logging(self):
         """设置日志系统"""
@@ -78,6 +83,8 @@ class APIAnalyzer:
     
     def send_request(self, url):
         """发送HTTP请求"""
+        import requests
+
         self.logger.info("开始发送HTTP请求")
         
         headers = {
@@ -92,6 +99,9 @@ class APIAnalyzer:
             self.logger.info(f"请求URL: {url}")
             self.logger.info(f"请求头: {json.dumps(headers, ensure_ascii=False, indent=2)}")
             
+            from rate_limiter import default_rate_limiter
+
+            default_rate_limiter().acquire_url(url)
             response = requests.get(url, headers=headers, timeout=30)
             
             self.logger.info(f"响应状态码: {response.status_code}")
@@ -263,12 +273,10 @@ class APIAnalyzer:
             self.logger.error(f"分析过程出现异常: {str(e)}")
             return {'error': str(e), 'success': False}
 
-def main():
+def main(url=None, configure_logging=True):
     """主函数"""
-    url = "https://apphis.longhuvip.com/w1/api/index.php?a=GetDayZhangTing&st=100&apiv=w31&c=HisLimitResumption&StockID=002456&PhoneOSNew=1&UserID=0&DeviceID=00000000-296c-20ad-0000-00003eb74e84&VerSion=5.7.0.12&Token=0&Index=0"
-    
-    analyzer = APIAnalyzer()
-    report = analyzer.run_analysis(url)
+    analyzer = APIAnalyzer(configure_logging)
+    report = analyzer.run_analysis(url or DEFAULT_URL)
     
     print("\n" + "="*80)
     print("API 接口分析结果")
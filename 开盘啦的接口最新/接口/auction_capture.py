@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+集合竞价高频采集
+功能：09:15-09:25 竞价期间按固定节拍翻页拉取全市场排行（RealRankingInfo_W8，RStart=0925 时返回竞价价格），
+      开始前预先建立连接池并用真实请求把连接和工作线程预热好，每个节拍直接写入预先分配的 节拍×股票 数组；
+      间隔默认按每节拍页数、限流速率和预热测得的请求耗时推算，指定的间隔放不下一个节拍时拒绝启动；
+      每页请求最迟在本节拍截止时刻超时，不会拖进下一个节拍；节拍未能在间隔内完成记为超时，
+      错过开始时刻的节拍记为丢弃；竞价结束后拉取自选股的逐笔竞价(GetStockBid)，全部按列保存到本地存储
+"""
+
+import logging
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+
+import numpy as np
+
+from kpl_client import ENDPOINTS, HOSTS, KPLAPIError, extract_rows
+from local_store import LocalStore
+from market_snapshot import STOCK_RANKING_COLUMNS, MarketSnapshot, code_numbers
+from trading_calendar import MARKET_TZ, market_time
+
+ENDPOINT = 'RealRankingInfo_W8'
+
+# 每个节拍保存的数值列
+AUCTION_COLUMNS = ('price', 'change_pct', 'amount', 'volume', 'main_net')
+_DECODE_COLUMNS = {name: STOCK_RANKING_COLUMNS[name] for name in ('code',) + AUCTION_COLUMNS}
+
+MIN_INTERVAL = 1.0  # 推算间隔的下限（秒）
+
+
+def clock_today(hhmmss):
+    """北京时间当天某时刻 '09:15:00' 的时间戳，与运行机器的时区无关"""
+    day = market_time().date().isoformat()
+    return datetime.strptime(f"{day} {hhmmss}", '%Y-%m-%d %H:%M:%S').replace(tzinfo=MARKET_TZ).timestamp()
+
+
+def open_pool(client, workers):
+    """为客户端会话挂载足够大的连接池，每个工作线程一条长连接"""
+    from requests.adapters import HTTPAdapter
+
+    adapter = HTTPAdapter(pool_connections=len(HOSTS), pool_maxsize=workers)
+    client.session.mount('https://', adapter)
+
+
+class AuctionCapture:
+    def __init__(self, client, store=None, interval=None, start='09:15:00', end='09:25:30',
+                 page_size=60, workers=16, capacity=None):
+        """interval 为None时在 prepare 中按限流速率推算"""
+        self.client = client
+        self.store = store or LocalStore()
+        self.interval = interval
+        self.start = start
+        self.end = end
+        self.page_size = page_size
+        self.workers = workers
+        self.capacity = capacity
+        self.logger = logging.getLogger(__name__)
+        self.executor = None
+        self.pages = 0
+        self.latency = 0.0  # 预热测得的单页请求耗时（秒）
+
+        self.lookup = np.full(10 ** 6, -1, dtype=np.int32)
+        self.codes = []
+        self.buffers = {}
+        self.stamps = None
+        self.complete = None
+        self.ticks = 0
+        self.overrun = []   # 未能在间隔内完成的节拍下标
+        self.dropped = []   # 因上一节拍超时而错过开始时刻、未执行的计划时刻
+
+    def fetch_page(self, page, deadline=None):
+        """拉取一页。给定 deadline 时：截止前发不出去的页不再请求，已发出的请求以剩余时间为超时，
+        超时未返回的页不会占着工作线程和限流额度拖进下一个节拍"""
+        params = {'index': page * self.page_size, 'st': self.page_size}
+        if deadline is None:
+            return extract_rows(self.client.fetch_json(ENDPOINT, **params))
+        limiter = self.client.rate_limiter
+        if limiter:
+            wait = limiter.reserve(ENDPOINTS[ENDPOINT]['host'], ENDPOINT)
+            if time.time() + wait >= deadline:
+                raise TimeoutError(f"第 {page} 页在节拍截止前无法发出")
+            if wait > 0:
+                time.sleep(wait)
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            raise TimeoutError(f"第 {page} 页在节拍截止前无法发出")
+        response = self.client.session.get(self.client.build_url(ENDPOINT, **params), timeout=remaining)
+        if response.status_code != 200:
+            raise KPLAPIError(f"{ENDPOINT} 请求失败，状态码: {response.status_code}")
+        return extract_rows(response.json())
+
+    def prepare(self, expected_rows=None):
+        """竞价开始前调用：建立连接池、预热连接和线程，按第一次全量翻页确定股票范围，
+        确定节拍间隔后预分配数组；指定的间隔放不下一个节拍时抛出 ValueError"""
+        if self.client.rate_limiter is None:
+            from rate_limiter import default_rate_limiter
+
+            self.client.rate_limiter = default_rate_limiter()
+        open_pool(self.client, self.workers)
+        self.executor = ThreadPoolExecutor(max_workers=self.workers)
+        rows = self.client.fetch_all_pages(ENDPOINT, index_key='index', st=self.page_size)
+        self.pages = max(math.ceil((expected_rows or len(rows)) / self.page_size), 1)
+        # 每个工作线程各发一个请求，连接和线程在竞价开始前都已建立，同时测得单页耗时
+        futures = [self.executor.submit(self._timed_page, i % self.pages) for i in range(self.workers)]
+        timings = [future.result() for future in futures if future.exception() is None]
+        self.latency = float(np.median(timings)) if timings else 0.0
+
+        needed = self.tick_budget()
+        if self.interval is None:
+            self.interval = max(math.ceil(needed * 2) / 2, MIN_INTERVAL)
+            self.logger.info(f"每个节拍 {self.pages} 页，按限流速率至少 {needed:.1f} 秒，节拍间隔取 {self.interval} 秒")
+        elif needed > self.interval:
+            raise ValueError(f"每个节拍需要 {self.pages} 次请求，限流下至少 {needed:.1f} 秒，"
+                             f"间隔 {self.interval} 秒内无法完成；调大间隔或不指定间隔")
+
+        snapshot = MarketSnapshot.from_rows(rows, columns=_DECODE_COLUMNS)
+        self._add_codes(snapshot.codes)
+        capacity = self.capacity or int(len(self.codes) * 1.05) + 64
+        ticks = int((clock_today(self.end) - clock_today(self.start)) / self.interval) + 2
+        self.buffers = {name: np.full((ticks, capacity), np.nan) for name in AUCTION_COLUMNS}
+        self.stamps = np.zeros(ticks)
+        self.complete = np.zeros(ticks, dtype=bool)
+        self.capacity = capacity
+
+    def _timed_page(self, page):
+        started = time.perf_counter()
+        self.fetch_page(page)
+        return time.perf_counter() - started
+
+    def tick_budget(self):
+        """一个节拍的最短耗时：按最严的限流桶持续发出 pages 次请求的时间，加上一次请求的耗时。
+        节拍之间令牌只能按速率补充，突发容量不能每个节拍都用，所以按 pages / 速率 计"""
+        rate = math.inf
+        limiter = self.client.rate_limiter
+        if limiter:
+            limits = [limiter.host_limits.get(ENDPOINTS[ENDPOINT]['host']), limiter.endpoint_limits.get(ENDPOINT)]
+            rate = min([limit[0] for limit in limits if limit] or [math.inf])
+        return self.pages / rate + self.latency
+
+    def _add_codes(self, codes):
+        numbers = code_numbers(codes)
+        new = np.unique(numbers[(numbers >= 0) & (self.lookup[np.maximum(numbers, 0)] < 0)])
+        if len(new):
+            start = len(self.codes)
+            self.lookup[new] = np.arange(start, start + len(new), dtype=np.int32)
+            self.codes.extend(f"{number:06d}" for number in new.tolist())
+
+    def tick(self, index, deadline):
+        """执行一个节拍：并发拉取所有页并写入第 index 行，返回是否在截止时刻前全部完成"""
+        futures = [self.executor.submit(self.fetch_page, page, deadline) for page in range(self.pages)]
+        done, pending = wait(futures, timeout=max(deadline - time.time(), 0))
+        rows = []
+        for future in done:
+            if future.exception() is None:
+                rows.extend(future.result())
+            else:
+                self.logger.debug(f"竞价页请求失败: {future.exception()}")
+        # 超时未返回的页不再等待，这些股票在本节拍保持NaN；
+        # 已在执行的页会在截止时刻按超时结束，排队中的页直接取消
+        for future in pending:
+            future.cancel()
+
+        snapshot = MarketSnapshot.from_rows(rows, columns=_DECODE_COLUMNS)
+        numbers = code_numbers(snapshot.codes)
+        unknown = (numbers >= 0) & (self.lookup[np.maximum(numbers, 0)] < 0)
+        if unknown.any() and len(self.codes) < self.capacity:
+            self._add_codes(snapshot.codes[unknown][:self.capacity - len(self.codes)])
+        rows_index = self.lookup[np.maximum(numbers, 0)]
+        valid = (numbers >= 0) & (rows_index >= 0) & (rows_index < self.capacity)
+        for name in AUCTION_COLUMNS:
+            self.buffers[name][index, rows_index[valid]] = snapshot.columns[name][valid]
+        self.stamps[index] = snapshot.timestamp
+        complete = not pending and all(future.exception() is None for future in done)
+        self.complete[index] = complete
+        return complete
+
+    def run(self):
+        """按固定节拍采集到结束时刻，节拍时刻为 开始时刻 + k×间隔，不因前一节拍超时而顺延"""
+        begin, finish = clock_today(self.start), clock_today(self.end)
+        if time.time() < begin:
+            time.sleep(begin - time.time())
+        scheduled = begin
+        while scheduled <= finish and self.ticks < len(self.stamps):
+            now = time.time()
+            if now > scheduled + self.interval:
+                # 错过的节拍不补采，直接记为丢弃
+                missed = int((now - scheduled) // self.interval)
+                self.dropped.extend(scheduled + k * self.interval for k in range(missed))
+                scheduled += missed * self.interval
+                continue
+            if now < scheduled:
+                time.sleep(scheduled - now)
+            deadline = scheduled + self.interval
+            if not self.tick(self.ticks, deadline):
+                self.overrun.append(self.ticks)
+                self.logger.warning(f"节拍 {self.ticks} 未在 {self.interval} 秒内完成")
+            self.ticks += 1
+            scheduled = deadline
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        return self.report()
+
+    def report(self):
+        return {
+            'ticks': self.ticks,
+            'on_time': self.ticks - len(self.overrun),
+            'overrun': list(self.overrun),
+            'dropped': len(self.dropped),
+            'stocks': len(self.codes),
+            'interval': self.interval,
+            'pages': self.pages,
+        }
+
+    def capture_bids(self, stock_ids):
+        """竞价结束后拉取自选股的逐笔竞价数据，按股票保存原始返回"""
+        day = market_time().date().isoformat()
+        for code in stock_ids:
+            try:
+                self.store.put_payload('GetStockBid', day, self.client.fetch_json('GetStockBid', StockID=code),
+                                       key=str(code))
+            except Exception as e:
+                self.logger.warning(f"{code} 竞价数据获取失败: {str(e)}")
+
+    def save(self, day=None):
+        """按列保存 节拍×股票 数组、节拍时间戳和采集统计"""
+        day = day or market_time().date().isoformat()
+        ticks, stocks = self.ticks, len(self.codes)
+        for name, buffer in self.buffers.items():
+            self.store.save_array(f"auction_{day}_{name}", buffer[:ticks, :stocks])
+        self.store.save_array(f"auction_{day}_stamps", self.stamps[:ticks])
+        self.store.save_array(f"auction_{day}_complete", self.complete[:ticks])
+        self.store.save_meta(f"auction_{day}", dict(self.report(), codes=self.codes, columns=list(AUCTION_COLUMNS),
+                                                   dropped_at=list(self.dropped)))
+
+    @staticmethod
+    def load(store, day):
+        """读取某日的采集结果：(元数据, 时间戳, {列名: 节拍×股票数组})，没有时返回None"""
+        meta = store.load_meta(f"auction_{day}")
+        if meta is None:
+            return None
+        arrays = {name: store.load_array(f"auction_{day}_{name}") for name in meta['columns']}
+        return meta, store.load_array(f"auction_{day}_stamps"), arrays
+
+
+def main(argv=None):
+    """主函数：09:15前启动，采集结束后拉取自选股竞价并打印节拍统计"""
+    import argparse
+
+    from kpl_client import KPLClient
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="集合竞价高频采集")
+    parser.add_argument('--interval', type=float, help="节拍间隔（秒），不填时按页数和限流速率推算")
+    parser.add_argument('--start', default='09:15:00')
+    parser.add_argument('--end', default='09:25:30')
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--watch', nargs='*', default=[], help="竞价结束后拉取逐笔竞价的股票")
+    args = parser.parse_args(argv)
+
+    capture = AuctionCapture(KPLClient(), interval=args.interval, start=args.start, end=args.end,
+                             workers=args.workers)
+    capture.prepare()
+    report = capture.run()
+    capture.capture_bids(args.watch)
+    capture.save()
+    print(f"\n🔔 竞价采集: {report['ticks']} 个节拍，按时完成 {report['on_time']}，超时 {len(report['overrun'])}，"
+          f"丢弃 {report['dropped']}，{report['stocks']} 只股票，每节拍 {report['pages']} 页")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+历史数据回补调度器
+功能：把 (接口 × 交易日 × 代码) 展开成工作单元写入SQLite(WAL)检查点，
+      由线程池并发执行、近期日期优先；每个单元完成即落盘，中断后从断点继续，
+      运行中输出吞吐量和预计剩余时间
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+from local_store import LocalStore
+from trading_calendar import default_calendar
+
+# 回补任务定义：接口 -> 日期参数名、日期格式、代码参数名（None表示不按代码展开）、是否翻页，
+# 可选默认代码列表和本地存储key格式（与各分析模块读取时使用的key一致）
+BACKFILL_JOBS = {
+    'HisDaBanList': {'date_param': 'Day', 'date_format': '%Y-%m-%d', 'symbol_param': 'PidType', 'paged': True,
+                     'default_symbols': ('1', '2'), 'key_format': 'PidType={}'},
+    'HisRealRankingInfo': {'date_param': 'Date', 'date_format': '%Y-%m-%d', 'symbol_param': None, 'paged': True},
+    'GetVolTurIncremental': {'date_param': 'Day', 'date_format': '%Y-%m-%d', 'symbol_param': 'StockID', 'paged': False},
+    'GetStockTrend': {'date_param': 'Day', 'date_format': '%Y%m%d', 'symbol_param': 'StockID', 'paged': False},
+    'HisGetStockBid': {'date_param': 'Day', 'date_format': '%Y%m%d', 'symbol_param': 'StockID', 'paged': False},
+}
+
+PENDING, RUNNING, DONE, FAILED = 'pending', 'running', 'done', 'failed'
+
+
+def run_job(client, store, job, unit):
+    """按任务定义执行一个工作单元 (endpoint, day, symbol)：请求接口并把结果写入 store；
+    date_param 为 None 的接口不带日期参数，日期只用于分组存储"""
+    endpoint, day, symbol = unit
+    params = {}
+    if job['date_param']:
+        params[job['date_param']] = datetime.strptime(day, '%Y-%m-%d').strftime(job['date_format'])
+    if job['symbol_param']:
+        params[job['symbol_param']] = symbol
+
+    if job['paged']:
+        payload = {'list': client.fetch_all_pages(endpoint, **params)}
+    else:
+        payload = client.fetch_json(endpoint, **params)
+    store.put_payload(endpoint, day, payload, key=job.get('key_format', '{}').format(symbol))
+
+
+class BackfillOrchestrator:
+    def __init__(self, client, store=None, checkpoint_path=os.path.join("data", "backfill_checkpoint.db"),
+                 max_workers=8, max_attempts=3, report_interval=10):
+        self.client = client
+        self.store = store or LocalStore()
+        self.checkpoint_path = checkpoint_path
+        self.max_workers = max_workers
+        self.max_attempts = max_attempts
+        self.report_interval = report_interval
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+        directory = os.path.dirname(checkpoint_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.conn = sqlite3.connect(checkpoint_path, check_same_thread=False)
+        self.setup_database()
+
+    def setup_database(self):
+        """创建检查点表"""
+        with self._lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS units (
+                    endpoint TEXT NOT NULL,
+                    day TEXT NOT NULL,
+                    symbol TEXT NOT NULL DEFAULT '',
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    updated_at TEXT,
+                    PRIMARY KEY (endpoint, day, symbol)
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_units_status_day ON units (status, day)")
+            # 上次异常退出时仍在执行的单元重新排队
+            self.conn.execute("UPDATE units SET status = ? WHERE status = ?", (PENDING, RUNNING))
+            self.conn.commit()
+
+    def plan(self, endpoint, start, end, symbols=()):
+        """展开工作单元并写入检查点，已存在的单元保持原状态，返回新增数量"""
+        if endpoint not in BACKFILL_JOBS:
+            raise ValueError(f"不支持回补的接口: {endpoint}")
+        job = BACKFILL_JOBS[endpoint]
+        calendar = default_calendar()
+        calendar.require_known(end)
+        days = calendar.trading_days_between(start, end)
+        targets = list(symbols or job.get('default_symbols', ())) if job['symbol_param'] else ['']
+        now = datetime.now().isoformat()
+
+        with self._lock:
+            before = self.conn.total_changes
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO units (endpoint, day, symbol, status, updated_at) VALUES (?, ?, ?, ?, ?)",
+                ((endpoint, day, symbol, PENDING, now) for day in days for symbol in targets)
+            )
+            self.conn.commit()
+            added = self.conn.total_changes - before
+        self.logger.info(f"{endpoint} {start}~{end}: 新增 {added} 个工作单元")
+        return added
+
+    def progress(self):
+        """各状态的单元数"""
+        with self._lock:
+            rows = self.conn.execute("SELECT status, COUNT(*) FROM units GROUP BY status").fetchall()
+        return dict(rows)
+
+    def _next_batch(self, size):
+        """取出一批待执行单元并标记为执行中，近期日期优先"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT endpoint, day, symbol FROM units WHERE status = ? OR (status = ? AND attempts < ?) "
+                "ORDER BY day DESC, endpoint, symbol LIMIT ?",
+                (PENDING, FAILED, self.max_attempts, size)
+            ).fetchall()
+            self.conn.executemany(
+                "UPDATE units SET status = ?, updated_at = ? WHERE endpoint = ? AND day = ? AND symbol = ?",
+                ((RUNNING, datetime.now().isoformat()) + row for row in rows)
+            )
+            self.conn.commit()
+        return rows
+
+    def _finish(self, unit, error=None):
+        endpoint, day, symbol = unit
+        with self._lock:
+            if error is None:
+                self.conn.execute(
+                    "UPDATE units SET status = ?, error = NULL, updated_at = ? WHERE endpoint = ? AND day = ? AND symbol = ?",
+                    (DONE, datetime.now().isoformat(), endpoint, day, symbol)
+                )
+            else:
+                self.conn.execute(
+                    "UPDATE units SET status = ?, attempts = attempts + 1, error = ?, updated_at = ? "
+                    "WHERE endpoint = ? AND day = ? AND symbol = ?",
+                    (FAILED, error[:500], datetime.now().isoformat(), endpoint, day, symbol)
+                )
+            self.conn.commit()
+
+    def run_unit(self, unit):
+        """执行单个工作单元：请求接口并写入本地存储"""
+        run_job(self.client, self.store, BACKFILL_JOBS[unit[0]], unit)
+
+    def stop(self):
+        """请求停止，正在执行的单元完成后退出"""
+        self._stop.set()
+
+    def run(self, batch_size=None):
+        """执行全部待办单元直到完成或被停止，返回本次完成数量"""
+        batch_size = batch_size or self.max_workers * 4
+        counts = self.progress()
+        remaining = counts.get(PENDING, 0) + counts.get(FAILED, 0)
+        started = time.time()
+        last_report = started
+        completed = failed = 0
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while not self._stop.is_set():
+                batch = self._next_batch(batch_size)
+                if not batch:
+                    break
+                futures = {executor.submit(self.run_unit, unit): unit for unit in batch}
+                for future in as_completed(futures):
+                    unit = futures[future]
+                    try:
+                        future.result()
+                        self._finish(unit)
+                        completed += 1
+                    except Exception as e:
+                        self._finish(unit, str(e))
+                        failed += 1
+                        self.logger.warning(f"单元失败 {unit}: {str(e)}")
+
+                now = time.time()
+                if now - last_report >= self.report_interval:
+                    last_report = now
+                    self.report(completed, failed, remaining, now - started)
+
+        self.report(completed, failed, remaining, time.time() - started)
+        return completed
+
+    def report(self, completed, failed, remaining, elapsed):
+        """输出吞吐量和预计剩余时间"""
+        rate = completed / elapsed if elapsed > 0 else 0.0
+        left = max(remaining - completed, 0)
+        eta = left / rate if rate > 0 else float('inf')
+        eta_text = time.strftime('%H:%M:%S', time.gmtime(eta)) if eta != float('inf') else '未知'
+        self.logger.info(f"回补进度: 完成 {completed}，失败 {failed}，剩余约 {left}，"
+                         f"吞吐 {rate:.1f} 单元/秒，预计剩余 {eta_text}")
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+def main():
+    """主函数：回补近一年的历史涨停和精选排行，可随时中断后重跑续传"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    from datetime import date, timedelta
+    from kpl_client import KPLClient
+
+    orchestrator = BackfillOrchestrator(KPLClient())
+    end = default_calendar().previous_trading_day(date.today())
+    start = (date.today() - timedelta(days=365)).isoformat()
+    orchestrator.plan('HisDaBanList', start, end)
+    orchestrator.plan('HisRealRankingInfo', start, end)
+    try:
+        orchestrator.run()
+    except KeyboardInterrupt:
+        orchestrator.stop()
+        print("\n已中断，下次运行将从检查点继续")
+    print(f"\n📊 回补状态: {orchestrator.progress()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+大单流式监控
+功能：并发轮询一批股票的实时大单(GetMainMonitor_w30)，跨页去重后按分钟桶累计净买入、笔数和最大单，
+      在固定大小的环形分钟桶上计算1/5/15分钟窗口聚合，超过阈值时推送给订阅者；内存占用与运行时长无关，
+      跨日运行时新交易日开始前清空分钟桶和去重记录
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from kpl_client import extract_rows
+from trading_calendar import market_time
+
+ENDPOINT = 'GetMainMonitor_w30'
+
+# 大单行字段：名称 -> (数组行下标, 字典行字段名)。方向列 1为买入、2为卖出
+BIG_ORDER_COLUMNS = {
+    'time': (0, 'Time'),
+    'price': (1, 'Price'),
+    'amount': (2, 'Money'),
+    'side': (3, 'Type'),
+}
+BUY_SIDES = ('1', 'B', 'b', '买', '买入')
+# 字典行中可能带有的成交序号字段，有则参与去重
+TRADE_ID_KEYS = ('ID', 'Id', 'SeqNo', 'Seq', 'TradeID', 'TradeNo')
+
+WINDOWS = (1, 5, 15)  # 窗口长度（分钟）
+METRICS = ('net_buy', 'count', 'largest')
+
+
+def _cell(row, name):
+    index, key = BIG_ORDER_COLUMNS[name]
+    if isinstance(row, dict):
+        return row.get(key)
+    if isinstance(row, (list, tuple)) and index < len(row):
+        return row[index]
+    return None
+
+
+def seconds_of(value):
+    """把 '10:31:05' / '103105' / 时间戳 转换为当日秒数，时间戳按北京时间换算，无法解析时返回-1"""
+    text = ''.join(ch for ch in str(value) if ch.isdigit())
+    if not text:
+        return -1
+    number = int(text)
+    if number > 240000:
+        stamp = market_time(number / 1000 if number > 1e11 else number)
+        return stamp.hour * 3600 + stamp.minute * 60 + stamp.second
+    if len(text) <= 4:
+        number *= 100
+    return number // 10000 * 3600 + number // 100 % 100 * 60 + number % 100
+
+
+def parse_trade(row):
+    """解析一笔大单为 (当日秒数, 价格, 金额, 是否买入)，并返回去重用的键"""
+    seconds = seconds_of(_cell(row, 'time'))
+    try:
+        price = float(_cell(row, 'price'))
+        amount = float(_cell(row, 'amount'))
+    except (TypeError, ValueError):
+        return None, None
+    side = str(_cell(row, 'side'))
+    trade_id = next((row[k] for k in TRADE_ID_KEYS if row.get(k) not in (None, '')), None) \
+        if isinstance(row, dict) else None
+    # 没有成交序号时按 (秒, 价格, 金额, 方向) 去重：同一秒内完全相同的两笔大单会被合并为一笔
+    key = (seconds, price, amount, side, trade_id)
+    return (seconds, price, amount, side in BUY_SIDES), key
+
+
+class BigOrderMonitor:
+    def __init__(self, client, stock_ids, money=2, max_pages=5, max_workers=16, dedupe_size=512):
+        self.client = client
+        self.stock_ids = [str(code) for code in stock_ids]
+        self.row_of = {code: i for i, code in enumerate(self.stock_ids)}
+        self.money = money          # Money=2 表示200万以上
+        self.max_pages = max_pages
+        self.max_workers = max_workers
+        self.dedupe_size = dedupe_size
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+
+        # 每只股票最多 max(WINDOWS) 个分钟桶，按 分钟 % 桶数 循环复用
+        n, buckets = len(self.stock_ids), max(WINDOWS)
+        self.buckets = buckets
+        self.bucket_minute = np.full((n, buckets), -1, dtype=np.int32)
+        self.net_buy = np.zeros((n, buckets))
+        self.count = np.zeros((n, buckets), dtype=np.int32)
+        self.largest = np.zeros((n, buckets))
+        self.latest_minute = -1
+        self.session_day = None
+
+        # 每只股票最近成交的去重键，容量固定
+        self.seen = [OrderedDict() for _ in self.stock_ids]
+        self.subscribers = []
+        self.thresholds = {}
+        self._fired = {}
+
+    def start_session(self, day):
+        """新交易日开始：分钟桶、最新分钟、去重记录和告警记录都按当日秒数计，换日时全部清空"""
+        with self._lock:
+            self.bucket_minute[:] = -1
+            self.net_buy[:] = 0.0
+            self.count[:] = 0
+            self.largest[:] = 0.0
+            self.latest_minute = -1
+            for seen in self.seen:
+                seen.clear()
+            self._fired.clear()
+            self.session_day = day
+
+    def subscribe(self, callback):
+        """订阅告警，回调参数为告警字典"""
+        self.subscribers.append(callback)
+
+    def set_threshold(self, window, metric, value):
+        """设置某窗口某指标的告警阈值，net_buy 按绝对值比较"""
+        if window not in WINDOWS or metric not in METRICS:
+            raise ValueError(f"不支持的窗口或指标: {window}, {metric}")
+        self.thresholds[(window, metric)] = value
+
+    def _is_new(self, row, key):
+        seen = self.seen[row]
+        if key in seen:
+            return False
+        seen[key] = None
+        if len(seen) > self.dedupe_size:
+            seen.popitem(last=False)
+        return True
+
+    def add_trades(self, stock_id, rows):
+        """把一批大单行计入分钟桶，已见过的成交跳过，返回新增笔数"""
+        row = self.row_of[str(stock_id)]
+        added = 0
+        with self._lock:
+            for raw in rows:
+                trade, key = parse_trade(raw)
+                if trade is None or trade[0] < 0 or not self._is_new(row, key):
+                    continue
+                seconds, _, amount, is_buy = trade
+                minute = seconds // 60
+                if minute <= self.latest_minute - self.buckets:
+                    continue  # 早于最长窗口，不再计入
+                slot = minute % self.buckets
+                if self.bucket_minute[row, slot] != minute:
+                    self.bucket_minute[row, slot] = minute
+                    self.net_buy[row, slot] = 0.0
+                    self.count[row, slot] = 0
+                    self.largest[row, slot] = 0.0
+                self.net_buy[row, slot] += amount if is_buy else -amount
+                self.count[row, slot] += 1
+                self.largest[row, slot] = max(self.largest[row, slot], amount)
+                self.latest_minute = max(self.latest_minute, minute)
+                added += 1
+        return added
+
+    def poll_stock(self, stock_id):
+        """翻页拉取一只股票的大单，直到某页全部已见过或不足一页"""
+        page_size = 20
+        added = 0
+        for page in range(self.max_pages):
+            rows = extract_rows(self.client.fetch_json(ENDPOINT, StockID=stock_id, Money=self.money,
+                                                       Index=page * page_size, st=page_size))
+            new = self.add_trades(stock_id, rows)
+            added += new
+            if new == 0 or len(rows) < page_size:
+                break
+        return added
+
+    def poll(self):
+        """并发轮询全部股票，更新后检查告警，返回本轮新增笔数；北京时间换日时先清空上一交易日的状态"""
+        today = market_time().date()
+        if today != self.session_day:
+            self.start_session(today)
+
+        def task(stock_id):
+            try:
+                return self.poll_stock(stock_id)
+            except Exception as e:
+                self.logger.warning(f"{stock_id} 大单拉取失败: {str(e)}")
+                return 0
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            added = sum(executor.map(task, self.stock_ids))
+        self.check_alerts()
+        return added
+
+    def window(self, minutes, now_minute=None):
+        """全部股票在最近 minutes 分钟的聚合，返回 {指标: 数组}"""
+        now_minute = self.latest_minute if now_minute is None else now_minute
+        with self._lock:
+            mask = (self.bucket_minute > now_minute - minutes) & (self.bucket_minute <= now_minute)
+            return {
+                'net_buy': np.where(mask, self.net_buy, 0.0).sum(axis=1),
+                'count': np.where(mask, self.count, 0).sum(axis=1),
+                'largest': np.where(mask, self.largest, 0.0).max(axis=1, initial=0.0),
+            }
+
+    def stock_window(self, stock_id, minutes):
+        """单只股票的窗口聚合"""
+        row = self.row_of[str(stock_id)]
+        return {metric: values[row].item() for metric, values in self.window(minutes).items()}
+
+    def check_alerts(self):
+        """检查阈值，同一股票同一窗口同一指标每分钟最多推送一次，返回告警列表"""
+        alerts = []
+        for (minutes, metric), threshold in self.thresholds.items():
+            values = self.window(minutes)[metric]
+            hits = np.nonzero((np.abs(values) if metric == 'net_buy' else values) >= threshold)[0]
+            for row in hits:
+                fired_key = (row, minutes, metric)
+                if self._fired.get(fired_key) == self.latest_minute:
+                    continue
+                self._fired[fired_key] = self.latest_minute
+                alerts.append({
+                    'stock_id': self.stock_ids[row],
+                    'window': minutes,
+                    'metric': metric,
+                    'value': values[row].item(),
+                    'threshold': threshold,
+                    'minute': f"{self.latest_minute // 60:02d}:{self.latest_minute % 60:02d}",
+                })
+        for alert in alerts:
+            for callback in self.subscribers:
+                try:
+                    callback(alert)
+                except Exception as e:
+                    self.logger.warning(f"告警回调失败: {str(e)}")
+        return alerts
+
+    def run(self, interval=3, until='1500'):
+        """按固定间隔轮询直到收盘（北京时间）"""
+        while market_time().strftime('%H%M') <= until:
+            started = time.time()
+            added = self.poll()
+            self.logger.debug(f"本轮新增 {added} 笔大单")
+            time.sleep(max(interval - (time.time() - started), 0))
+
+
+def main():
+    """主函数：监控命令行给出的股票，5分钟净买入超过2000万时打印告警"""
+    import sys
+
+    from kpl_client import KPLClient
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    stock_ids = sys.argv[1:] or ['300339']
+    monitor = BigOrderMonitor(KPLClient(), stock_ids)
+    monitor.set_threshold(5, 'net_buy', 2e7)
+    monitor.subscribe(lambda alert: print(f"🔔 {alert['minute']} {alert['stock_id']} "
+                                          f"{alert['window']}分钟{alert['metric']} {alert['value']:.0f}"))
+    try:
+        monitor.run()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+盘前缓存预热
+功能：CachedClient 以 (接口, 参数) 为键把当个交易日的接口返回缓存在本地存储，只缓存预热的历史类接口
+      （日K线、所属板块、涨停原因、历史涨停列表），实时接口照常请求；按分钟统计命中率并累加保存，
+      kpl_cli（含常驻进程）的请求都经过它；
+      CacheWarmer 在开盘前读取上一交易日的涨停列表(HisDaBanList)和自选股清单，
+      在限定并发下预取这些股票的日K线、所属板块、涨停原因，以及相关板块的日K线，
+      开盘后输出前30分钟的缓存命中率
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+
+from kpl_client import KPLClient, extract_rows, request_key, row_code
+from local_store import LocalStore, normalize_day
+from trading_calendar import default_calendar, market_time
+
+CACHE_ENDPOINT_PREFIX = 'cache:'
+
+# 可在一个交易日内缓存的接口：盘前预热的历史类数据，盘中不会变化
+CACHED_ENDPOINTS = ('GetPlateKLineDay', 'GetStockIDPlate', 'GetDayZhangTing', 'HisDaBanList')
+
+
+def session_day(day=None):
+    """预热的目标交易日：当天是交易日取当天，否则取下一个交易日"""
+    calendar = default_calendar()
+    day = normalize_day(day or market_time().date())
+    return day if calendar.is_trading_day(day) else calendar.next_trading_day(day)
+
+
+class CachedClient(KPLClient):
+    def __init__(self, store=None, day=None, endpoints=CACHED_ENDPOINTS, **kwargs):
+        """day 不填时每次请求按当天取交易日，常驻进程跨日运行也不会一直读前一天的缓存"""
+        super().__init__(**kwargs)
+        self._store = store
+        self.fixed_day = normalize_day(day) if day else None
+        self.endpoints = set(endpoints)
+        self._stats_lock = threading.Lock()
+        # 按当日分钟计数，内存固定；saved 为已累加进本地存储的部分
+        self.hits = np.zeros(24 * 60, dtype=np.int64)
+        self.misses = np.zeros(24 * 60, dtype=np.int64)
+        self._saved = np.zeros((2, 24 * 60), dtype=np.int64)
+        self._stats_day = self.day
+        self._stats_conn = None
+
+    @property
+    def store(self):
+        """延迟打开本地存储，只请求实时接口时不创建数据目录"""
+        if self._store is None:
+            self._store = LocalStore()
+        return self._store
+
+    @property
+    def day(self):
+        return self.fixed_day or session_day()
+
+    def _count(self, hit):
+        now = market_time()
+        minute = now.hour * 60 + now.minute
+        day = self.day
+        if day != self._stats_day:
+            # 换日：先保存上一交易日的计数再清零
+            self.save_stats()
+            with self._stats_lock:
+                self.hits[:] = 0
+                self.misses[:] = 0
+                self._saved[:] = 0
+                self._stats_day = day
+        with self._stats_lock:
+            (self.hits if hit else self.misses)[minute] += 1
+
+    def is_cached(self, endpoint, **params):
+        return self.store.has_payload(CACHE_ENDPOINT_PREFIX + endpoint, self.day, request_key(endpoint, params))
+
+    def fetch_json(self, endpoint, **params):
+        """可缓存的接口先查当日缓存，未命中再请求接口并写入缓存；其他接口直接请求、不计入命中率"""
+        if endpoint not in self.endpoints:
+            return super().fetch_json(endpoint, **params)
+        day = self.day
+        key = request_key(endpoint, params)
+        payload = self.store.get_payload(CACHE_ENDPOINT_PREFIX + endpoint, day, key)
+        if payload is not None:
+            self._count(True)
+            return payload
+        self._count(False)
+        payload = super().fetch_json(endpoint, **params)
+        self.store.put_payload(CACHE_ENDPOINT_PREFIX + endpoint, day, payload, key=key)
+        return payload
+
+    def _stats_db(self):
+        """累加计数放在数据目录下单独的 SQLite 库，多个进程打开同一文件，在事务里做加法"""
+        if self._stats_conn is None:
+            path = os.path.join(self.store.data_dir, 'cache_stats.db')
+            self._stats_conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+            self._stats_conn.execute("PRAGMA journal_mode=WAL")
+            self._stats_conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache_stats (
+                    day TEXT NOT NULL,
+                    minute INTEGER NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0,
+                    misses INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (day, minute)
+                )
+            """)
+        return self._stats_conn
+
+    def save_stats(self):
+        """把上次保存之后的按分钟计数累加到本地存储，多个进程（每次命令行调用、常驻进程）的计数合在一起；
+        累加用 hits = hits + ? 在一个写事务里完成，并发保存不会互相覆盖"""
+        with self._stats_lock:
+            current = np.vstack([self.hits, self.misses])
+            delta = current - self._saved
+            minutes = np.flatnonzero(delta.any(axis=0))
+            if not len(minutes):
+                return
+            rows = [(self._stats_day, int(m), int(delta[0, m]), int(delta[1, m])) for m in minutes]
+            conn = self._stats_db()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany("""
+                    INSERT INTO cache_stats (day, minute, hits, misses) VALUES (?, ?, ?, ?)
+                    ON CONFLICT (day, minute) DO UPDATE SET
+                        hits = hits + excluded.hits, misses = misses + excluded.misses
+                """, rows)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            self._saved = current
+
+    def stored_stats(self, day=None):
+        """本地存储中某交易日累加的计数，形状 (2, 1440)：第0行命中、第1行未命中；没有记录时返回 None"""
+        rows = self._stats_db().execute(
+            "SELECT minute, hits, misses FROM cache_stats WHERE day = ?", (day or self.day,)).fetchall()
+        if not rows:
+            return None
+        stats = np.zeros((2, 24 * 60), dtype=np.int64)
+        for minute, hits, misses in rows:
+            stats[:, minute] = (hits, misses)
+        return stats
+
+    def load_stats(self):
+        """读取本地存储中累加的计数（看板进程和命令行调用保存的），覆盖本进程的计数"""
+        stats = self.stored_stats()
+        if stats is not None:
+            with self._stats_lock:
+                self.hits, self.misses = stats[0].copy(), stats[1].copy()
+                self._saved = stats.copy()
+        return stats is not None
+
+    def hit_rate(self, start='0930', minutes=30):
+        """从 start 开始 minutes 分钟内的命中率和请求数"""
+        first = int(start[:2]) * 60 + int(start[2:])
+        with self._stats_lock:
+            hits = int(self.hits[first:first + minutes].sum())
+            misses = int(self.misses[first:first + minutes].sum())
+        total = hits + misses
+        return {'hits': hits, 'misses': misses, 'hit_rate': hits / total if total else None}
+
+
+def load_watchlists(path=os.path.join("data", "watchlists.json")):
+    """读取自选股清单 {名称: [代码, ...]}，不存在时返回空"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+class CacheWarmer:
+    def __init__(self, client, store=None, watchlists=None, max_workers=4, index=None):
+        self.client = client  # 应为 CachedClient，预取结果写入其当日缓存
+        self.store = store or client.store
+        self.watchlists = load_watchlists() if watchlists is None else watchlists
+        self.max_workers = max_workers
+        self.index = index  # 可选的 PlateMembershipIndex，有则直接取所属板块
+        self.logger = logging.getLogger(__name__)
+
+    def seed_stocks(self):
+        """上一交易日的涨停和炸板股加自选股"""
+        previous = default_calendar().previous_trading_day(self.client.day)
+        codes = []
+        for pid_type in (1, 2):
+            key = f'PidType={pid_type}'
+            payload = self.store.get_payload('HisDaBanList', previous, key=key)
+            if payload is None:
+                payload = {'list': self.client.fetch_all_pages('HisDaBanList', PidType=pid_type, Day=previous)}
+                self.store.put_payload('HisDaBanList', previous, payload, key=key)
+            codes.extend(row_code(row) for row in extract_rows(payload))
+        for watchlist in self.watchlists.values():
+            codes.extend(str(code) for code in watchlist)
+        return list(dict.fromkeys(code for code in codes if code))
+
+    def _run(self, tasks):
+        """在限定并发下执行预取任务，返回 (成功数, 失败数)"""
+        done = failed = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(self.client.fetch_json, endpoint, **params) for endpoint, params in tasks]
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                    done += 1
+                except Exception as e:
+                    failed += 1
+                    self.logger.debug(f"预取失败: {str(e)}")
+        return done, failed
+
+    def plates_of(self, code):
+        if self.index is not None:
+            return self.index.plates_of(code)
+        rows = extract_rows(self.client.fetch_json('GetStockIDPlate', StockID=code))
+        return [row_code(row) for row in rows if row_code(row)]
+
+    def warm(self):
+        """两轮预取：先个股（K线、所属板块、涨停原因），再这些股票涉及的板块K线；
+        板块成分股排行是实时数据，不预取"""
+        started = time.time()
+        stocks = self.seed_stocks()
+        stock_tasks = []
+        for code in stocks:
+            stock_tasks.append(('GetPlateKLineDay', {'StockID': code}))
+            stock_tasks.append(('GetStockIDPlate', {'StockID': code}))
+            stock_tasks.append(('GetDayZhangTing', {'StockID': code}))
+        stock_tasks = [(e, p) for e, p in stock_tasks if not self.client.is_cached(e, **p)]
+        done, failed = self._run(stock_tasks)
+
+        plates = set()
+        for code in stocks:
+            try:
+                plates.update(self.plates_of(code))
+            except Exception as e:
+                self.logger.debug(f"{code} 所属板块获取失败: {str(e)}")
+        plate_tasks = []
+        for plate in sorted(plates):
+            plate_tasks.append(('GetPlateKLineDay', {'StockID': plate}))
+        plate_tasks = [(e, p) for e, p in plate_tasks if not self.client.is_cached(e, **p)]
+        plate_done, plate_failed = self._run(plate_tasks)
+
+        summary = {
+            'session_day': self.client.day,
+            'stocks': len(stocks),
+            'plates': len(plates),
+            'fetched': done + plate_done,
+            'failed': failed + plate_failed,
+            'seconds': round(time.time() - started, 1),
+        }
+        self.logger.info(f"缓存预热完成: {summary}")
+        return summary
+
+
+def main():
+    """主函数：开盘前运行预热；加 --report 参数则读取 kpl_cli 等进程累加保存的计数，打印前30分钟命中率"""
+    import sys
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    client = CachedClient()
+    if '--report' in sys.argv:
+        client.load_stats()
+        print(f"\n📈 开盘前30分钟缓存命中率: {client.hit_rate()}")
+        return
+
+    from plate_index import PlateMembershipIndex
+
+    index = PlateMembershipIndex(client.store)
+    summary = CacheWarmer(client, index=index if index.load() else None).warm()
+    print(f"\n🔥 预热 {summary['session_day']}: {summary['stocks']} 只股票，{summary['plates']} 个板块，"
+          f"请求 {summary['fetched']} 次，失败 {summary['failed']} 次，耗时 {summary['seconds']} 秒")
+
+
+if __name__ == "__main__":
+    main()
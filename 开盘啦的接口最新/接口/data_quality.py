@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+接口数据质量校验
+功能：对每批解码后的列式数据做按列的向量化检查（空值、负成交量、重复代码、涨跌幅越界、
+      涨停价与10%/20%/30%/5%板块规则不符、涨跌幅与价格不一致），每行的问题记为位标志，
+      不逐行执行Python；问题行写入本地存储的隔离区，按接口累计质量分
+"""
+
+import logging
+
+import numpy as np
+
+from local_store import LocalStore
+from market_snapshot import (PRICE_TOLERANCE, STOCK_RANKING_COLUMNS, MarketSnapshot, _code_points, limit_prices,
+                             limit_ratios)
+from trading_calendar import market_time
+
+# 检查项，按位记录在每行的标志中
+CHECKS = ('null', 'negative', 'duplicate', 'out_of_range', 'limit_price', 'inconsistent')
+FLAG = {name: np.uint16(1 << i) for i, name in enumerate(CHECKS)}
+
+# 精选/行业板块排行的列：代码、名称、强度、主力净额（代码示例-精选.py 中的 ii[0]、ii[1]、ii[2]、ii[6]）
+PLATE_RANKING_COLUMNS = {
+    'code': (0, 'PlateID', 'U8'),
+    'name': (1, 'Name', 'U16'),
+    'strength': (2, 'QiangDu', np.float64),
+    'main_net': (6, 'ZhuLiJingE', np.float64),
+}
+
+_STOCK_RULES = {
+    'columns': STOCK_RANKING_COLUMNS,
+    'required': ('code', 'price', 'change_pct', 'prev_close'),
+    'non_negative': ('amount', 'volume', 'turnover'),
+    'unique': 'code',
+    'ranges': {'turnover': (0.0, 100.0)},
+    'limit_rules': True,
+}
+_PLATE_RULES = {
+    'columns': PLATE_RANKING_COLUMNS,
+    'required': ('code', 'name', 'strength'),
+    'non_negative': ('strength',),
+    'unique': 'code',
+    'ranges': {},
+    'limit_rules': False,
+}
+
+# 各接口的校验规则
+ENDPOINT_RULES = {
+    'RealRankingInfo_W8': _STOCK_RULES,
+    'HisRankingInfo_W8': _STOCK_RULES,
+    'RealRankingInfo': _PLATE_RULES,
+    'HisRealRankingInfo': _PLATE_RULES,
+}
+
+# 涨跌幅比较的容差（百分点）；价格比较的容差 PRICE_TOLERANCE 与 MarketSnapshot.is_limit_up 共用
+CHANGE_TOLERANCE = 0.1
+
+
+def check_columns(columns, rules):
+    """对一批列数据做全部检查，返回每行的问题标志数组"""
+    size = len(columns[rules['unique']])
+    flags = np.zeros(size, dtype=np.uint16)
+
+    for name in rules['required']:
+        values = columns[name]
+        missing = np.isnan(values) if values.dtype.kind == 'f' else (_code_points(values)[:, 0] == 0)
+        flags[missing] |= FLAG['null']
+
+    for name in rules['non_negative']:
+        flags[columns[name] < 0] |= FLAG['negative']
+
+    # 重复代码：排序后与前一个相同的行（保留第一次出现）
+    codes = columns[rules['unique']]
+    order = np.argsort(codes, kind='stable')
+    repeated = np.zeros(size, dtype=bool)
+    repeated[order[1:]] = codes[order[1:]] == codes[order[:-1]]
+    flags[repeated] |= FLAG['duplicate']
+
+    for name, (low, high) in rules['ranges'].items():
+        flags[(columns[name] < low) | (columns[name] > high)] |= FLAG['out_of_range']
+
+    if rules['limit_rules']:
+        flags |= _limit_flags(columns)
+    return flags
+
+
+def _limit_flags(columns):
+    """涨跌幅越界、价格超过涨停价、涨跌幅与价格不一致；新股（名称以N、C开头）不设涨跌幅限制"""
+    price, prev_close, change = columns['price'], columns['prev_close'], columns['change_pct']
+    names = columns.get('name')
+    ratios = limit_ratios(columns['code'], names)
+    checked = prev_close > 0
+    if names is not None:
+        first = _code_points(names)[:, 0]
+        checked &= (first != ord('N')) & (first != ord('C'))
+
+    flags = np.zeros(len(price), dtype=np.uint16)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        flags[checked & (np.abs(change) > ratios + CHANGE_TOLERANCE)] |= FLAG['out_of_range']
+        flags[price <= 0] |= FLAG['out_of_range']
+
+        ceiling = limit_prices(prev_close, ratios) + PRICE_TOLERANCE
+        over = price > ceiling
+        if 'high' in columns:
+            over |= columns['high'] > ceiling
+        flags[checked & over] |= FLAG['limit_price']
+
+        implied = (price / prev_close - 1.0) * 100.0
+        flags[checked & (price > 0) & (np.abs(implied - change) > CHANGE_TOLERANCE)] |= FLAG['inconsistent']
+    return flags
+
+
+def describe_flags(flag):
+    """把一行的标志转换为检查项名称列表"""
+    return [name for name in CHECKS if flag & FLAG[name]]
+
+
+class DataValidator:
+    def __init__(self, store=None, quarantine=True):
+        self._store = store
+        self.quarantine = quarantine
+        self.logger = logging.getLogger(__name__)
+        # 交易日 -> 接口 -> 累计行数、问题行数、各检查项命中数
+        self.totals = {}
+
+    @property
+    def store(self):
+        """延迟打开本地存储：不隔离时只在保存质量分时才需要"""
+        if self._store is None:
+            self._store = LocalStore()
+        return self._store
+
+    def _record(self, day, endpoint, flags):
+        totals = self.totals.setdefault(day, {}).setdefault(
+            endpoint, {'rows': 0, 'failed': 0, 'checks': np.zeros(len(CHECKS), dtype=np.int64)})
+        totals['rows'] += len(flags)
+        totals['failed'] += int(np.count_nonzero(flags))
+        bits = np.bitwise_or.reduce(flags) if len(flags) else 0
+        if bits:
+            for i, name in enumerate(CHECKS):
+                if bits & FLAG[name]:
+                    totals['checks'][i] += int(np.count_nonzero(flags & FLAG[name]))
+
+    def check(self, endpoint, snapshot):
+        """检查已解码的快照，返回每行标志；没有规则的接口全部视为通过"""
+        rules = ENDPOINT_RULES.get(endpoint)
+        if rules is None:
+            return np.zeros(len(snapshot), dtype=np.uint16)
+        return check_columns(snapshot.columns, rules)
+
+    def validate(self, endpoint, rows, timestamp=None, day=None):
+        """解码并校验一批接口行，问题行写入隔离区，返回 (只含通过行的快照, 每行标志)"""
+        rules = ENDPOINT_RULES.get(endpoint)
+        snapshot = MarketSnapshot.from_rows(rows, timestamp, columns=rules['columns'] if rules else None)
+        flags = self.check(endpoint, snapshot)
+        day = day or market_time(snapshot.timestamp).strftime('%Y-%m-%d')
+        self._record(day, endpoint, flags)
+        if not flags.any():
+            return snapshot, flags
+
+        bad = np.flatnonzero(flags)
+        self.logger.warning(f"{endpoint} 本批 {len(flags)} 行中 {len(bad)} 行未通过校验")
+        if self.quarantine:
+            self.store.put_payload(f'quarantine:{endpoint}', day, {
+                'rows': [rows[i] for i in bad.tolist()],
+                'reasons': [describe_flags(flag) for flag in flags[bad].tolist()],
+            }, key=str(int((snapshot.timestamp) * 1000)))
+        keep = flags == 0
+        clean = MarketSnapshot({name: values[keep] for name, values in snapshot.columns.items()}, snapshot.timestamp)
+        return clean, flags
+
+    def scores(self, day=None):
+        """某交易日各接口的质量分（通过行占比）及各检查项命中数，不给日期时合计全部日期"""
+        combined = {}
+        for totals_day, by_endpoint in self.totals.items():
+            if day is not None and totals_day != day:
+                continue
+            for endpoint, totals in by_endpoint.items():
+                item = combined.setdefault(endpoint, {'rows': 0, 'failed': 0, 'checks': np.zeros(len(CHECKS), dtype=np.int64)})
+                item['rows'] += totals['rows']
+                item['failed'] += totals['failed']
+                item['checks'] += totals['checks']
+        return {
+            endpoint: {
+                'rows': totals['rows'],
+                'failed': totals['failed'],
+                'score': 1.0 - totals['failed'] / totals['rows'] if totals['rows'] else None,
+                'checks': {name: int(count) for name, count in zip(CHECKS, totals['checks']) if count},
+            }
+            for endpoint, totals in combined.items()
+        }
+
+    def save_scores(self):
+        """把各交易日的质量分分别写入本地存储元数据 data_quality_<日期>"""
+        for day in sorted(self.totals):
+            self.store.save_meta(f"data_quality_{day}", self.scores(day))
+
+
+def main():
+    """主函数：校验本地存储中最近保存的全市场排行，打印质量分和问题分布"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    from kpl_client import extract_rows
+
+    store = LocalStore()
+    validator = DataValidator(store)
+    for endpoint in ENDPOINT_RULES:
+        for day, _, payload in store.iter_payloads(endpoint):
+            validator.validate(endpoint, extract_rows(payload), day=day)
+    validator.save_scores()
+
+    print("\n🧪 数据质量:")
+    for endpoint, item in validator.scores().items():
+        print(f"   {endpoint}: 质量分 {item['score']:.4f}  行数 {item['rows']}  问题行 {item['failed']}  {item['checks']}")
+
+
+if __name__ == "__main__":
+    main()
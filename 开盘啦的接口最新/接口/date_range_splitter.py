@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+DStart/DEnd 区间接口的并行分段拉取
+功能：把长日期区间按交易日切成不超过单次返回上限(st)的分段，分段按固定网格对齐以便复用缓存，
+      并发拉取后按主键合并去重；已收盘的分段写入本地存储，之后重叠的查询直接命中。
+      只适用于逐日返回、行内带日期的接口；按区间汇总的接口（ENDPOINTS 中标记 range_summary，如多日统计）
+      各分段的汇总行无法通用地合并（区间涨幅要连乘、最高价取最大等，字段含义各不相同），
+      这类接口不分段，整个区间一次请求、超过上限时翻页
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from kpl_client import ENDPOINTS, row_code
+from local_store import LocalStore
+from trading_calendar import default_calendar, market_time
+
+
+def default_row_key(row, chunk_start, chunk_end):
+    """默认主键：代码 + 行内日期；行内没有日期时改用所在分段的区间，跨分段不去重"""
+    if isinstance(row, dict):
+        day = str(row.get('Day') or row.get('Date') or '')
+        if day:
+            return (row_code(row), day)
+    return (row_code(row), chunk_start, chunk_end)
+
+
+class DateRangePlanner:
+    def __init__(self, client, store=None, endpoint='GetInterviewsByDateZS', rows_per_day=200,
+                 max_workers=4, key_func=None, start_key='DStart', end_key='DEnd', calendar=None):
+        self.client = client
+        self.store = store or LocalStore()
+        self.calendar = calendar or default_calendar()
+        self.endpoint = endpoint
+        self.row_cap = ENDPOINTS[endpoint].get('page_size', 1000)
+        # 按区间汇总的接口不分段
+        self.summary = ENDPOINTS[endpoint].get('range_summary', False)
+        # 分段的交易日数首次按预估的每日行数确定后持久化，之后不再改变，保证各次查询切出相同网格、缓存可复用；
+        # 个别分段触顶时由 fetch_chunk 二分拆开
+        meta = self.store.load_meta(f"range_planner_{endpoint}") or {}
+        self.chunk_days = meta.get('chunk_days') or max(int(self.row_cap * 0.8) // max(rows_per_day, 1), 1)
+        if 'chunk_days' not in meta:
+            self.store.save_meta(f"range_planner_{endpoint}", {'chunk_days': self.chunk_days})
+        self.max_workers = max_workers
+        self.key_func = key_func or default_row_key
+        self.start_key = start_key
+        self.end_key = end_key
+        self.logger = logging.getLogger(__name__)
+
+    def trading_days(self, start, end):
+        """区间内的交易日"""
+        return self.calendar.trading_days_between(start, end)
+
+    def day_index(self, day):
+        """交易日序号，用于对齐分段网格"""
+        return self.calendar.day_index(day)
+
+    def chunk_size(self):
+        """单个分段的交易日数"""
+        return self.chunk_days
+
+    def plan(self, start, end):
+        """生成分段列表 [(开始日, 结束日, 交易日数)]，分段边界按固定网格对齐；按区间汇总的接口只有一个分段"""
+        self.calendar.require_known(end)
+        days = self.trading_days(start, end)
+        if self.summary:
+            return [(days[0], days[-1], len(days))] if days else []
+        size = self.chunk_size()
+        chunks = []
+        i = 0
+        while i < len(days):
+            # 以交易日序号对齐网格，使不同查询切出相同的内部分段
+            span = size - (self.day_index(days[i]) % size)
+            group = days[i:i + span]
+            chunks.append((group[0], group[-1], len(group)))
+            i += len(group)
+        return chunks
+
+    def _cache_key(self, chunk_start, chunk_end):
+        return f"{chunk_start}~{chunk_end}"
+
+    def fetch_chunk(self, chunk_start, chunk_end, n_days):
+        """拉取一个分段，返回 ([(开始日, 结束日, 行列表)], 是否全部来自缓存)；
+        已收盘分段优先读缓存，触及行数上限时二分拆开，拆分点也写入缓存，之后直接读两半；
+        按区间汇总的接口不拆开，改为翻页"""
+        key = self._cache_key(chunk_start, chunk_end)
+        cached = self.store.get_payload(self.endpoint, chunk_end, key=key)
+        if cached is not None and 'split' in cached:
+            return self._fetch_halves(chunk_start, chunk_end, cached['split'])
+        if cached is not None:
+            return [(chunk_start, chunk_end, cached['list'])], True
+
+        rows = self.client.fetch_rows(self.endpoint, **{self.start_key: chunk_start, self.end_key: chunk_end})
+        closed = chunk_end < market_time().date().isoformat()
+        if len(rows) >= self.row_cap:
+            days = self.trading_days(chunk_start, chunk_end)
+            if len(days) > 1 and not self.summary:
+                self.logger.info(f"分段 {key} 触及上限 {self.row_cap} 行，拆分重试")
+                middle = days[len(days) // 2]
+                if closed:
+                    self.store.put_payload(self.endpoint, chunk_end, {'split': middle}, key=key)
+                pieces, _ = self._fetch_halves(chunk_start, chunk_end, middle)
+                return pieces, False
+            rows = self.client.fetch_all_pages(self.endpoint, **{self.start_key: chunk_start, self.end_key: chunk_end})
+
+        if closed:
+            self.store.put_payload(self.endpoint, chunk_end, {'list': rows}, key=key)
+        return [(chunk_start, chunk_end, rows)], False
+
+    def _fetch_halves(self, chunk_start, chunk_end, middle):
+        """以 middle 为右半段第一天拆开拉取"""
+        left_days = self.trading_days(chunk_start, self.calendar.previous_trading_day(middle))
+        right_days = self.trading_days(middle, chunk_end)
+        left, left_cached = self.fetch_chunk(left_days[0], left_days[-1], len(left_days))
+        right, right_cached = self.fetch_chunk(right_days[0], right_days[-1], len(right_days))
+        return left + right, left_cached and right_cached
+
+    def fetch_chunks(self, start, end):
+        """并发拉取整个区间，返回按时间排列的 [(开始日, 结束日, 行列表)]，按区间汇总的接口据此区分各分段的行"""
+        chunks = self.plan(start, end)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = list(executor.map(lambda chunk: self.fetch_chunk(*chunk), chunks))
+        hits = sum(from_cache for _, from_cache in results)
+        self.logger.info(f"{self.endpoint} {start}~{end}: {len(chunks)} 个分段，缓存命中 {hits} 个")
+        return [piece for pieces, _ in results for piece in pieces]
+
+    def fetch(self, start, end):
+        """并发拉取整个区间并按主键合并去重；按区间汇总的接口只请求一次，每只股票一行整个区间的汇总"""
+        merged = {}
+        for chunk_start, chunk_end, rows in self.fetch_chunks(start, end):
+            for row in rows:
+                merged[self.key_func(row, chunk_start, chunk_end)] = row
+        self.logger.info(f"{self.endpoint} {start}~{end}: 合并后 {len(merged)} 行")
+        return list(merged.values())
+
+
+def main():
+    """主函数：并行拉取最近一年的多日统计"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    from kpl_client import KPLClient
+
+    end = market_time().date()
+    start = end - timedelta(days=365)
+    planner = DateRangePlanner(KPLClient())
+    rows = planner.fetch(start, end)
+    print(f"\n📊 {start} ~ {end} 多日统计共 {len(rows)} 行")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+龙虎榜历史库
+功能：把每日龙虎榜动向(GetYTFP_LHBDX)拆成 营业部、股票、日期 三张规范化表和上榜明细表，
+      按营业部和股票建二级索引；营业部的上榜次数、买入次数和次日胜率逐日增量更新，
+      “某营业部两年内的全部上榜”“某营业部买入个股的胜率”等查询直接在本地完成
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+from kpl_client import extract_rows, row_code, row_name
+from local_store import normalize_day
+from trading_calendar import default_calendar
+
+HISTORY_ENDPOINT = 'HisGetYTFP_LHBDX'
+
+# 个股行中买入/卖出营业部列表可能使用的字段名
+SEAT_LIST_KEYS = {
+    'buy': ('BuyList', 'Buy_List', 'buy', 'MaiRu'),
+    'sell': ('SellList', 'Sell_List', 'sell', 'MaiChu'),
+}
+# 营业部行字段：名称 -> (数组行下标, 字典行字段名候选)
+SEAT_COLUMNS = {
+    'seat': (0, ('YybName', 'SeatName', 'Name', 'name')),
+    'buy': (1, ('BuyMoney', 'Buy', 'MaiRuJinE')),
+    'sell': (2, ('SellMoney', 'Sell', 'MaiChuJinE')),
+}
+
+
+def _seat_cell(row, name):
+    index, keys = SEAT_COLUMNS[name]
+    if isinstance(row, dict):
+        for key in keys:
+            if row.get(key) not in (None, ''):
+                return row[key]
+        return None
+    if isinstance(row, (list, tuple)) and index < len(row):
+        return row[index]
+    return None
+
+
+def _money(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def parse_records(payload):
+    """把一日龙虎榜返回拆成 (股票代码, 股票名称, 营业部, 方向, 买入额, 卖出额) 记录。
+    兼容两种结构：个股行内嵌买卖营业部列表，或每行就是一条营业部明细（带股票代码）"""
+    records = []
+    for row in extract_rows(payload):
+        code, name = row_code(row), row_name(row)
+        nested = False
+        if isinstance(row, dict):
+            for side, keys in SEAT_LIST_KEYS.items():
+                for key in keys:
+                    if isinstance(row.get(key), list):
+                        nested = True
+                        for seat_row in row[key]:
+                            seat = _seat_cell(seat_row, 'seat')
+                            if seat:
+                                records.append((code, name, str(seat), side,
+                                                _money(_seat_cell(seat_row, 'buy')), _money(_seat_cell(seat_row, 'sell'))))
+                        break
+        if not nested and isinstance(row, dict) and _seat_cell(row, 'seat') and code:
+            buy, sell = _money(_seat_cell(row, 'buy')), _money(_seat_cell(row, 'sell'))
+            records.append((code, row.get('StockName', name), str(_seat_cell(row, 'seat')),
+                            'buy' if buy >= sell else 'sell', buy, sell))
+    return records
+
+
+class DragonTigerStore:
+    def __init__(self, path=os.path.join("data", "dragon_tiger.db")):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.setup_database()
+
+    def setup_database(self):
+        """创建规范化表、二级索引和营业部统计表"""
+        with self._lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS seats (
+                    seat_id INTEGER PRIMARY KEY,
+                    name TEXT NOT NULL UNIQUE
+                );
+                CREATE TABLE IF NOT EXISTS stocks (
+                    code TEXT PRIMARY KEY,
+                    name TEXT
+                );
+                CREATE TABLE IF NOT EXISTS days (
+                    day TEXT PRIMARY KEY,
+                    ingested_at TEXT NOT NULL,
+                    evaluated INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE TABLE IF NOT EXISTS appearances (
+                    day TEXT NOT NULL,
+                    code TEXT NOT NULL,
+                    seat_id INTEGER NOT NULL,
+                    side TEXT NOT NULL,
+                    buy REAL NOT NULL DEFAULT 0,
+                    sell REAL NOT NULL DEFAULT 0,
+                    next_change REAL,
+                    PRIMARY KEY (day, code, seat_id, side)
+                );
+                CREATE INDEX IF NOT EXISTS idx_appearances_seat ON appearances (seat_id, day);
+                CREATE INDEX IF NOT EXISTS idx_appearances_code ON appearances (code, day);
+                CREATE TABLE IF NOT EXISTS seat_stats (
+                    seat_id INTEGER PRIMARY KEY,
+                    appearances INTEGER NOT NULL DEFAULT 0,
+                    buy_count INTEGER NOT NULL DEFAULT 0,
+                    evaluated INTEGER NOT NULL DEFAULT 0,
+                    wins INTEGER NOT NULL DEFAULT 0,
+                    change_sum REAL NOT NULL DEFAULT 0,
+                    total_buy REAL NOT NULL DEFAULT 0,
+                    total_sell REAL NOT NULL DEFAULT 0,
+                    first_day TEXT,
+                    last_day TEXT
+                );
+            """)
+            self.conn.commit()
+
+    def _seat_ids(self, names):
+        self.conn.executemany("INSERT OR IGNORE INTO seats (name) VALUES (?)", ((name,) for name in names))
+        ids = {}
+        for name in names:
+            ids[name] = self.conn.execute("SELECT seat_id FROM seats WHERE name = ?", (name,)).fetchone()[0]
+        return ids
+
+    def has_day(self, day):
+        with self._lock:
+            return self.conn.execute("SELECT 1 FROM days WHERE day = ?", (normalize_day(day),)).fetchone() is not None
+
+    def ingest_day(self, day, payload):
+        """写入一日龙虎榜并增量更新营业部统计，已写入的日期跳过，返回明细条数"""
+        day = normalize_day(day)
+        records = parse_records(payload)
+        with self._lock:
+            if self.conn.execute("SELECT 1 FROM days WHERE day = ?", (day,)).fetchone():
+                return 0
+            seat_ids = self._seat_ids(sorted({record[2] for record in records}))
+            self.conn.executemany(
+                "INSERT INTO stocks (code, name) VALUES (?, ?) ON CONFLICT(code) DO UPDATE SET name = excluded.name",
+                {(code, name) for code, name, _, _, _, _ in records if code}
+            )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO appearances (day, code, seat_id, side, buy, sell) VALUES (?, ?, ?, ?, ?, ?)",
+                ((day, code, seat_ids[seat], side, buy, sell) for code, _, seat, side, buy, sell in records)
+            )
+            # 只汇总当天的明细累加到统计表
+            self.conn.execute("""
+                INSERT INTO seat_stats (seat_id, appearances, buy_count, total_buy, total_sell, first_day, last_day)
+                SELECT seat_id, COUNT(DISTINCT code), COUNT(DISTINCT CASE WHEN side = 'buy' THEN code END),
+                       SUM(buy), SUM(sell), day, day
+                FROM appearances WHERE day = ? GROUP BY seat_id
+                ON CONFLICT(seat_id) DO UPDATE SET
+                    appearances = appearances + excluded.appearances,
+                    buy_count = buy_count + excluded.buy_count,
+                    total_buy = total_buy + excluded.total_buy,
+                    total_sell = total_sell + excluded.total_sell,
+                    first_day = MIN(first_day, excluded.first_day),
+                    last_day = MAX(last_day, excluded.last_day)
+            """, (day,))
+            self.conn.execute("INSERT INTO days (day, ingested_at) VALUES (?, ?)", (day, datetime.now().isoformat()))
+            self.conn.commit()
+        return len(records)
+
+    def evaluate_day(self, day, changes):
+        """用某交易日的个股涨幅 {代码: 涨幅%} 评估前一交易日上榜买入的结果，涨幅>0记为胜，返回评估条数"""
+        previous = default_calendar().previous_trading_day(normalize_day(day))
+        with self._lock:
+            done = self.conn.execute("SELECT evaluated FROM days WHERE day = ?", (previous,)).fetchone()
+            if done is None or done[0]:
+                return 0
+            pending = self.conn.execute(
+                "SELECT code, seat_id FROM appearances WHERE day = ? AND side = 'buy' AND next_change IS NULL",
+                (previous,)
+            ).fetchall()
+            updates = [(changes[code], previous, code, seat_id) for code, seat_id in pending if code in changes]
+            self.conn.executemany(
+                "UPDATE appearances SET next_change = ? WHERE day = ? AND code = ? AND seat_id = ? AND side = 'buy'",
+                updates
+            )
+            self.conn.execute("""
+                UPDATE seat_stats SET
+                    evaluated = evaluated + (SELECT COUNT(*) FROM appearances a
+                        WHERE a.seat_id = seat_stats.seat_id AND a.day = ? AND a.side = 'buy' AND a.next_change IS NOT NULL),
+                    wins = wins + (SELECT COUNT(*) FROM appearances a
+                        WHERE a.seat_id = seat_stats.seat_id AND a.day = ? AND a.side = 'buy' AND a.next_change > 0),
+                    change_sum = change_sum + (SELECT COALESCE(SUM(a.next_change), 0) FROM appearances a
+                        WHERE a.seat_id = seat_stats.seat_id AND a.day = ? AND a.side = 'buy' AND a.next_change IS NOT NULL)
+                WHERE seat_id IN (SELECT DISTINCT seat_id FROM appearances WHERE day = ? AND side = 'buy')
+            """, (previous,) * 4)
+            self.conn.execute("UPDATE days SET evaluated = 1 WHERE day = ?", (previous,))
+            self.conn.commit()
+        return len(updates)
+
+    def ingest_from_store(self, store, client=None):
+        """把本地存储中尚未入库的日期按顺序写入；同日有个股历史排行时评估前一日买入，返回新增天数"""
+        from market_snapshot import MarketSnapshot
+
+        added = 0
+        for day in store.list_days(HISTORY_ENDPOINT):
+            if self.has_day(day):
+                continue
+            self.ingest_day(day, store.get_payload(HISTORY_ENDPOINT, day))
+            added += 1
+
+        with self._lock:
+            # 评估在上榜日之后完成，所以只看尚未评估、且下一交易日已在库中的日期
+            pending = [row[0] for row in self.conn.execute("SELECT day FROM days WHERE evaluated = 0 ORDER BY day")]
+        calendar = default_calendar()
+        for day in pending:
+            next_day = calendar.next_trading_day(day)
+            payload = store.get_payload('HisRankingInfo_W8', next_day)
+            if payload is None and client is not None and next_day < datetime.now().strftime('%Y-%m-%d'):
+                snapshot = MarketSnapshot.fetch(client, 'HisRankingInfo_W8', Date=next_day)
+            elif payload is not None:
+                snapshot = MarketSnapshot.from_payload(payload)
+            else:
+                continue
+            self.evaluate_day(next_day, dict(zip(snapshot.codes.tolist(), snapshot['change_pct'].tolist())))
+        if added:
+            self.logger.info(f"龙虎榜新增 {added} 个交易日")
+        return added
+
+    def fetch_day(self, client, store, day):
+        """拉取某日龙虎榜动向写入本地存储"""
+        day = normalize_day(day)
+        if not default_calendar().is_trading_day(day):
+            self.logger.info(f"{day} 不是交易日，跳过")
+            return
+        store.put_payload(HISTORY_ENDPOINT, day, client.fetch_json(HISTORY_ENDPOINT, Day=day))
+
+    def _seat_id(self, seat):
+        row = self.conn.execute("SELECT seat_id FROM seats WHERE name = ?", (seat,)).fetchone()
+        return row[0] if row else None
+
+    def seat_appearances(self, seat, start=None, end=None):
+        """某营业部的全部上榜明细（按日期倒序）"""
+        with self._lock:
+            seat_id = self._seat_id(seat)
+            if seat_id is None:
+                return []
+            rows = self.conn.execute("""
+                SELECT a.day, a.code, s.name, a.side, a.buy, a.sell, a.next_change
+                FROM appearances a LEFT JOIN stocks s ON s.code = a.code
+                WHERE a.seat_id = ? AND a.day >= ? AND a.day <= ? ORDER BY a.day DESC
+            """, (seat_id, normalize_day(start) if start else '', normalize_day(end) if end else '9999')).fetchall()
+        keys = ('day', 'code', 'name', 'side', 'buy', 'sell', 'next_change')
+        return [dict(zip(keys, row)) for row in rows]
+
+    def stock_seats(self, code, start=None, end=None):
+        """某股票历次上榜的营业部"""
+        with self._lock:
+            rows = self.conn.execute("""
+                SELECT a.day, seats.name, a.side, a.buy, a.sell
+                FROM appearances a JOIN seats ON seats.seat_id = a.seat_id
+                WHERE a.code = ? AND a.day >= ? AND a.day <= ? ORDER BY a.day DESC, a.buy DESC
+            """, (str(code), normalize_day(start) if start else '', normalize_day(end) if end else '9999')).fetchall()
+        keys = ('day', 'seat', 'side', 'buy', 'sell')
+        return [dict(zip(keys, row)) for row in rows]
+
+    def seat_stats(self, seat):
+        """某营业部的累计统计"""
+        with self._lock:
+            seat_id = self._seat_id(seat)
+            row = self.conn.execute(
+                "SELECT appearances, buy_count, evaluated, wins, change_sum, total_buy, total_sell, first_day, last_day "
+                "FROM seat_stats WHERE seat_id = ?", (seat_id,)
+            ).fetchone() if seat_id is not None else None
+        if row is None:
+            return None
+        appearances, buy_count, evaluated, wins, change_sum, total_buy, total_sell, first_day, last_day = row
+        return {
+            'seat': seat,
+            'appearances': appearances,
+            'buy_count': buy_count,
+            'win_rate': wins / evaluated if evaluated else None,
+            'avg_next_change': change_sum / evaluated if evaluated else None,
+            'total_buy': total_buy,
+            'total_sell': total_sell,
+            'first_day': first_day,
+            'last_day': last_day,
+        }
+
+    def top_seats(self, min_evaluated=20, top=20):
+        """按次日胜率排序的营业部"""
+        with self._lock:
+            rows = self.conn.execute("""
+                SELECT seats.name, st.evaluated, st.wins * 1.0 / st.evaluated, st.change_sum / st.evaluated
+                FROM seat_stats st JOIN seats ON seats.seat_id = st.seat_id
+                WHERE st.evaluated >= ? ORDER BY 3 DESC, 2 DESC LIMIT ?
+            """, (min_evaluated, top)).fetchall()
+        return [{'seat': name, 'evaluated': n, 'win_rate': rate, 'avg_next_change': change}
+                for name, n, rate, change in rows]
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+def main():
+    """主函数：增量入库本地已有的龙虎榜并打印胜率最高的营业部"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    from local_store import LocalStore
+
+    dragon_tiger = DragonTigerStore()
+    dragon_tiger.ingest_from_store(LocalStore())
+    seats = dragon_tiger.top_seats()
+    if not seats:
+        print("本地没有足够的龙虎榜数据，请先调用 fetch_day 拉取")
+        return
+    print("\n🐉 次日胜率最高的营业部:")
+    for item in seats:
+        print(f"   {item['seat']}: 胜率 {item['win_rate']:.1%}  样本 {item['evaluated']}  "
+              f"次日平均涨幅 {item['avg_next_change']:.2f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+市场情绪周期指标流水线
+功能：把各情绪接口的每日返回写入本地存储，物化为按日期排列的原始序列，
+      再计算破板率、涨停晋级表现、赚钱效应、滚动z分数和情绪周期阶段；
+      每个新交易日只重算尾部，图表直接从缓存数组离线绘制
+"""
+
+import logging
+import math
+
+import numpy as np
+
+from local_store import LocalStore, normalize_day
+from trading_calendar import default_calendar
+
+# 原始序列：名称 -> (接口, 取值路径)。路径中的字符串为字典键，整数为列表下标
+RAW_SERIES = {
+    'broken_rate': ('ZhangTingExpression', ('info', 0)),         # 破板率
+    'limit_up_follow': ('ZhangTingExpression', ('info', 1)),     # 涨停进表现（昨日涨停今日表现）
+    'consecutive_follow': ('ZhangTingExpression', ('info', 2)),  # 连板进表现
+    'broken_follow': ('ZhangTingExpression', ('info', 3)),       # 破板今表现
+    'sentiment': ('DiskReview', ('info', 'strong')),             # 市场情绪值
+    'up_count': ('HisZhangFuDetail', ('info', 'SZJS')),          # 上涨家数
+    'down_count': ('HisZhangFuDetail', ('info', 'XDJS')),        # 下跌家数
+    'money_effect': ('GetMoneyDate', None),                      # 赚钱效应，由效应历史按日期展开
+}
+
+# 每日需要拉取的接口（GetMoneyDate 是整段历史，单独处理）
+DAILY_ENDPOINTS = ('ZhangTingExpression', 'DiskReview', 'HisZhangFuDetail')
+
+# 参与综合指标的序列及方向（破板率越高情绪越差）
+COMPOSITE_WEIGHTS = {
+    'broken_rate': -1.0,
+    'limit_up_follow': 1.0,
+    'consecutive_follow': 1.0,
+    'money_effect': 1.0,
+    'advance_ratio': 1.0,
+}
+
+# 情绪周期阶段，与 public/legacy 下的音频命名一致
+PHASES = ('混沌期', '主升期', '盘顶期', '退潮期')
+
+
+def extract_value(payload, path):
+    """按取值路径取出数值，取不到或非数值时返回nan"""
+    value = payload
+    for step in path:
+        try:
+            value = value[step]
+        except (KeyError, IndexError, TypeError):
+            return math.nan
+    try:
+        value = float(str(value).rstrip('%'))
+    except (TypeError, ValueError):
+        return math.nan
+    return value
+
+
+def rolling_zscore(values, window):
+    """按列计算滚动z分数，忽略nan；样本不足 window//2 时为nan"""
+    valid = ~np.isnan(values)
+    filled = np.where(valid, values, 0.0)
+    pad = np.zeros((1,) + values.shape[1:])
+    csum = np.concatenate([pad, np.cumsum(filled, axis=0)])
+    csq = np.concatenate([pad, np.cumsum(filled * filled, axis=0)])
+    ccount = np.concatenate([pad, np.cumsum(valid, axis=0)])
+
+    end = np.arange(1, values.shape[0] + 1)
+    start = np.maximum(end - window, 0)
+    count = ccount[end] - ccount[start]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = (csum[end] - csum[start]) / count
+        var = (csq[end] - csq[start]) / count - mean * mean
+        std = np.sqrt(np.maximum(var, 0.0))
+        z = (values - mean) / std
+    z[(count < max(window // 2, 2)) | (std == 0)] = np.nan
+    return z
+
+
+class EmotionCyclePipeline:
+    def __init__(self, store=None, client=None, ladder=None, window=20):
+        self.store = store or LocalStore()
+        self.client = client
+        self.ladder = ladder  # 可选的 LimitUpLadder，用于补齐接口缺失的破板率
+        self.window = window
+        self.logger = logging.getLogger(__name__)
+
+        self.raw_names = list(RAW_SERIES)
+        self.dates = []
+        self.raw = np.zeros((0, len(self.raw_names)))
+        self.derived_names = []
+        self.derived = np.zeros((0, 0))
+
+    def fetch_day(self, day):
+        """拉取某日各情绪接口的返回并写入本地存储，非交易日直接跳过"""
+        day = normalize_day(day)
+        if not default_calendar().is_trading_day(day):
+            self.logger.info(f"{day} 不是交易日，跳过")
+            return
+        for endpoint in DAILY_ENDPOINTS:
+            payload = self.client.fetch_json(endpoint, Day=day)
+            self.store.put_payload(endpoint, day, payload)
+        self.logger.info(f"已保存 {day} 的情绪接口数据")
+
+    def fetch_money_effect_history(self):
+        """拉取效应历史，按日期拆分写入本地存储"""
+        rows = self.client.fetch_all_pages('GetMoneyDate', index_key='index')
+        for row in rows:
+            if isinstance(row, (list, tuple)) and len(row) >= 2:
+                self.store.put_payload('GetMoneyDate', row[0], {'value': row[1]})
+        self.logger.info(f"已保存 {len(rows)} 条赚钱效应历史")
+
+    def _raw_row(self, day):
+        """从本地存储组装某日的原始序列"""
+        payloads = {endpoint: self.store.get_payload(endpoint, day) for endpoint in DAILY_ENDPOINTS}
+        money = self.store.get_payload('GetMoneyDate', day)
+        row = np.full(len(self.raw_names), np.nan)
+        for i, name in enumerate(self.raw_names):
+            endpoint, path = RAW_SERIES[name]
+            if endpoint == 'GetMoneyDate':
+                row[i] = extract_value(money, ('value',)) if money else np.nan
+            elif payloads.get(endpoint) is not None:
+                row[i] = extract_value(payloads[endpoint], path)
+
+        broken_index = self.raw_names.index('broken_rate')
+        if np.isnan(row[broken_index]) and self.ladder is not None and day in self.ladder.dates:
+            row[broken_index] = self.ladder.broken_rates()[self.ladder.dates.index(day)] * 100
+        return row
+
+    def load(self):
+        """从缓存数组恢复，返回是否成功"""
+        meta = self.store.load_meta('emotion_cycle')
+        raw = self.store.load_array('emotion_raw')
+        derived = self.store.load_array('emotion_derived')
+        if meta is None or raw is None or derived is None or meta.get('raw_names') != self.raw_names:
+            return False
+        self.dates = list(meta['dates'])
+        self.derived_names = list(meta['derived_names'])
+        self.raw = np.array(raw)
+        self.derived = np.array(derived)
+        return True
+
+    def save(self):
+        self.store.save_array('emotion_raw', self.raw)
+        self.store.save_array('emotion_derived', self.derived)
+        self.store.save_meta('emotion_cycle', {
+            'dates': self.dates,
+            'raw_names': self.raw_names,
+            'derived_names': self.derived_names,
+            'window': self.window,
+        })
+
+    def pending_days(self):
+        """本地存储中尚未物化的日期"""
+        days = set()
+        for endpoint in DAILY_ENDPOINTS:
+            days.update(self.store.list_days(endpoint))
+        last = self.dates[-1] if self.dates else ''
+        return sorted(day for day in days if day > last)
+
+    def update(self):
+        """物化新交易日并只重算尾部指标，返回新增天数"""
+        new_days = self.pending_days()
+        if not new_days:
+            return 0
+
+        old_count = len(self.dates)
+        self.raw = np.vstack([self.raw, np.array([self._raw_row(day) for day in new_days])])
+        self.dates.extend(new_days)
+
+        # 滚动窗口和周期阶段只依赖前 window 天，从这里开始重算即可
+        start = max(old_count - self.window, 0)
+        names, tail = self.compute_indicators(self.raw[start:])
+        if self.derived.shape[1] != len(names):
+            start = 0
+            names, tail = self.compute_indicators(self.raw)
+            self.derived = np.zeros((0, len(names)))
+        self.derived_names = names
+        self.derived = np.vstack([self.derived[:old_count], tail[old_count - start:]])
+
+        self.save()
+        self.logger.info(f"情绪指标新增 {len(new_days)} 个交易日，最新日期 {self.dates[-1]}")
+        return len(new_days)
+
+    def compute_indicators(self, raw):
+        """由原始序列计算派生指标，返回 (名称列表, 矩阵)"""
+        column = {name: raw[:, i] for i, name in enumerate(self.raw_names)}
+        up, down = column['up_count'], column['down_count']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            column['advance_ratio'] = up / (up + down)
+
+        names = list(COMPOSITE_WEIGHTS)
+        values = np.column_stack([column[name] for name in names])
+        z = rolling_zscore(values, self.window)
+        weights = np.array([COMPOSITE_WEIGHTS[name] for name in names])
+
+        weighted = z * weights
+        valid = ~np.isnan(weighted)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            composite = np.where(valid.any(axis=1), np.nansum(weighted, axis=1) / valid.sum(axis=1), np.nan)
+        slope = np.concatenate([[np.nan], np.diff(composite)])
+
+        # 阶段：高位且上升为主升期，高位回落为盘顶期，低位继续下跌为退潮期，其余为混沌期
+        phase = np.zeros(len(composite))
+        phase[(composite > 0) & (slope >= 0)] = 1
+        phase[(composite > 0) & (slope < 0)] = 2
+        phase[(composite <= 0) & (slope < 0)] = 3
+        phase[np.isnan(composite)] = np.nan
+
+        derived_names = ['advance_ratio'] + [f"{name}_z" for name in names] + ['composite', 'phase']
+        matrix = np.column_stack([column['advance_ratio'], z, composite, phase])
+        return derived_names, matrix
+
+    def series(self, name):
+        """按名称取出原始或派生序列"""
+        if name in self.raw_names:
+            return self.raw[:, self.raw_names.index(name)]
+        return self.derived[:, self.derived_names.index(name)]
+
+    def phase_of(self, day):
+        """某日的情绪周期阶段名称"""
+        day = normalize_day(day)
+        if day not in self.dates:
+            return None
+        value = self.series('phase')[self.dates.index(day)]
+        return None if np.isnan(value) else PHASES[int(value)]
+
+    def render_chart(self, output_path='emotion_cycle_analysis.png', last_days=120):
+        """从缓存数组离线绘制情绪周期图，不请求接口"""
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+
+        dates = self.dates[-last_days:]
+        x = np.arange(len(dates))
+        fig, (ax_top, ax_bottom) = plt.subplots(2, 1, figsize=(14, 8), sharex=True)
+
+        ax_top.plot(x, self.series('broken_rate')[-last_days:], label='broken_rate')
+        ax_top.plot(x, self.series('limit_up_follow')[-last_days:], label='limit_up_follow')
+        ax_top.plot(x, self.series('money_effect')[-last_days:], label='money_effect')
+        ax_top.legend(loc='upper left')
+
+        composite = self.series('composite')[-last_days:]
+        phase = self.series('phase')[-last_days:]
+        ax_bottom.plot(x, composite, color='black', label='composite')
+        colors = {0: '#cccccc', 1: '#e74c3c', 2: '#f39c12', 3: '#3498db'}
+        for code, color in colors.items():
+            mask = phase == code
+            ax_bottom.fill_between(x, 0, composite, where=mask, color=color, alpha=0.4)
+        ax_bottom.axhline(0, color='grey', linewidth=0.5)
+        ax_bottom.legend(loc='upper left')
+
+        step = max(len(dates) // 10, 1)
+        ax_bottom.set_xticks(x[::step])
+        ax_bottom.set_xticklabels(dates[::step], rotation=30)
+        fig.tight_layout()
+        fig.savefig(output_path)
+        plt.close(fig)
+        self.logger.info(f"情绪周期图已保存至: {output_path}")
+        return output_path
+
+
+def main():
+    """主函数：物化本地已有数据并绘图"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    pipeline = EmotionCyclePipeline()
+    pipeline.load()
+    pipeline.update()
+
+    if not pipeline.dates:
+        print("本地存储中没有情绪接口数据，请先调用 fetch_day 拉取")
+        return
+
+    day = pipeline.dates[-1]
+    print(f"\n📊 {day} 情绪周期: {pipeline.phase_of(day)}")
+    for name in pipeline.derived_names:
+        print(f"   {name}: {pipeline.series(name)[-1]:.3f}")
+    pipeline.render_chart()
+
+
+if __name__ == "__main__":
+    main()
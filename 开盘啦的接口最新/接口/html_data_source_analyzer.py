@@ -12,13 +12,24 @@ import os
 from datetime import datetime
 from urllib.parse import urlparse
 
+from url_templates import URLTemplateIndex
+
+DEFAULT_HTML_PATH = r"C:\吴QQ的AIR\BaiduSyncdisk\600 - 原桌面\7-25-2.html"
+
 class HTMLDataSourceAnalyzer:
-    def __init__(self):
+    def __init__(self, configure_logging=True):
+        """configure_logging=False 时沿用调用方（如 kpl_cli）已配置的日志"""
         self.log_dir = "log"
-        self.setup_logging()
+        if configure_logging:
+            self.setup_logging()
+        else:
+            self.logger = logging.getLogger(__name__)
+        # 每个URL模板只保留首次出现的一条明细，完整的计数和样例取值在模板索引中
         self.api_endpoints = []
         self.external_resources = []
         self.data_sources = []
+        self.api_templates = URLTemplateIndex()
+        self.source_templates = URLTemplateIndex()
         
     def setup_logging(self):
         """设置日志系统"""
@@ -37,6 +48,14 @@ class HTMLDataSourceAnalyzer:
         )
         self.logger = logging.getLogger(__name__)
     
+    def record_url(self, templates, bucket, info):
+        """把URL归入模板索引，属于新模板时才加入明细列表，返回是否为新模板"""
+        extra = {key: value for key, value in info.items() if key not in ('url', 'headers')}
+        is_new = templates.add(info['url'], **extra)
+        if is_new:
+            bucket.append(info)
+        return is_new
+
     def analyze_html_file(self, file_path):
         """分析HTML文件"""
         self.logger.info(f"开始分析HTML文件: {file_path}")
@@ -84,8 +103,8 @@ class HTMLDataSourceAnalyzer:
                     'method': 'GET',  # 默认GET，实际可能需要更细致的分析
                     'purpose': self.guess_api_purpose(match)
                 }
-                self.api_endpoints.append(endpoint_info)
-                self.logger.info(f"发现API端点: {match}")
+                if self.record_url(self.api_templates, self.api_endpoints, endpoint_info):
+                    self.logger.info(f"发现API端点: {match}")
         
         # 匹配XMLHttpRequest或其他AJAX请求
         ajax_patterns = [
@@ -110,8 +129,8 @@ class HTMLDataSourceAnalyzer:
                     'method': method.upper(),
                     'purpose': self.guess_api_purpose(url)
                 }
-                self.api_endpoints.append(endpoint_info)
-                self.logger.info(f"发现AJAX请求: {method} {url}")
+                if self.record_url(self.api_templates, self.api_endpoints, endpoint_info):
+                    self.logger.info(f"发现AJAX请求: {method} {url}")
     
     def extract_external_resources(self, html_content):
         """提取外部资源"""
@@ -168,8 +187,8 @@ class HTMLDataSourceAnalyzer:
                     'url': match,
                     'purpose': self.guess_image_purpose(match)
                 }
-                self.data_sources.append(image_info)
-                self.logger.info(f"发现图片源: {match}")
+                if self.record_url(self.source_templates, self.data_sources, image_info):
+                    self.logger.info(f"发现图片源: {match}")
     
     def extract_javascript_urls(self, html_content):
         """提取JavaScript中的URL"""
@@ -196,8 +215,8 @@ class HTMLDataSourceAnalyzer:
                     'url': match,
                     'purpose': self.guess_api_purpose(match)
                 }
-                self.data_sources.append(url_info)
-                self.logger.info(f"发现JavaScript URL: {match}")
+                if self.record_url(self.source_templates, self.data_sources, url_info):
+                    self.logger.info(f"发现JavaScript URL: {match}")
     
     def analyze_fetch_requests(self, html_content):
         """分析fetch请求的详细信息"""
@@ -236,8 +255,8 @@ class HTMLDataSourceAnalyzer:
                 'purpose': self.guess_api_purpose(url),
                 'domain': urlparse(url).netloc
             }
-            self.api_endpoints.append(fetch_info)
-            self.logger.info(f"详细fetch请求: {method} {url}")
+            if self.record_url(self.api_templates, self.api_endpoints, fetch_info):
+                self.logger.info(f"详细fetch请求: {method} {url}")
     
     def analyze_data_flow(self, html_content):
         """分析数据流"""
@@ -328,19 +347,25 @@ class HTMLDataSourceAnalyzer:
         self.logger.info("生成分析报告")
         
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        api_templates = self.api_templates.templates()
+        source_templates = self.source_templates.templates()
         report = {
             'timestamp': timestamp,
             'analysis_time': datetime.now().isoformat(),
             'file_path': file_path,
             'summary': {
-                'total_api_endpoints': len(self.api_endpoints),
+                'total_api_endpoints': self.api_templates.total,
                 'total_external_resources': len(self.external_resources),
-                'total_data_sources': len(self.data_sources),
+                'total_data_sources': self.source_templates.total,
+                'api_template_count': len(api_templates),
+                'data_source_template_count': len(source_templates),
                 'unique_domains': len(set(urlparse(item['url']).netloc for item in self.api_endpoints + self.external_resources + self.data_sources if 'url' in item))
             },
             'api_endpoints': self.api_endpoints,
+            'api_templates': api_templates,
             'external_resources': self.external_resources,
             'data_sources': self.data_sources,
+            'data_source_templates': source_templates,
             'domain_analysis': self.analyze_domains(),
             'technology_stack': self.analyze_technology_stack(),
             'data_flow_patterns': self.analyze_data_flow_patterns()
@@ -434,12 +459,10 @@ class HTMLDataSourceAnalyzer:
         
         return patterns
 
-def main():
+def main(file_path=None, configure_logging=True):
     """主函数"""
-    file_path = r"C:\吴QQ的AIR\BaiduSyncdisk\600 - 原桌面\7-25-2.html"
-    
-    analyzer = HTMLDataSourceAnalyzer()
-    report = analyzer.analyze_html_file(file_path)
+    analyzer = HTMLDataSourceAnalyzer(configure_logging)
+    report = analyzer.analyze_html_file(file_path or DEFAULT_HTML_PATH)
     
     if report:
         print("\n" + "="*80)
@@ -454,28 +477,30 @@ def main():
         # 统计概览
         summary = report['summary']
         print(f"\n📊 统计概览:")
-        print(f"   API端点数量: {summary['total_api_endpoints']}")
+        print(f"   API端点数量: {summary['total_api_endpoints']} (归纳为 {summary['api_template_count']} 个模板)")
         print(f"   外部资源数量: {summary['total_external_resources']}")
-        print(f"   数据源数量: {summary['total_data_sources']}")
+        print(f"   数据源数量: {summary['total_data_sources']} (归纳为 {summary['data_source_template_count']} 个模板)")
         print(f"   涉及域名数量: {summary['unique_domains']}")
         
         # API端点详情
         print(f"\n🔗 API端点详情:")
-        for i, endpoint in enumerate(report['api_endpoints'], 1):
-            print(f"   {i}. {endpoint['url']}")
+        for i, endpoint in enumerate(report['api_templates'], 1):
+            print(f"   {i}. {endpoint['template']}  ×{endpoint['count']}")
             print(f"      方法: {endpoint.get('method', 'GET')}")
             print(f"      用途: {endpoint.get('purpose', '未知')}")
             print(f"      类型: {endpoint.get('type', 'API')}")
-            if endpoint.get('headers'):
-                print(f"      请求头: {endpoint['headers']}")
+            for name, values in endpoint['params'].items():
+                print(f"      参数 {name}: {values['distinct']}{'+' if values['more'] else ''} 种取值，如 {', '.join(values['samples'])}")
             print()
         
         # 数据源详情
         print(f"\n📈 数据源详情:")
-        for i, source in enumerate(report['data_sources'], 1):
-            print(f"   {i}. {source['url']}")
+        for i, source in enumerate(report['data_source_templates'], 1):
+            print(f"   {i}. {source['template']}  ×{source['count']}")
             print(f"      类型: {source.get('type', '未知')}")
             print(f"      用途: {source.get('purpose', '未知')}")
+            for values in source['path_values'].values():
+                print(f"      路径取值: {values['distinct']}{'+' if values['more'] else ''} 种，如 {', '.join(values['samples'])}")
             print()
         
         # 域名分析
@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分时序列压缩存储
+功能：把 GetStockTrend(当日分时) / GetVolTurIncremental(板块历史分时) 的分钟数据对齐到固定的241点网格，
+      价格按比例放大取整后做差分+zigzag编码，按每通道最小整数宽度排列后整块zlib压缩；
+      按 (接口, 代码, 日期) 随机读取，解码直接写入NumPy数组
+
+压缩比：价格和均价通道差分后很窄，体积主要由成交量通道决定，成交量逐分钟近乎随机，
+        差分和zlib都压不下去。在模拟的个股分时（价格按最小变动价位随机游走，成交量对数正态、
+        早盘尾盘放量）上，相对原始JSON约为 9.7x，略低于 10x 的目标；真实数据的压缩比取决于
+        成交量的分布（例如成交量都是100股的整数倍时会更高），可用 stats() 在本地数据上核对
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from kpl_client import extract_rows
+from local_store import LocalStore, normalize_day
+from trading_calendar import market_time
+
+# A股分钟网格：09:30-11:30 共121点，13:01-15:00 共120点
+MINUTE_GRID = np.array(
+    [h * 100 + m for h, m in ((9 + (30 + i) // 60, (30 + i) % 60) for i in range(121))]
+    + [h * 100 + m for h, m in ((13 + (1 + i) // 60, (1 + i) % 60) for i in range(120))],
+    dtype=np.int32
+)
+GRID_SIZE = len(MINUTE_GRID)
+
+# 通道定义：接口 -> ((名称, 数组行下标, 字典行字段名, 放大倍数), ...)，第0列为时间。
+# 价格类通道放大100倍按分取整；量类通道为整数
+TREND_LAYOUTS = {
+    'GetStockTrend': (
+        ('price', 1, 'Price', 100),
+        ('avg_price', 2, 'AvgPrice', 100),
+        ('volume', 3, 'Volume', 1),
+    ),
+    'GetVolTurIncremental': (
+        ('value', 1, 'Value', 100),
+        ('volume', 2, 'Volume', 1),
+        ('turnover', 3, 'Turnover', 100),
+    ),
+}
+
+# 量类通道缺失的分钟补0，其余通道沿用上一分钟的值
+ZERO_FILL_CHANNELS = ('volume', 'turnover')
+
+# 分时返回中序列所在的字段，找不到时退回通用的列表字段
+TREND_KEYS = ('trend', 'Trend', 'line', 'Line')
+
+MAGIC = b'KT'
+VERSION = 1
+HEADER = struct.Struct('<2sBBH')      # 魔数、版本、通道数、点数
+CHANNEL_HEADER = struct.Struct('<qBB')  # 首值、整数宽度(字节)、是否差分
+WIDTH_DTYPES = {1: np.uint8, 2: np.uint16, 4: np.uint32, 8: np.uint64}
+
+
+def trend_rows(payload):
+    """取出分时返回中的分钟行"""
+    if isinstance(payload, dict):
+        for key in TREND_KEYS:
+            if isinstance(payload.get(key), list):
+                return payload[key]
+    return extract_rows(payload)
+
+
+def minute_of(value):
+    """把 '09:30' / '0930' / 930 / '09:30:00' / '093000' / yyyymmddHHMM[SS] / 时间戳 统一成 HHMM 整数，
+    时间戳按北京时间换算，无法解析时返回-1"""
+    text = ''.join(ch for ch in str(value) if ch.isdigit())
+    if not text:
+        return -1
+    if len(text) <= 4:
+        number = int(text)
+    elif len(text) <= 6:  # HHMMSS，小时可能只有一位
+        number = int(text.zfill(6)[:4])
+    elif len(text) in (12, 14):  # yyyymmddHHMM / yyyymmddHHMMSS
+        number = int(text[8:12])
+    elif len(text) >= 10:  # 10位秒级、13位毫秒级时间戳
+        number = int(text)
+        stamp = market_time(number / 1000 if number > 1e11 else number)
+        return stamp.hour * 100 + stamp.minute
+    else:
+        return -1
+    return number if number < 2400 and number % 100 < 60 else -1
+
+
+def to_grid(rows, layout):
+    """把分钟行对齐到网格，返回 (放大后的整数矩阵 通道×点, 有效点掩码)"""
+    scaled = np.zeros((len(layout), GRID_SIZE), dtype=np.int64)
+    mask = np.zeros(GRID_SIZE, dtype=bool)
+    if not rows:
+        return scaled, mask
+
+    times = np.array([minute_of(row.get('Time', row.get('time')) if isinstance(row, dict) else row[0])
+                      for row in rows], dtype=np.int32)
+    slots = np.searchsorted(MINUTE_GRID, times)
+    slots = np.minimum(slots, GRID_SIZE - 1)
+    valid = MINUTE_GRID[slots] == times
+    slots = slots[valid]
+    mask[slots] = True
+
+    for c, (name, index, key, scale) in enumerate(layout):
+        column = np.empty(len(rows))
+        for i, row in enumerate(rows):
+            value = row.get(key) if isinstance(row, dict) else (row[index] if index < len(row) else None)
+            try:
+                column[i] = float(value)
+            except (TypeError, ValueError):
+                column[i] = np.nan
+        column = column[valid]
+        ok = ~np.isnan(column)
+        channel = np.zeros(GRID_SIZE)
+        channel[slots[ok]] = column[ok]
+        present = np.zeros(GRID_SIZE, dtype=bool)
+        present[slots[ok]] = True
+        if name not in ZERO_FILL_CHANNELS and present.any():
+            # 前向填充：取最近一个有值的位置，开头缺失的用第一个有效值
+            last = np.where(present, np.arange(GRID_SIZE), 0)
+            np.maximum.accumulate(last, out=last)
+            last[:np.argmax(present)] = np.argmax(present)
+            channel = channel[last]
+        scaled[c] = np.rint(channel * scale).astype(np.int64)
+    return scaled, mask
+
+
+def encode(scaled, mask):
+    """编码整数矩阵 (通道×点) 和有效点掩码为字节串"""
+    channels, points = scaled.shape
+    header = [HEADER.pack(MAGIC, VERSION, channels, points)]
+    body = []
+    for c in range(channels):
+        # 价格逐分钟变化小，差分后很窄；成交量前后无关，差分反而变宽，按宽度择优
+        candidates = []
+        for delta, values in ((1, np.diff(scaled[c])), (0, scaled[c, 1:])):
+            zigzag = ((values << 1) ^ (values >> 63)).astype(np.uint64)
+            top = int(zigzag.max()) if zigzag.size else 0
+            width = next(w for w in (1, 2, 4, 8) if top < 1 << (8 * w))
+            candidates.append((width, -delta, zigzag))
+        width, delta, zigzag = min(candidates, key=lambda item: item[:2])
+        header.append(CHANNEL_HEADER.pack(int(scaled[c, 0]) if points else 0, width, -delta))
+        # 按字节平面重排，高位字节大多相同，zlib压缩率明显更高
+        planes = zigzag.astype(WIDTH_DTYPES[width]).view(np.uint8).reshape(-1, width).T
+        body.append(planes.tobytes())
+    header.append(np.packbits(mask).tobytes())
+    return b''.join(header) + zlib.compress(b''.join(body), 6)
+
+
+def decode(blob, scales=None, out=None):
+    """解码为 (通道×点) 的float64数组；给定 out 时直接写入，返回 (数组, 有效点掩码)"""
+    magic, version, channels, points = HEADER.unpack_from(blob, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("不是有效的分时编码数据")
+    offset = HEADER.size
+    channel_headers = []
+    for _ in range(channels):
+        channel_headers.append(CHANNEL_HEADER.unpack_from(blob, offset))
+        offset += CHANNEL_HEADER.size
+    mask_bytes = (points + 7) // 8
+    mask = np.unpackbits(np.frombuffer(blob, dtype=np.uint8, count=mask_bytes, offset=offset))[:points].astype(bool)
+    body = zlib.decompress(blob[offset + mask_bytes:])
+
+    if out is None:
+        out = np.empty((channels, points))
+    position = 0
+    for c, (first, width, delta) in enumerate(channel_headers):
+        size = width * (points - 1)
+        planes = np.frombuffer(body, dtype=np.uint8, count=size, offset=position).reshape(width, -1)
+        position += size
+        zigzag = np.ascontiguousarray(planes.T).view(WIDTH_DTYPES[width]).ravel().astype(np.int64)
+        values = (zigzag >> 1) ^ -(zigzag & 1)
+        out[c, 0] = first
+        if delta:
+            np.cumsum(values, out=out[c, 1:])
+            out[c, 1:] += first
+        else:
+            out[c, 1:] = values
+        if scales is not None and scales[c] != 1:
+            out[c] /= scales[c]
+    return out, mask
+
+
+class IntradayStore:
+    def __init__(self, path=os.path.join("data", "intraday.db")):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.setup_database()
+
+    def setup_database(self):
+        with self._lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS series (
+                    endpoint TEXT NOT NULL,
+                    symbol TEXT NOT NULL,
+                    day TEXT NOT NULL,
+                    raw_size INTEGER NOT NULL DEFAULT 0,
+                    blob BLOB NOT NULL,
+                    PRIMARY KEY (endpoint, symbol, day)
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_series_day ON series (endpoint, day)")
+            self.conn.commit()
+
+    @staticmethod
+    def channels(endpoint):
+        return [name for name, _, _, _ in TREND_LAYOUTS[endpoint]]
+
+    @staticmethod
+    def _scales(endpoint):
+        return [scale for _, _, _, scale in TREND_LAYOUTS[endpoint]]
+
+    def put_many(self, endpoint, items):
+        """批量写入 (代码, 日期, 接口返回, 原始大小) ，返回写入条数"""
+        layout = TREND_LAYOUTS[endpoint]
+        records = []
+        for symbol, day, payload, raw_size in items:
+            blob = encode(*to_grid(trend_rows(payload), layout))
+            records.append((endpoint, str(symbol), normalize_day(day), raw_size, blob))
+        with self._lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO series (endpoint, symbol, day, raw_size, blob) VALUES (?, ?, ?, ?, ?)",
+                records
+            )
+            self.conn.commit()
+        return len(records)
+
+    def put(self, endpoint, symbol, day, payload, raw_size=0):
+        self.put_many(endpoint, [(symbol, day, payload, raw_size)])
+
+    def get(self, endpoint, symbol, day):
+        """读取某代码某日的分时，返回 (通道×点 数组, 有效点掩码)，不存在时返回None"""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT blob FROM series WHERE endpoint = ? AND symbol = ? AND day = ?",
+                (endpoint, str(symbol), normalize_day(day))
+            ).fetchone()
+        return decode(row[0], self._scales(endpoint)) if row else None
+
+    def load_day(self, endpoint, day, symbols=None):
+        """读取某日全部（或指定）代码，返回 (代码列表, 代码×通道×点 数组, 代码×点 掩码)"""
+        day = normalize_day(day)
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT symbol, blob FROM series WHERE endpoint = ? AND day = ? ORDER BY symbol",
+                (endpoint, day)
+            ).fetchall()
+        if symbols is not None:
+            wanted = set(str(s) for s in symbols)
+            rows = [row for row in rows if row[0] in wanted]
+
+        scales = self._scales(endpoint)
+        values = np.empty((len(rows), len(scales), GRID_SIZE))
+        masks = np.empty((len(rows), GRID_SIZE), dtype=bool)
+        for i, (_, blob) in enumerate(rows):
+            _, masks[i] = decode(blob, scales, out=values[i])
+        return [row[0] for row in rows], values, masks
+
+    def ingest_from_store(self, store, endpoint, batch_size=500):
+        """把本地存储里的JSON分时转存为压缩格式，已转存的跳过，返回新增条数"""
+        with self._lock:
+            existing = set(self.conn.execute("SELECT symbol, day FROM series WHERE endpoint = ?", (endpoint,)))
+        added = 0
+        batch = []
+        for day, key, payload in store.iter_payloads(endpoint):
+            if (key, day) in existing:
+                continue
+            batch.append((key, day, payload, len(json.dumps(payload, ensure_ascii=False).encode('utf-8'))))
+            if len(batch) >= batch_size:
+                added += self.put_many(endpoint, batch)
+                batch = []
+        if batch:
+            added += self.put_many(endpoint, batch)
+        self.logger.info(f"{endpoint} 转存 {added} 条分时")
+        return added
+
+    def stats(self, endpoint):
+        """压缩统计：条数、原始JSON字节数、压缩后字节数、压缩比"""
+        with self._lock:
+            count, raw, packed = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(raw_size), 0), COALESCE(SUM(LENGTH(blob)), 0) FROM series WHERE endpoint = ?",
+                (endpoint,)
+            ).fetchone()
+        return {'count': count, 'raw_bytes': raw, 'packed_bytes': packed,
+                'ratio': raw / packed if packed else float('nan')}
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+def main():
+    """主函数：把本地存储中的分时转存为压缩格式，并测量解码吞吐"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    store = LocalStore()
+    intraday = IntradayStore()
+    for endpoint in TREND_LAYOUTS:
+        intraday.ingest_from_store(store, endpoint)
+        stats = intraday.stats(endpoint)
+        if not stats['count']:
+            continue
+        print(f"\n📦 {endpoint}: {stats['count']} 条，JSON {stats['raw_bytes'] / 1e6:.1f} MB -> "
+              f"{stats['packed_bytes'] / 1e6:.1f} MB，压缩比 {stats['ratio']:.1f}x")
+
+        day = intraday.conn.execute("SELECT MAX(day) FROM series WHERE endpoint = ?", (endpoint,)).fetchone()[0]
+        started = time.perf_counter()
+        symbols, values, _ = intraday.load_day(endpoint, day)
+        elapsed = time.perf_counter() - started
+        points = values.shape[0] * values.shape[2]
+        print(f"   {day} 解码 {len(symbols)} 个代码 {points} 点，耗时 {elapsed * 1000:.1f} ms，"
+              f"{points / elapsed / 1e6:.2f} M点/秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+开盘啦统一命令行入口
+功能：用一个入口替代各个一次性脚本和分析工具的 main()，子命令 fetch / sweep / analyze-api /
+      analyze-html / show 只在执行时才导入各自依赖的模块，模块顶层只导入标准库中最轻的部分；
+      import-time 子命令测量启动导入耗时并与预算比较；daemon 子命令常驻一个进程，
+      加 --daemon 或设置 KPL_CLI_DAEMON=1 时把命令转发给它执行，省去解释器启动和模块导入
+
+用法示例：
+    python kpl_cli.py fetch 精选                      # 原 代码示例-精选.py
+    python kpl_cli.py fetch 大单 StockID=300339       # 原 大单代码.py
+    python kpl_cli.py fetch 板块日K StockID=801088    # 原 板块历史日k线.py
+    python kpl_cli.py fetch 市场动向                  # 原 复盘啦市场动向.py
+    python kpl_cli.py fetch 精选历史 Date=2023-06-13  # 原 稿纸21.py
+    python kpl_cli.py fetch GetDayZhangTing StockID=002456 --all-pages
+"""
+
+import os
+import sys
+
+# 原一次性脚本对应的预设：名称 -> (接口, 默认参数)
+PRESETS = {
+    '精选': ('RealRankingInfo', {'ZSType': '7'}),
+    '大单': ('GetMainMonitor_w30', {'StockID': '300339'}),
+    '板块日K': ('GetPlateKLineDay', {'StockID': '801088'}),
+    '市场动向': ('GetYTFP_BKHX', {}),
+    '精选历史': ('HisRealRankingInfo', {}),
+}
+
+# 只导入本模块（含 argparse）的耗时预算，单位毫秒
+IMPORT_BUDGET_MS = 50
+
+DAEMON_HOST = '127.0.0.1'
+DAEMON_PORT = int(os.environ.get('KPL_CLI_PORT', '47651'))
+DAEMON_KEY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "kpl_cli.key")
+
+_client = None
+
+
+def get_client():
+    """进程内复用同一个客户端，常驻模式下连接池跨命令保留；
+    客户端带盘前预热的缓存（cache_warmer.CachedClient），命中计数在每条命令结束后累加保存"""
+    global _client
+    if _client is None:
+        from cache_warmer import CachedClient
+
+        _client = CachedClient()
+    return _client
+
+
+def save_client_stats():
+    if _client is not None:
+        try:
+            _client.save_stats()
+        except Exception as e:
+            print(f"⚠️ 缓存命中计数保存失败: {str(e)}", file=sys.stderr)
+
+
+def parse_params(items):
+    """把 key=value 列表解析为参数字典"""
+    params = {}
+    for item in items:
+        key, sep, value = item.partition('=')
+        if not sep:
+            raise SystemExit(f"参数格式应为 key=value: {item}")
+        params[key] = value
+    return params
+
+
+def cmd_fetch(args):
+    import json
+
+    from kpl_client import ENDPOINTS, extract_rows
+
+    if args.list:
+        for name, spec in ENDPOINTS.items():
+            print(f"{name}\t{spec['host']}\t{spec['c']}.{spec['a']}")
+        for name, (endpoint, params) in PRESETS.items():
+            print(f"{name}\t-> {endpoint} {params}")
+        return 0
+    if not args.endpoint:
+        raise SystemExit("请指定接口名或预设名，--list 查看全部")
+
+    endpoint, params = PRESETS.get(args.endpoint, (args.endpoint, {}))
+    params = dict(params, **parse_params(args.params))
+    client = get_client()
+    if args.url:
+        print(client.build_url(endpoint, **params))
+        return 0
+    if args.all_pages:
+        rows = client.fetch_all_pages(endpoint, index_key=args.index_key, **params)
+        payload = {'list': rows}
+    else:
+        payload = client.fetch_json(endpoint, **params)
+        rows = extract_rows(payload)
+
+    if args.raw or not rows:
+        print(json.dumps(payload, ensure_ascii=False))
+    else:
+        for row in rows:
+            print(json.dumps(row, ensure_ascii=False))
+        print(f"共 {len(rows)} 行", file=sys.stderr)
+    return 0
+
+
+def cmd_sweep(args):
+    import sharded_sweep
+
+    sharded_sweep.main(args.sweep_args)
+    return 0
+
+
+def cmd_analyze_api(args):
+    import api_analyzer
+
+    api_analyzer.main(args.url, configure_logging=False)
+    return 0
+
+
+def cmd_analyze_html(args):
+    import html_data_source_analyzer
+
+    html_data_source_analyzer.main(args.path, configure_logging=False)
+    return 0
+
+
+def cmd_show(args):
+    if args.what == 'results':
+        import show_results
+
+        show_results.show_results(args.path or "log")
+    else:
+        import show_html_analysis
+
+        show_html_analysis.analyze_html_simple(args.path or show_html_analysis.DEFAULT_HTML_PATH)
+    return 0
+
+
+def cmd_export(args):
+    import static_export
+
+    static_export.main(args.export_args)
+    return 0
+
+
+def cmd_anomaly(args):
+    import anomaly_detector
+
+    anomaly_detector.main(args.anomaly_args)
+    return 0
+
+
+def cmd_reasons(args):
+    import reason_index
+
+    reason_index.main(args.reason_args)
+    return 0
+
+
+def cmd_auction(args):
+    import auction_capture
+
+    auction_capture.main(args.auction_args)
+    return 0
+
+
+def cmd_new_high(args):
+    import new_high
+
+    new_high.main(args.new_high_args)
+    return 0
+
+
+def measure_import(module, runs=5):
+    """在新解释器中用 -X importtime 测量导入 module 的累计耗时（毫秒），取多次中的最小值"""
+    import subprocess
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    best = None
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                                cwd=here, capture_output=True, text=True)
+        total = 0
+        for line in result.stderr.splitlines():
+            # import time: self [us] | cumulative | imported package
+            parts = line.split('|')
+            if len(parts) == 3 and parts[2].strip() == module:
+                total = int(parts[1].strip()) / 1000
+        best = total if best is None else min(best, total)
+    return best
+
+
+def cmd_import_time(args):
+    startup = measure_import('kpl_cli') + measure_import('argparse')
+    print(f"启动导入: {startup:.1f} ms (预算 {IMPORT_BUDGET_MS} ms)")
+    for command, module in (('fetch', 'kpl_client'), ('sweep', 'sharded_sweep'),
+                            ('analyze-api', 'api_analyzer'), ('analyze-html', 'html_data_source_analyzer')):
+        print(f"   {command}: 按需导入 {module} {measure_import(module, runs=1):.1f} ms")
+    return 0 if startup <= IMPORT_BUDGET_MS else 1
+
+
+def build_parser():
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='kpl_cli', description="开盘啦数据工具统一入口")
+    parser.add_argument('-v', '--verbose', action='store_true', help="输出INFO级别日志")
+    parser.add_argument('--daemon', action='store_true', help="转发给常驻进程执行，常驻进程不在时本地执行")
+    sub = parser.add_subparsers(dest='command')
+
+    fetch = sub.add_parser('fetch', help="请求一个接口并逐行打印列表数据")
+    fetch.add_argument('endpoint', nargs='?', help="注册表中的接口名或预设名")
+    fetch.add_argument('params', nargs='*', help="key=value 形式的请求参数")
+    fetch.add_argument('--all-pages', action='store_true', help="按页拉取全部数据")
+    fetch.add_argument('--index-key', default='Index', help="分页参数名，部分接口为小写 index")
+    fetch.add_argument('--raw', action='store_true', help="打印完整JSON")
+    fetch.add_argument('--url', action='store_true', help="只打印构造出的URL")
+    fetch.add_argument('--list', action='store_true', help="列出已注册的接口和预设")
+    fetch.set_defaults(handler=cmd_fetch)
+
+    sweep = sub.add_parser('sweep', help="分片扫描，其余参数原样交给 sharded_sweep")
+    sweep.add_argument('sweep_args', nargs=argparse.REMAINDER)
+    sweep.set_defaults(handler=cmd_sweep)
+
+    analyze_api = sub.add_parser('analyze-api', help="解析接口URL并生成诊断报告")
+    analyze_api.add_argument('url', nargs='?')
+    analyze_api.set_defaults(handler=cmd_analyze_api)
+
+    analyze_html = sub.add_parser('analyze-html', help="分析HTML文件中的数据来源")
+    analyze_html.add_argument('path', nargs='?')
+    analyze_html.set_defaults(handler=cmd_analyze_html)
+
+    show = sub.add_parser('show', help="显示已保存的API诊断结果或简化的HTML分析")
+    show.add_argument('what', choices=('results', 'html'))
+    show.add_argument('path', nargs='?', help="results 为日志目录，html 为HTML文件路径")
+    show.set_defaults(handler=cmd_show)
+
+    export = sub.add_parser('export', help="导出前端静态快照，其余参数原样交给 static_export")
+    export.add_argument('export_args', nargs=argparse.REMAINDER)
+    export.set_defaults(handler=cmd_export)
+
+    anomaly = sub.add_parser('anomaly', help="全市场盘中异动检测，其余参数原样交给 anomaly_detector")
+    anomaly.add_argument('anomaly_args', nargs=argparse.REMAINDER)
+    anomaly.set_defaults(handler=cmd_anomaly)
+
+    reasons = sub.add_parser('reasons', help="涨停原因全文检索，其余参数原样交给 reason_index")
+    reasons.add_argument('reason_args', nargs=argparse.REMAINDER)
+    reasons.set_defaults(handler=cmd_reasons)
+
+    auction = sub.add_parser('auction', help="集合竞价高频采集，其余参数原样交给 auction_capture")
+    auction.add_argument('auction_args', nargs=argparse.REMAINDER)
+    auction.set_defaults(handler=cmd_auction)
+
+    new_high = sub.add_parser('new-high', help="本地计算N日新高/新低，其余参数原样交给 new_high")
+    new_high.add_argument('new_high_args', nargs=argparse.REMAINDER)
+    new_high.set_defaults(handler=cmd_new_high)
+
+    import_time = sub.add_parser('import-time', help="测量启动导入耗时，超出预算时退出码为1")
+    import_time.set_defaults(handler=cmd_import_time)
+
+    daemon = sub.add_parser('daemon', help="常驻运行，接收 --daemon 转发的命令")
+    daemon.set_defaults(handler=cmd_daemon)
+    return parser
+
+
+def run(argv):
+    """解析并执行一条命令，返回退出码"""
+    parser = build_parser()
+    try:
+        args = parser.parse_args(argv)
+    except SystemExit as e:
+        return e.code
+    if args.command is None:
+        parser.print_help()
+        return 2
+
+    import logging
+
+    root = logging.getLogger()
+    if not root.handlers:
+        logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    root.setLevel(logging.INFO if args.verbose else logging.WARNING)
+    try:
+        return args.handler(args)
+    except SystemExit as e:
+        if isinstance(e.code, str):
+            print(e.code, file=sys.stderr)
+            return 2
+        return e.code or 0
+    except Exception as e:
+        print(f"❌ {type(e).__name__}: {str(e)}", file=sys.stderr)
+        return 1
+    finally:
+        save_client_stats()
+
+
+def _save_daemon_key(key):
+    """监听成功后才写入认证密钥，避免端口被占用时覆盖正在运行的常驻进程的密钥；
+    密钥文件只允许本用户读写，其他本地用户拿不到密钥就无法向常驻进程发命令"""
+    directory = os.path.dirname(DAEMON_KEY_PATH)
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    fd = os.open(DAEMON_KEY_PATH, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    try:
+        if hasattr(os, 'fchmod'):
+            # 文件已存在时 os.open 不改权限，这里补上
+            os.fchmod(fd, 0o600)
+        os.write(fd, key)
+    finally:
+        os.close(fd)
+
+
+def _remove_daemon_key():
+    if os.path.exists(DAEMON_KEY_PATH):
+        os.remove(DAEMON_KEY_PATH)
+
+
+def cmd_daemon(args):
+    """逐条执行转发来的命令：切换到调用方的工作目录，捕获输出后连同退出码一起返回"""
+    import io
+    import logging
+    from contextlib import redirect_stderr, redirect_stdout
+    from multiprocessing.connection import Listener
+
+    import atexit
+    import signal
+
+    home = os.getcwd()
+    key = os.urandom(32)
+    with Listener((DAEMON_HOST, DAEMON_PORT), authkey=key) as listener:
+        # kill 发出的 SIGTERM 按 Ctrl+C 处理，退出循环后删除密钥；atexit 兜底其他正常退出
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+        atexit.register(_remove_daemon_key)
+        _save_daemon_key(key)
+        logging.warning(f"kpl_cli 常驻进程已启动: {DAEMON_HOST}:{DAEMON_PORT}")
+        try:
+            while True:
+                try:
+                    conn = listener.accept()
+                except KeyboardInterrupt:
+                    break
+                except Exception as e:
+                    logging.warning(f"拒绝连接: {str(e)}")
+                    continue
+                with conn:
+                    try:
+                        request = conn.recv()
+                        out, err = io.StringIO(), io.StringIO()
+                        os.chdir(request['cwd'])
+                        with redirect_stdout(out), redirect_stderr(err):
+                            code = run(request['argv']) if request['argv'][:1] != ['daemon'] else 2
+                        conn.send({'code': code, 'stdout': out.getvalue(), 'stderr': err.getvalue()})
+                    except (EOFError, OSError):
+                        pass
+                    finally:
+                        os.chdir(home)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            _remove_daemon_key()
+    return 0
+
+
+def forward_to_daemon(argv):
+    """把命令转发给常驻进程，返回退出码；常驻进程不可用时返回 None"""
+    from multiprocessing import AuthenticationError
+    from multiprocessing.connection import Client
+
+    try:
+        with open(DAEMON_KEY_PATH, 'rb') as f:
+            key = f.read()
+        conn = Client((DAEMON_HOST, DAEMON_PORT), authkey=key)
+    except (OSError, EOFError, AuthenticationError):
+        return None
+    with conn:
+        conn.send({'argv': argv, 'cwd': os.getcwd()})
+        reply = conn.recv()
+    sys.stdout.write(reply['stdout'])
+    sys.stderr.write(reply['stderr'])
+    return reply['code']
+
+
+def main(argv=None):
+    """主函数：加 --daemon 或设置 KPL_CLI_DAEMON=1 时优先转发给常驻进程"""
+    argv = list(sys.argv[1:] if argv is None else argv)
+    use_daemon = '--daemon' in argv or os.environ.get('KPL_CLI_DAEMON') == '1'
+    argv = [arg for arg in argv if arg != '--daemon']
+    if use_daemon and argv[:1] != ['daemon']:
+        code = forward_to_daemon(argv)
+        if code is not None:
+            return code
+    return run(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+开盘啦接口客户端
+功能：统一构造开盘啦(longhuvip)接口URL、发送请求并解析返回的列表数据
+"""
+
+import json
+import logging
+from urllib.parse import urlencode
+
+# 开盘啦各服务域名
+HOSTS = {
+    'hq': 'https://apphq.longhuvip.com/w1/api/index.php',
+    'his': 'https://apphis.longhuvip.com/w1/api/index.php',
+    'hwhq': 'https://apphwhq.longhuvip.com/w1/api/index.php',
+    'article': 'https://apparticle.longhuvip.com/w1/api/index.php',
+}
+
+# 公共设备参数
+DEFAULT_DEVICE_PARAMS = {
+    'PhoneOSNew': '1',
+    'DeviceID': 'ffffffff-e91e-5efd-ffff-ffffa460846b',
+    'VerSion': '5.11.0.6',
+}
+
+# 接口注册表：名称 -> 域名、控制器、方法及默认参数（参数取自同目录下的接口说明txt）
+ENDPOINTS = {
+    # 历史涨停/炸板列表 PidType=1为涨停 PidType=2为炸板（历史涨停.txt、炸板.txt）
+    'HisDaBanList': {
+        'host': 'his', 'c': 'HisHomeDingPan', 'a': 'HisDaBanList',
+        'params': {'Order': '1', 'st': '60', 'Index': '0', 'Is_st': '1', 'PidType': '1',
+                   'apiv': 'w31', 'Type': '6', 'FilterMotherboard': '0', 'Filter': '0',
+                   'FilterTIB': '0', 'FilterGem': '0'},
+        'page_size': 60,
+    },
+    # 实时涨停/炸板列表（炸板.txt 实时数据）
+    'DaBanList': {
+        'host': 'hq', 'c': 'HomeDingPan', 'a': 'DaBanList',
+        'params': {'Order': '1', 'st': '60', 'Index': '0', 'Is_st': '1', 'PidType': '1',
+                   'Type': '4', 'FilterMotherboard': '0', 'Filter': '0', 'FilterTIB': '0',
+                   'FilterGem': '0'},
+        'page_size': 60,
+    },
+    # 个股历史涨停原因（所有的涨停原因.txt）
+    'GetDayZhangTing': {
+        'host': 'his', 'c': 'HisLimitResumption', 'a': 'GetDayZhangTing',
+        'params': {'st': '100', 'apiv': 'w31', 'Index': '0', 'UserID': '0', 'Token': '0'},
+        'page_size': 100,
+    },
+    # 连板梯队 PidType=1为1板 PidType=2为二板 ... PidType=5为高度板（一板二板三板等.txt）
+    'DailyLimitPerformance': {
+        'host': 'hq', 'c': 'HomeDingPan', 'a': 'DailyLimitPerformance',
+        'params': {'Order': '0', 'st': '100', 'apiv': 'w33', 'Type': '4', 'Index': '0',
+                   'PidType': '1'},
+        'page_size': 100,
+    },
+    # 破板率、涨停进表现、连板进表现、破板今表现（市场情绪破板率涨停进表现连板进表现破板今表现.txt）
+    'ZhangTingExpression': {
+        'host': 'his', 'c': 'HisHomeDingPan', 'a': 'ZhangTingExpression',
+        'params': {'apiv': 'w37'},
+    },
+    # 市场情绪值/综合强度（市场情绪值.txt、综合强度.txt）
+    'DiskReview': {
+        'host': 'his', 'c': 'HisHomeDingPan', 'a': 'DiskReview',
+        'params': {'apiv': 'w33'},
+    },
+    # 涨跌统计（涨跌统计.txt）
+    'HisZhangFuDetail': {
+        'host': 'his', 'c': 'HisHomeDingPan', 'a': 'HisZhangFuDetail',
+        'params': {'apiv': 'w33'},
+    },
+    # 实时市场情绪指标（市场情绪指标.txt 实时数据）
+    'ChangeStatistics': {
+        'host': 'hq', 'c': 'HomeDingPan', 'a': 'ChangeStatistics',
+        'params': {'apiv': 'w33'},
+    },
+    # 历史市场情绪指标，需传 Day（市场情绪指标.txt 历史数据）
+    'HisChangeStatistics': {
+        'host': 'his', 'c': 'HisHomeDingPan', 'a': 'ChangeStatistics',
+        'params': {'apiv': 'w33'},
+    },
+    # 赚钱效应历史（效应历史.txt）
+    'GetMoneyDate': {
+        'host': 'his', 'c': 'Emotion', 'a': 'GetMoneyDate',
+        'params': {'st': '100', 'apiv': 'w29', 'index': '0'},
+        'page_size': 100,
+    },
+    # 复盘啦亏钱效应（复盘啦亏钱效应.txt，仅实时）
+    'GetPMSL_KQXY': {
+        'host': 'hq', 'c': 'FuPanLa', 'a': 'GetPMSL_KQXY',
+        'params': {'apiv': 'w33'},
+    },
+    # 复盘啦盘面亮点（盘面亮点.txt，仅实时）
+    'GetPMSL_PMLD': {
+        'host': 'hq', 'c': 'FuPanLa', 'a': 'GetPMSL_PMLD',
+        'params': {'st': '30', 'Index': '0', 'apiv': 'w33'},
+        'page_size': 30,
+    },
+    # 个股所属板块（所属板块.txt、打板所属板块.txt）
+    'GetStockIDPlate': {
+        'host': 'hwhq', 'c': 'StockL2Data', 'a': 'GetStockIDPlate',
+        'params': {'apiv': 'w35', 'Type': '2'},
+    },
+    # 板块成分股（子版块.txt、风向标.txt）
+    'ZhiShuStockList_W8': {
+        'host': 'hq', 'c': 'ZhiShuRanking', 'a': 'ZhiShuStockList_W8',
+        'params': {'Order': '1', 'st': '30', 'Index': '0', 'old': '1', 'IsZZ': '0', 'IsKZZType': '0',
+                   'apiv': 'w31', 'Type': '6'},
+        'page_size': 30,
+    },
+    # F10概念题材-精选板块（f10概念题材-精选板块.txt）
+    'GetConceptJXBKw23': {
+        'host': 'article', 'c': 'StockF10Basic', 'a': 'GetConceptJXBKw23',
+        'params': {'apiv': 'w33'},
+    },
+    # 股票对应的子版块强度，PlateID为股票代码（股票对应的子版块强度.txt）
+    'SonPlate_Info': {
+        'host': 'hq', 'c': 'ZhiShuRanking', 'a': 'SonPlate_Info',
+        'params': {'apiv': 'w31'},
+    },
+    # 全市场个股实时排行，分页参数为小写index（个股全部数据接口.txt）
+    'RealRankingInfo_W8': {
+        'host': 'hq', 'c': 'NewStockRanking', 'a': 'RealRankingInfo_W8',
+        'params': {'Order': '1', 'st': '60', 'Type': '1', 'RStart': '0925', 'REnd': '1500',
+                   'Date': '', 'index': '0'},
+        'page_size': 60,
+    },
+    # 个股竞价数据，实时（个股竞价数据接口.txt）
+    'GetStockBid': {
+        'host': 'hq', 'c': 'StockL2Data', 'a': 'GetStockBid',
+        'params': {'apiv': 'w37'},
+    },
+    # 个股竞价数据，历史，Day 为 yyyymmdd（个股竞价数据接口.txt）
+    'HisGetStockBid': {
+        'host': 'his', 'c': 'StockL2History', 'a': 'GetStockBid',
+        'params': {'apiv': 'w37'},
+    },
+    # 全市场个股历史排行（实时龙虎榜历史数据接口.txt）
+    'HisRankingInfo_W8': {
+        'host': 'his', 'c': 'HisStockRanking', 'a': 'HisRankingInfo_W8',
+        'params': {'Order': '1', 'st': '60', 'Isst': '0', 'index': '0', 'apiv': 'w31', 'Type': '1',
+                   'FilterMotherboard': '0', 'Filter': '0', 'Ratio': '6', 'FilterTIB': '0',
+                   'FilterGem': '0'},
+        'page_size': 60,
+    },
+    # 精选板块排行，ZSType=7为精选、4为行业（精选全部数据接口.txt、行业.txt）
+    'RealRankingInfo': {
+        'host': 'hq', 'c': 'ZhiShuRanking', 'a': 'RealRankingInfo',
+        'params': {'Order': '1', 'st': '60', 'apiv': 'w26', 'Type': '1', 'Index': '0', 'ZSType': '7'},
+        'page_size': 60,
+    },
+    # 多日统计，DStart/DEnd 为日期区间（多日统计.txt）；每只股票一行整个区间的汇总，行内不带日期，
+    # range_summary 标记这类接口不能按日期分段拉取
+    'GetInterviewsByDateZS': {
+        'host': 'hq', 'c': 'StockLineData', 'a': 'GetInterviewsByDateZS',
+        'params': {'Order': '1', 'st': '1000', 'Index': '0', 'apiv': 'w33', 'Type': '1'},
+        'page_size': 1000,
+        'range_summary': True,
+    },
+    # 精选板块历史排行，Date 为历史日期，历史接口的st可以设很大（精选历史所有接口.txt）
+    'HisRealRankingInfo': {
+        'host': 'his', 'c': 'ZhiShuRanking', 'a': 'RealRankingInfo',
+        'params': {'Order': '1', 'st': '60', 'apiv': 'w33', 'Type': '1', 'Index': '0', 'ZSType': '7'},
+        'page_size': 60,
+    },
+    # 板块历史分时，StockID 为板块代码（板块历史分时.txt）
+    'GetVolTurIncremental': {
+        'host': 'his', 'c': 'ZhiShuL2Data', 'a': 'GetVolTurIncremental',
+        'params': {'apiv': 'w36'},
+    },
+    # 个股历史分时，Day 格式为 yyyymmdd（当日分时.txt）
+    'GetStockTrend': {
+        'host': 'his', 'c': 'StockL2History', 'a': 'GetStockTrend',
+        'params': {'apiv': 'w33'},
+    },
+    # 个股实时大单成交，Money=2表示200万以上，分页 index 为(n-1)*20（大单.txt）
+    'GetMainMonitor_w30': {
+        'host': 'hq', 'c': 'StockYiDongKanPan', 'a': 'GetMainMonitor_w30',
+        'params': {'Order': '0', 'st': '20', 'Index': '0', 'Money': '2', 'apiv': 'w31', 'IsBS': '0'},
+        'page_size': 20,
+    },
+    # 复盘啦市场动向（板块核心），实时（复盘啦市场动向.txt）
+    'GetYTFP_BKHX': {
+        'host': 'hq', 'c': 'FuPanLa', 'a': 'GetYTFP_BKHX',
+        'params': {'apiv': 'w33'},
+    },
+    # 复盘啦龙虎榜动向，实时（复盘啦龙虎榜动向.txt）
+    'GetYTFP_LHBDX': {
+        'host': 'hq', 'c': 'FuPanLa', 'a': 'GetYTFP_LHBDX',
+        'params': {'apiv': 'w33'},
+    },
+    # 复盘啦龙虎榜动向，历史，Day 为日期（复盘啦龙虎榜动向.txt）
+    'HisGetYTFP_LHBDX': {
+        'host': 'his', 'c': 'FuPanLa', 'a': 'GetYTFP_LHBDX',
+        'params': {'apiv': 'w33'},
+    },
+    # 板块历史爆发原因和涨停原因，StockID 为板块代码（爆发原因和涨停原因.txt）
+    'GetDayBaseFaceListZDEvnArt': {
+        'host': 'his', 'c': 'ZhiShuKLine', 'a': 'GetDayBaseFaceListZDEvnArt',
+        'params': {'st': '10', 'Index': '0', 'apiv': 'w31', 'Type': '0', 'IsBoom': '0'},
+        'page_size': 10,
+    },
+    # 日K线，StockID 为板块代码或股票代码，Type=d为日线（日k线.txt）
+    'GetPlateKLineDay': {
+        'host': 'his', 'c': 'ZhiShuKLine', 'a': 'GetPlateKLineDay',
+        'params': {'st': '100', 'Index': '0', 'apiv': 'w33', 'Type': 'd'},
+        'page_size': 100,
+    },
+}
+
+# 列表数据可能出现的字段名
+LIST_KEYS = ('list', 'List', 'info', 'Info', 'data')
+
+
+class KPLAPIError(Exception):
+    """开盘啦接口请求或解析失败"""
+
+
+def request_key(endpoint, params):
+    """接口名加排序后的参数，用作缓存和录制回放中匹配请求的键"""
+    items = sorted((k, str(v)) for k, v in params.items() if v is not None)
+    return endpoint + '?' + '&'.join(f"{k}={v}" for k, v in items)
+
+
+def extract_rows(payload):
+    """从接口返回的JSON中取出列表数据"""
+    if isinstance(payload, list):
+        return payload
+    if not isinstance(payload, dict):
+        return []
+    for key in LIST_KEYS:
+        value = payload.get(key)
+        if isinstance(value, list):
+            return value
+    return []
+
+
+def row_code(row):
+    """取出一行数据的股票/板块代码，兼容数组行与字典行"""
+    if isinstance(row, dict):
+        for key in ('Code', 'StockID', 'PlateID', 'code'):
+            if row.get(key):
+                return str(row[key])
+        return ''
+    if isinstance(row, (list, tuple)) and row:
+        return str(row[0])
+    return ''
+
+
+def row_name(row):
+    """取出一行数据的名称，兼容数组行与字典行"""
+    if isinstance(row, dict):
+        for key in ('Name', 'PlateName', 'StockName', 'name'):
+            if row.get(key):
+                return str(row[key])
+        return ''
+    if isinstance(row, (list, tuple)) and len(row) > 1:
+        return str(row[1])
+    return ''
+
+
+class KPLClient:
+    def __init__(self, user_id='', token='', timeout=30, device_params=None, rate_limiter=None):
+        """rate_limiter 为None时使用进程间共享的默认限流器，为False时不限流"""
+        self.user_id = user_id
+        self.token = token
+        self.timeout = timeout
+        self.device_params = dict(DEFAULT_DEVICE_PARAMS, **(device_params or {}))
+        self.logger = logging.getLogger(__name__)
+        self._session = None
+        self.rate_limiter = rate_limiter
+
+    @property
+    def session(self):
+        """延迟创建HTTP会话，复用连接"""
+        if self._session is None:
+            import requests
+
+            self._session = requests.Session()
+            self._session.headers.update({
+                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+                'Accept': 'application/json, text/plain, */*',
+                'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
+                'Connection': 'keep-alive'
+            })
+        return self._session
+
+    def build_url(self, endpoint, **params):
+        """根据接口注册表构造完整URL"""
+        if endpoint not in ENDPOINTS:
+            raise KPLAPIError(f"未注册的接口: {endpoint}")
+
+        spec = ENDPOINTS[endpoint]
+        query = dict(self.device_params)
+        query.update({'a': spec['a'], 'c': spec['c']})
+        query.update(spec.get('params', {}))
+        if self.user_id:
+            query.setdefault('UserID', self.user_id)
+        if self.token:
+            query.setdefault('Token', self.token)
+        query.update({k: str(v) for k, v in params.items() if v is not None})
+        return f"{HOSTS[spec['host']]}?{urlencode(query)}"
+
+    def fetch_json(self, endpoint, **params):
+        """请求接口并返回解析后的JSON"""
+        url = self.build_url(endpoint, **params)
+        self.logger.debug(f"请求URL: {url}")
+
+        if self.rate_limiter is None:
+            from rate_limiter import default_rate_limiter
+
+            self.rate_limiter = default_rate_limiter()
+        if self.rate_limiter:
+            self.rate_limiter.acquire(ENDPOINTS[endpoint]['host'], endpoint)
+
+        try:
+            response = self.session.get(url, timeout=self.timeout)
+        except Exception as e:
+            raise KPLAPIError(f"{endpoint} 请求异常: {str(e)}") from e
+
+        if response.status_code != 200:
+            raise KPLAPIError(f"{endpoint} 请求失败，状态码: {response.status_code}")
+
+        try:
+            payload = json.loads(response.text)
+        except json.JSONDecodeError as e:
+            raise KPLAPIError(f"{endpoint} JSON解析失败: {str(e)}") from e
+
+        errcode = payload.get('errcode') if isinstance(payload, dict) else None
+        if errcode not in (None, 0, '0'):
+            raise KPLAPIError(f"{endpoint} 返回错误代码: {errcode}")
+        return payload
+
+    def fetch_rows(self, endpoint, **params):
+        """请求接口并返回列表数据"""
+        return extract_rows(self.fetch_json(endpoint, **params))
+
+    def fetch_all_pages(self, endpoint, index_key='Index', max_pages=100, **params):
+        """按页拉取全部数据，第n页的索引为(n-1)*每页条数"""
+        page_size = int(params.get('st') or ENDPOINTS[endpoint].get('page_size', 60))
+        rows = []
+        for page in range(max_pages):
+            page_rows = self.fetch_rows(endpoint, **dict(params, **{index_key: page * page_size, 'st': page_size}))
+            rows.extend(page_rows)
+            if len(page_rows) < page_size:
+                break
+        return rows
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+连板梯队计算引擎
+功能：基于本地保存的历史涨停/炸板列表(HisDaBanList)构建 日期×股票 的涨停矩阵，
+      向量化计算连板高度、各高度家数、晋级率、炸板率和最高板，并支持逐日增量更新；
+      日期行按交易日历连续排列，缺数据的交易日为空行（连板在此中断）
+"""
+
+import logging
+
+import numpy as np
+
+from kpl_client import extract_rows, row_code
+from local_store import LocalStore, normalize_day
+from trading_calendar import default_calendar
+
+# HisDaBanList 的 PidType：1为涨停，2为炸板
+LIMIT_UP_KEY = 'PidType=1'
+BROKEN_KEY = 'PidType=2'
+
+
+class LimitUpLadder:
+    def __init__(self, store=None, max_board=10):
+        self.store = store or LocalStore()
+        self.max_board = max_board  # 统计时 >= max_board 的高度合并为一档
+        self.logger = logging.getLogger(__name__)
+
+        self.dates = []
+        self.codes = []
+        self.code_index = {}
+        self.fetched = {}  # 日期 -> 计算时所用返回的保存时间，重新保存过的日期再次入库
+        # 预留容量的缓冲区，按倍数扩容，避免每天追加都整体复制
+        self._limit_up = np.zeros((256, 1024), dtype=bool)
+        self._broken = np.zeros((256, 1024), dtype=bool)
+        self._streak = np.zeros((256, 1024), dtype=np.int16)
+
+    @property
+    def limit_up(self):
+        """涨停矩阵 (日期×股票)"""
+        return self._limit_up[:len(self.dates), :len(self.codes)]
+
+    @property
+    def broken(self):
+        """炸板矩阵 (日期×股票)"""
+        return self._broken[:len(self.dates), :len(self.codes)]
+
+    @property
+    def streak(self):
+        """连板高度矩阵 (日期×股票)，0表示当日未涨停"""
+        return self._streak[:len(self.dates), :len(self.codes)]
+
+    @staticmethod
+    def compute_streaks(limit_up):
+        """向量化计算连板高度：累计涨停次数减去最近一次断板时的累计值"""
+        counts = np.cumsum(limit_up, axis=0, dtype=np.int32)
+        reset = np.where(limit_up, 0, counts)
+        np.maximum.accumulate(reset, axis=0, out=reset)
+        return (counts - reset).astype(np.int16)
+
+    def _grow(self, n_rows, n_cols):
+        """按需扩容缓冲区"""
+        rows, cols = self._limit_up.shape
+        if n_rows <= rows and n_cols <= cols:
+            return
+        new_shape = (max(rows, 1) * 2 if n_rows > rows else rows, max(cols, 1) * 2 if n_cols > cols else cols)
+        new_shape = (max(new_shape[0], n_rows), max(new_shape[1], n_cols))
+        for name in ('_limit_up', '_broken', '_streak'):
+            old = getattr(self, name)
+            new = np.zeros(new_shape, dtype=old.dtype)
+            new[:rows, :cols] = old
+            setattr(self, name, new)
+
+    def _column_ids(self, codes):
+        """股票代码转列号，新代码追加到末尾"""
+        ids = []
+        for code in codes:
+            if code not in self.code_index:
+                self.code_index[code] = len(self.codes)
+                self.codes.append(code)
+            ids.append(self.code_index[code])
+        self._grow(len(self.dates) + 1, len(self.codes))
+        return np.asarray(ids, dtype=np.int64)
+
+    def _write_row(self, row, limit_up_codes, broken_codes):
+        """覆盖一行的涨停和炸板（不计算连板高度）"""
+        limit_up_ids = self._column_ids([str(code) for code in limit_up_codes if code])
+        broken_ids = self._column_ids([str(code) for code in broken_codes if code])
+        self._limit_up[row, :] = False
+        self._broken[row, :] = False
+        self._limit_up[row, limit_up_ids] = True
+        self._broken[row, broken_ids] = True
+        # 炸板指盘中触板但收盘未封住，和涨停互斥
+        self._broken[row, limit_up_ids] = False
+
+    def append_day(self, day, limit_up_codes, broken_codes=()):
+        """追加一个交易日；与最后一天同日期时覆盖当天（盘中刷新）。
+        与最后一天之间跳过的交易日补空行，连板在空行处中断，隔了几天的涨停不会被接成连板"""
+        day = normalize_day(day)
+        if self.dates and day < self.dates[-1]:
+            raise ValueError(f"日期 {day} 早于已有的最后日期 {self.dates[-1]}，请调用 rebuild 重建")
+
+        if self.dates and day > self.dates[-1]:
+            gaps = [d for d in default_calendar().trading_days_between(self.dates[-1], day) if self.dates[-1] < d < day]
+            if gaps:
+                self.logger.warning(f"{gaps[0]} 至 {gaps[-1]} 共 {len(gaps)} 个交易日没有涨停数据，按空行处理")
+                self._grow(len(self.dates) + len(gaps) + 1, len(self.codes))
+                for gap in gaps:
+                    row = len(self.dates)
+                    self._limit_up[row, :] = False
+                    self._broken[row, :] = False
+                    self._streak[row, :] = 0
+                    self.dates.append(gap)
+
+        if self.dates and day == self.dates[-1]:
+            row = len(self.dates) - 1
+        else:
+            row = len(self.dates)
+            self._grow(row + 1, len(self.codes))
+            self.dates.append(day)
+        self._write_row(row, limit_up_codes, broken_codes)
+
+        previous = self._streak[row - 1] if row > 0 else np.zeros(self._streak.shape[1], dtype=np.int16)
+        self._streak[row] = np.where(self._limit_up[row], previous + 1, 0)
+
+    def rebuild(self):
+        """整体重算连板高度"""
+        self._streak[:len(self.dates), :len(self.codes)] = self.compute_streaks(self.limit_up)
+
+    def fetch_day(self, client, day):
+        """拉取某日的涨停和炸板列表并写入本地存储，非交易日直接跳过"""
+        day = normalize_day(day)
+        if not default_calendar().is_trading_day(day):
+            self.logger.info(f"{day} 不是交易日，跳过")
+            return
+        for key, pid_type in ((LIMIT_UP_KEY, 1), (BROKEN_KEY, 2)):
+            rows = client.fetch_all_pages('HisDaBanList', PidType=pid_type, Day=day)
+            self.store.put_payload('HisDaBanList', day, {'list': rows}, key=key)
+        self.logger.info(f"已保存 {day} 的涨停/炸板列表")
+
+    def ingest_from_store(self):
+        """把本地存储中尚未计算、或计算后被重新保存（盘中刷新、补拉）的日期入库，返回新增或更新的天数。
+        晚于最后一天的按顺序追加，已有的日期原地覆盖后整体重算连板高度"""
+        stamps = {}
+        for key in (LIMIT_UP_KEY, BROKEN_KEY):
+            for day, _, fetched_at in self.store.payload_stamps('HisDaBanList', key=key):
+                stamps[day] = max(stamps.get(day, ''), fetched_at)
+        changed = [day for day in self.store.list_days('HisDaBanList', key=LIMIT_UP_KEY)
+                   if self.fetched.get(day) != stamps[day]]
+        if changed and self.dates and changed[0] < self.dates[0]:
+            # 补到了最早日期之前，行无法前插：从头重新计算
+            self.dates, self.fetched = [], {}
+            changed = self.store.list_days('HisDaBanList', key=LIMIT_UP_KEY)
+        rows = {day: i for i, day in enumerate(self.dates)}
+        updated = 0
+        overwritten = False
+        for day in changed:
+            limit_up_rows = extract_rows(self.store.get_payload('HisDaBanList', day, key=LIMIT_UP_KEY))
+            broken_rows = extract_rows(self.store.get_payload('HisDaBanList', day, key=BROKEN_KEY))
+            limit_up_codes = [row_code(row) for row in limit_up_rows]
+            broken_codes = [row_code(row) for row in broken_rows]
+            if self.dates and day < self.dates[-1]:
+                if day not in rows:
+                    self.logger.warning(f"{day} 不在交易日历中，跳过")
+                    continue
+                self._write_row(rows[day], limit_up_codes, broken_codes)
+                overwritten = True
+            else:
+                self.append_day(day, limit_up_codes, broken_codes)
+            self.fetched[day] = stamps[day]
+            updated += 1
+        if overwritten:
+            self.rebuild()
+        if updated:
+            self.logger.info(f"连板梯队新增或更新 {updated} 个交易日，最新日期 {self.dates[-1]}")
+        return updated
+
+    def save(self):
+        """保存矩阵到本地存储"""
+        self.store.save_array('ladder_limit_up', self.limit_up)
+        self.store.save_array('ladder_broken', self.broken)
+        self.store.save_meta('ladder', {'dates': self.dates, 'codes': self.codes, 'fetched': self.fetched})
+
+    def load(self):
+        """从本地存储恢复矩阵，返回是否成功"""
+        meta = self.store.load_meta('ladder')
+        limit_up = self.store.load_array('ladder_limit_up')
+        broken = self.store.load_array('ladder_broken')
+        if meta is None or limit_up is None or broken is None:
+            return False
+
+        self.dates = list(meta['dates'])
+        self.codes = list(meta['codes'])
+        self.code_index = {code: i for i, code in enumerate(self.codes)}
+        # 旧版元数据没有保存时间，已有日期会在下次入库时按原数据覆盖重算一次
+        self.fetched = dict(meta.get('fetched', {}))
+        self._limit_up = np.zeros((0, 0), dtype=bool)
+        self._broken = np.zeros((0, 0), dtype=bool)
+        self._streak = np.zeros((0, 0), dtype=np.int16)
+        self._grow(len(self.dates), len(self.codes))
+        self._limit_up[:len(self.dates), :len(self.codes)] = limit_up
+        self._broken[:len(self.dates), :len(self.codes)] = broken
+        self.rebuild()
+        return True
+
+    def _board_bincount(self, streak, weights=None):
+        """按 (日期, 高度) 分组计数，高度超过 max_board 的合并到最后一档"""
+        width = self.max_board + 1
+        rows, cols = np.nonzero(streak)
+        boards = np.minimum(streak[rows, cols], self.max_board)
+        if weights is not None:
+            weights = weights[rows, cols]
+        counts = np.bincount(rows * width + boards, weights=weights, minlength=streak.shape[0] * width)
+        return counts.reshape(streak.shape[0], width)
+
+    def ladder_counts(self):
+        """各日各高度的涨停家数，第k列为k板（第0列恒为0）"""
+        return self._board_bincount(self.streak).astype(np.int32)
+
+    def promotion_rates(self):
+        """各日各高度的晋级率：前一日k板的股票今日继续涨停的比例，无样本为nan"""
+        streak = self.streak
+        rates = np.full((streak.shape[0], self.max_board + 1), np.nan)
+        if streak.shape[0] < 2:
+            return rates
+        previous = streak[:-1]
+        base = self._board_bincount(previous)
+        promoted = self._board_bincount(previous, weights=self.limit_up[1:])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rates[1:] = np.where(base > 0, promoted / base, np.nan)
+        return rates
+
+    def highest_boards(self):
+        """各日最高连板高度"""
+        if not self.dates:
+            return np.zeros(0, dtype=np.int16)
+        return self.streak.max(axis=1)
+
+    def broken_rates(self):
+        """各日炸板率：炸板数 / (涨停数 + 炸板数)"""
+        limit_up_count = self.limit_up.sum(axis=1)
+        broken_count = self.broken.sum(axis=1)
+        total = limit_up_count + broken_count
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(total > 0, broken_count / total, np.nan)
+
+    def day_summary(self, day):
+        """某日的梯队概览"""
+        day = normalize_day(day)
+        if day not in self.dates:
+            return None
+        row = self.dates.index(day)
+        streak_row = self.streak[row]
+        counts = self._board_bincount(streak_row[np.newaxis, :])[0]
+        rates = self.promotion_rates()[row]
+        highest = int(streak_row.max()) if streak_row.size else 0
+        leaders = np.nonzero(streak_row == highest)[0] if highest else []
+
+        return {
+            'date': day,
+            'limit_up_count': int(self.limit_up[row].sum()),
+            'broken_count': int(self.broken[row].sum()),
+            'broken_rate': float(self.broken_rates()[row]),
+            'highest_board': highest,
+            'highest_stocks': [self.codes[i] for i in leaders],
+            'ladder': {board: int(counts[board]) for board in range(1, self.max_board + 1) if counts[board]},
+            'promotion_rates': {board: float(rates[board]) for board in range(1, self.max_board + 1) if not np.isnan(rates[board])},
+        }
+
+
+def main():
+    """主函数：增量更新本地梯队并打印最新一日概览"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    ladder = LimitUpLadder()
+    ladder.load()
+    ladder.ingest_from_store()
+    ladder.save()
+
+    if not ladder.dates:
+        print("本地存储中没有历史涨停数据，请先调用 fetch_day 拉取")
+        return
+
+    summary = ladder.day_summary(ladder.dates[-1])
+    print(f"\n📊 {summary['date']} 连板梯队:")
+    print(f"   涨停: {summary['limit_up_count']}  炸板: {summary['broken_count']}  炸板率: {summary['broken_rate']:.1%}")
+    print(f"   最高板: {summary['highest_board']} ({', '.join(summary['highest_stocks'])})")
+    for board, count in summary['ladder'].items():
+        rate = summary['promotion_rates'].get(board)
+        rate_text = f"{rate:.1%}" if rate is not None else '-'
+        print(f"   {board}板: {count} 家  晋级率: {rate_text}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地数据存储
+功能：用SQLite保存开盘啦接口的原始返回，用npy文件保存计算后的数组，供各分析模块离线使用
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+from datetime import date, datetime
+
+import numpy as np
+
+
+def normalize_day(day):
+    """把 20240208 / 2024-02-08 / date 统一成 2024-02-08"""
+    if isinstance(day, datetime):
+        return day.strftime('%Y-%m-%d')
+    if isinstance(day, date):
+        return day.isoformat()
+    text = str(day).strip()
+    if len(text) == 8 and text.isdigit():
+        return f"{text[:4]}-{text[4:6]}-{text[6:]}"
+    return datetime.strptime(text, '%Y-%m-%d').strftime('%Y-%m-%d')
+
+
+class LocalStore:
+    def __init__(self, data_dir="data"):
+        self.data_dir = data_dir
+        self.array_dir = os.path.join(data_dir, "arrays")
+        for path in (self.data_dir, self.array_dir):
+            if not os.path.exists(path):
+                os.makedirs(path)
+
+        self.db_path = os.path.join(data_dir, "kpl_store.db")
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.setup_database()
+
+    def setup_database(self):
+        """创建数据表"""
+        with self._lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS payloads (
+                    endpoint TEXT NOT NULL,
+                    day TEXT NOT NULL,
+                    key TEXT NOT NULL DEFAULT '',
+                    fetched_at TEXT NOT NULL,
+                    body TEXT NOT NULL,
+                    PRIMARY KEY (endpoint, day, key)
+                )
+            """)
+            self.conn.commit()
+
+    def put_payload(self, endpoint, day, payload, key=''):
+        """保存一次接口返回"""
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO payloads (endpoint, day, key, fetched_at, body) VALUES (?, ?, ?, ?, ?)",
+                (endpoint, normalize_day(day), key, datetime.now().isoformat(), json.dumps(payload, ensure_ascii=False))
+            )
+            self.conn.commit()
+
+    def get_payload(self, endpoint, day, key=''):
+        """读取一次接口返回，不存在时返回None"""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT body FROM payloads WHERE endpoint = ? AND day = ? AND key = ?",
+                (endpoint, normalize_day(day), key)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def has_payload(self, endpoint, day, key=''):
+        """判断是否已保存"""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT 1 FROM payloads WHERE endpoint = ? AND day = ? AND key = ?",
+                (endpoint, normalize_day(day), key)
+            ).fetchone()
+        return row is not None
+
+    def list_days(self, endpoint, key=None):
+        """列出某接口已保存的日期（升序）"""
+        sql = "SELECT DISTINCT day FROM payloads WHERE endpoint = ?"
+        args = [endpoint]
+        if key is not None:
+            sql += " AND key = ?"
+            args.append(key)
+        with self._lock:
+            rows = self.conn.execute(sql + " ORDER BY day", args).fetchall()
+        return [row[0] for row in rows]
+
+    def iter_payloads(self, endpoint, start=None, end=None, key=None):
+        """按日期顺序遍历某接口的返回，产出 (day, key, payload)"""
+        sql = "SELECT day, key, body FROM payloads WHERE endpoint = ?"
+        args = [endpoint]
+        if start is not None:
+            sql += " AND day >= ?"
+            args.append(normalize_day(start))
+        if end is not None:
+            sql += " AND day <= ?"
+            args.append(normalize_day(end))
+        if key is not None:
+            sql += " AND key = ?"
+            args.append(key)
+        with self._lock:
+            rows = self.conn.execute(sql + " ORDER BY day, key", args).fetchall()
+        for day, row_key, body in rows:
+            yield day, row_key, json.loads(body)
+
+    def payload_stamps(self, endpoint, key=None):
+        """某接口已保存返回的 (日期, key, 保存时间)，不读取内容，用于判断哪些返回需要重新处理"""
+        sql = "SELECT day, key, fetched_at FROM payloads WHERE endpoint = ?"
+        args = [endpoint]
+        if key is not None:
+            sql += " AND key = ?"
+            args.append(key)
+        with self._lock:
+            return self.conn.execute(sql + " ORDER BY day, key", args).fetchall()
+
+    def payload_versions(self, day, endpoints):
+        """某日若干接口已保存返回的 (接口, key, 保存时间)，用于判断输入是否变化"""
+        endpoints = list(endpoints)
+        with self._lock:
+            return self.conn.execute(
+                f"SELECT endpoint, key, fetched_at FROM payloads WHERE day = ? AND endpoint IN ({','.join('?' * len(endpoints))}) "
+                "ORDER BY endpoint, key",
+                [normalize_day(day)] + endpoints
+            ).fetchall()
+
+    def latest_payloads(self, endpoint):
+        """每个key只取最新一天的返回，产出 (key, day, payload)"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT key, MAX(day), body FROM payloads WHERE endpoint = ? GROUP BY key ORDER BY key",
+                (endpoint,)
+            ).fetchall()
+        for key, day, body in rows:
+            yield key, day, json.loads(body)
+
+    def array_path(self, name):
+        return os.path.join(self.array_dir, f"{name}.npy")
+
+    def save_array(self, name, array):
+        """原子写入数组文件"""
+        path = self.array_path(name)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, array)
+        os.replace(tmp_path, path)
+
+    def load_array(self, name, mmap=False):
+        """读取数组文件，不存在时返回None"""
+        path = self.array_path(name)
+        if not os.path.exists(path):
+            return None
+        return np.load(path, mmap_mode='r' if mmap else None, allow_pickle=False)
+
+    def save_meta(self, name, meta):
+        """原子写入JSON元数据"""
+        path = os.path.join(self.array_dir, f"{name}.json")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def load_meta(self, name):
+        """读取JSON元数据，不存在时返回None"""
+        path = os.path.join(self.array_dir, f"{name}.json")
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+全市场快照列式解码
+功能：把 RealRankingInfo_W8 / HisRankingInfo_W8 返回的个股排行行数据解码为按列的NumPy数组，
+      并按板块规则（主板10%、创业板/科创板20%、北交所30%、ST 5%）计算涨停价幅度
+"""
+
+import math
+import time
+
+import numpy as np
+
+from kpl_client import extract_rows
+
+# 列定义：名称 -> (数组行下标, 字典行字段名, dtype)。下标按 RealRankingInfo_W8 的返回顺序
+STOCK_RANKING_COLUMNS = {
+    'code': (0, 'StockID', 'U6'),
+    'name': (1, 'Name', 'U16'),
+    'price': (5, 'Price', np.float64),
+    'change_pct': (6, 'ZhangFu', np.float64),
+    'amount': (7, 'ChengJiaoE', np.float64),
+    'turnover': (8, 'HuanShou', np.float64),
+    'volume': (9, 'ChengJiaoLiang', np.float64),
+    'main_net': (13, 'ZhuLiJingE', np.float64),
+    'prev_close': (17, 'ZuoShou', np.float64),
+    'high': (18, 'ZuiGao', np.float64),
+}
+
+
+def _cell(row, index, key):
+    if isinstance(row, dict):
+        return row.get(key)
+    if isinstance(row, (list, tuple)) and index < len(row):
+        return row[index]
+    return None
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def _code_points(values):
+    """定长Unicode数组按字符展开为 (行数, 宽度) 的码点矩阵，不逐行处理字符串"""
+    values = np.ascontiguousarray(values)
+    width = values.dtype.itemsize // 4
+    return values.view(np.uint32).reshape(len(values), width)
+
+
+def _starts_with_any(points, prefixes):
+    mask = np.zeros(len(points), dtype=bool)
+    for prefix in prefixes:
+        if len(prefix) > points.shape[1]:
+            continue
+        match = np.ones(len(points), dtype=bool)
+        for i, char in enumerate(prefix):
+            match &= points[:, i] == ord(char)
+        mask |= match
+    return mask
+
+
+_DIGIT_WEIGHTS = 10 ** np.arange(5, -1, -1, dtype=np.int64)
+
+
+def code_numbers(codes):
+    """6位代码转为整数，非数字代码为-1；用于在查找表中直接定位行"""
+    points = _code_points(np.asarray(codes, dtype='U6'))
+    digits = points.astype(np.int64) - ord('0')
+    valid = ((digits >= 0) & (digits <= 9)).all(axis=1)
+    return np.where(valid, digits @ _DIGIT_WEIGHTS, -1)
+
+
+def limit_ratios(codes, names=None):
+    """按代码和名称计算每只股票的涨跌停幅度（百分比）"""
+    codes = np.asarray(codes, dtype='U6').ravel()
+    points = _code_points(codes)
+    ratios = np.full(codes.shape, 10.0)
+    growth = _starts_with_any(points, ('300', '301', '688', '689'))
+    ratios[growth] = 20.0
+    beijing = _starts_with_any(points, ('4', '8', '920'))
+    ratios[beijing] = 30.0
+    if names is not None:
+        names = np.asarray(names, dtype=str).ravel()
+        if names.dtype.itemsize >= 8:
+            chars = _code_points(names)
+            is_s = (chars[:, :-1] == ord('S')) | (chars[:, :-1] == ord('s'))
+            is_t = (chars[:, 1:] == ord('T')) | (chars[:, 1:] == ord('t'))
+            special = (is_s & is_t).any(axis=1)
+            ratios[special & ~growth & ~beijing] = 5.0
+    return ratios
+
+
+# 价格与涨停价比较的容差（元）
+PRICE_TOLERANCE = 0.005
+
+
+def limit_prices(prev_close, ratios):
+    """按交易所规则计算涨停价：昨收×(1+幅度) 四舍五入到分"""
+    return np.floor(prev_close * (100.0 + ratios) + 0.5 + 1e-6) / 100.0
+
+
+class MarketSnapshot:
+    def __init__(self, columns, timestamp=None):
+        self.columns = columns
+        self.timestamp = timestamp if timestamp is not None else time.time()
+
+    @classmethod
+    def from_rows(cls, rows, timestamp=None, columns=None):
+        """由接口行数据解码为列式快照"""
+        spec = columns or STOCK_RANKING_COLUMNS
+        decoded = {}
+        for name, (index, key, dtype) in spec.items():
+            values = [_cell(row, index, key) for row in rows]
+            if dtype in (np.float64, np.float32):
+                decoded[name] = np.fromiter((_to_float(v) for v in values), dtype=dtype, count=len(values))
+            else:
+                decoded[name] = np.asarray(['' if v is None else str(v) for v in values], dtype=dtype)
+        return cls(decoded, timestamp)
+
+    @classmethod
+    def from_payload(cls, payload, timestamp=None):
+        return cls.from_rows(extract_rows(payload), timestamp)
+
+    @classmethod
+    def fetch(cls, client, endpoint='RealRankingInfo_W8', validator=None, **params):
+        """翻页拉取全市场排行并解码；给出 data_quality.DataValidator 时只返回通过校验的行"""
+        rows = client.fetch_all_pages(endpoint, index_key='index', **params)
+        if validator is not None:
+            return validator.validate(endpoint, rows)[0]
+        return cls.from_rows(rows)
+
+    def __len__(self):
+        return len(self.columns['code'])
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    @property
+    def codes(self):
+        return self.columns['code']
+
+    def limit_ratios(self):
+        return limit_ratios(self.columns['code'], self.columns.get('name'))
+
+    def is_limit_up(self, tolerance=PRICE_TOLERANCE):
+        """当前是否处于涨停：现价达到按分取整的涨停价。低价股取整后涨幅可能明显低于板块幅度
+        （3.33 涨停为 3.66，只涨 9.91%），所以比较价格而不是涨跌幅；缺少昨收的行退回按涨跌幅判断"""
+        return limit_up_mask(self.columns, self.limit_ratios(), tolerance)
+
+
+def limit_up_mask(columns, ratios, tolerance=PRICE_TOLERANCE):
+    """按列判断是否涨停：现价 >= 涨停价 - 容差；昨收缺失时用涨跌幅与板块幅度比较"""
+    price = columns['price']
+    prev_close = columns['prev_close']
+    with np.errstate(invalid='ignore'):
+        by_price = price >= limit_prices(prev_close, ratios) - tolerance
+        by_change = columns['change_pct'] >= ratios - 0.05
+        return np.where(prev_close > 0, by_price, by_change)
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+N日新高/新低本地计算
+功能：把本地保存的日K线(GetPlateKLineDay)汇总成 日期×代码 的最高价/最低价矩阵，个股和801板块一起计算，
+      用分块前后缀极值（van Herk/Gil-Werman）一次算出所有代码的滚动N日最高/最低，耗时与窗口长度无关；
+      新增K线只重算尾部 N-1 行之后的部分；任意日期、任意窗口的新高名单和各板块新高家数一次得到，
+      补充 百日新高按个股/按板块 接口没有的20/60/250日窗口和接口不提供的历史日期
+"""
+
+import logging
+
+import numpy as np
+
+from kpl_client import extract_rows
+from local_store import LocalStore, normalize_day
+
+ENDPOINT = 'GetPlateKLineDay'
+WINDOWS = (20, 60, 100, 250)
+KINDS = ('high', 'low')
+
+# 日K线行字段：名称 -> (数组行下标, 字典行字段名)。日k线.txt 只有请求URL、没有字段说明，
+# 下标和字段名是按常见K线顺序（日期、开、收、高、低）推测的，接入真实返回后需核对
+KLINE_COLUMNS = {
+    'day': (0, 'Day'),
+    'high': (3, 'High'),
+    'low': (4, 'Low'),
+}
+
+PLATE_PREFIX = '801'
+
+
+def _cell(row, name):
+    index, key = KLINE_COLUMNS[name]
+    if isinstance(row, dict):
+        return row.get(key)
+    if isinstance(row, (list, tuple)) and index < len(row):
+        return row[index]
+    return None
+
+
+def parse_bars(rows):
+    """解析日K线行为 {日期: (最高, 最低)}，无法解析的行跳过"""
+    bars = {}
+    for row in rows:
+        try:
+            day = normalize_day(str(_cell(row, 'day'))[:10])
+            bars[day] = (float(_cell(row, 'high')), float(_cell(row, 'low')))
+        except (TypeError, ValueError):
+            continue
+    return bars
+
+
+def sliding_max(values, window):
+    """按列的滚动最大值 result[t] = max(values[t-window+1 .. t])，开头不足 window 行时取已有行。
+    按 window 分块，块内前缀最大和后缀最大各扫一遍，每个结果只需比较两次，与窗口长度无关"""
+    n = len(values)
+    if n == 0 or window <= 1:
+        return values.copy()
+    tail = (-(n + window - 1)) % window
+    padded = np.concatenate([np.full((window - 1,) + values.shape[1:], -np.inf, dtype=values.dtype),
+                             values,
+                             np.full((tail,) + values.shape[1:], -np.inf, dtype=values.dtype)])
+    blocks = padded.reshape((-1, window) + values.shape[1:])
+    prefix = np.maximum.accumulate(blocks, axis=1).reshape(padded.shape)
+    suffix = np.maximum.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].reshape(padded.shape)
+    return np.maximum(suffix[:n], prefix[window - 1:window - 1 + n])
+
+
+def sliding_min(values, window):
+    return -sliding_max(-values, window)
+
+
+def extreme_flags(high, low, window, kind, prior=None, min_bars=None):
+    """每行是否创 window 日新高/新低：当日有K线、该代码截至当日累计的K线不少于 min_bars（默认 window），
+    且当日最高（最低）为窗口内极值；停牌日没有K线，只是不参与比较，不会让之后 window 行都无法创新高。
+    prior 为第一行之前各代码已有的K线数，从中间行开始计算时传入"""
+    values = high if kind == 'high' else low
+    valid = ~np.isnan(values)
+    if kind == 'high':
+        extreme = sliding_max(np.where(valid, values, -np.inf), window)
+    else:
+        extreme = sliding_min(np.where(valid, values, np.inf), window)
+    bars = np.cumsum(valid, axis=0, dtype=np.int32)
+    if prior is not None:
+        bars += prior
+    return valid & (bars >= (window if min_bars is None else min_bars)) & (values == extreme)
+
+
+class NewHighKernel:
+    def __init__(self, store=None, windows=WINDOWS, index=None):
+        self.store = store or LocalStore()
+        self.windows = tuple(windows)
+        self.index = index  # 可选的 PlateMembershipIndex，用于统计各板块成分股的新高家数
+        self.logger = logging.getLogger(__name__)
+
+        self.dates = []
+        self.codes = []
+        self.code_index = {}
+        self.high = np.zeros((0, 0), dtype=np.float32)
+        self.low = np.zeros((0, 0), dtype=np.float32)
+        self.ingested = ''  # 已汇总的K线返回的最晚保存日期
+        self.flags = {}     # (kind, window) -> 日期×代码 的布尔矩阵
+
+    def refresh(self, client, codes, full=False):
+        """拉取K线写入本地存储：full 为True时翻页拉取全部历史，否则只取最新一页"""
+        from datetime import date
+
+        today = date.today().isoformat()
+        for code in codes:
+            try:
+                if full:
+                    rows = client.fetch_all_pages(ENDPOINT, StockID=code)
+                else:
+                    rows = client.fetch_rows(ENDPOINT, StockID=code)
+            except Exception as e:
+                self.logger.warning(f"{code} 日K线获取失败: {str(e)}")
+                continue
+            self.store.put_payload(ENDPOINT, today, {'list': rows}, key=str(code))
+
+    def ingest_from_store(self):
+        """汇总上次之后保存的K线返回，返回第一个有变化的行号（没有变化时为None）"""
+        updates = {}
+        last = self.ingested
+        for day, code, payload in self.store.iter_payloads(ENDPOINT, start=self.ingested or None):
+            if day < self.ingested:
+                continue
+            updates.setdefault(code, {}).update(parse_bars(extract_rows(payload)))
+            last = max(last, day)
+        self.ingested = last
+        if not updates:
+            return None
+
+        new_dates = sorted({day for bars in updates.values() for day in bars} - set(self.dates))
+        new_codes = sorted(set(updates) - set(self.code_index))
+        reordered = bool(new_dates and self.dates and new_dates[0] < self.dates[-1])
+        if reordered:
+            # 补入了更早的日期，按新的日期序列重排
+            dates = sorted(set(self.dates) | set(new_dates))
+            rows = np.searchsorted(dates, self.dates)
+            high = np.full((len(dates), len(self.codes)), np.nan, dtype=np.float32)
+            low = np.full_like(high, np.nan)
+            high[rows], low[rows] = self.high, self.low
+            self.dates, self.high, self.low = dates, high, low
+        elif new_dates:
+            pad = np.full((len(new_dates), len(self.codes)), np.nan, dtype=np.float32)
+            self.dates = self.dates + new_dates
+            self.high = np.vstack([self.high, pad])
+            self.low = np.vstack([self.low, pad])
+        if new_codes:
+            pad = np.full((len(self.dates), len(new_codes)), np.nan, dtype=np.float32)
+            self.high = np.hstack([self.high, pad])
+            self.low = np.hstack([self.low, pad])
+            self.codes = self.codes + new_codes
+            self.code_index = {code: i for i, code in enumerate(self.codes)}
+
+        date_index = {day: i for i, day in enumerate(self.dates)}
+        first = len(self.dates)
+        for code, bars in updates.items():
+            column = self.code_index[code]
+            rows = np.fromiter((date_index[day] for day in bars), dtype=np.int64, count=len(bars))
+            values = np.array(list(bars.values()), dtype=np.float32).reshape(-1, 2)
+            self.high[rows, column] = values[:, 0]
+            self.low[rows, column] = values[:, 1]
+            first = min(first, int(rows.min()))
+        return 0 if new_codes or reordered else first
+
+    def update(self):
+        """汇总新K线并只重算受影响的尾部，返回新增日期数"""
+        old_count = len(self.dates)
+        first = self.ingest_from_store()
+        if first is None:
+            return 0
+        self.compute(first)
+        self.save()
+        self.logger.info(f"新高矩阵: {len(self.dates)} 个交易日 × {len(self.codes)} 个代码，"
+                         f"新增 {len(self.dates) - old_count} 个交易日")
+        return len(self.dates) - old_count
+
+    def compute(self, first=0):
+        """从第 first 行起重算各窗口的新高/新低标志（包括 new_extremes 临时算过的窗口）；
+        每行只依赖前 window-1 行的极值和之前的累计K线数，往前多取这些行即可"""
+        size = len(self.dates)
+        keys = {(kind, window) for window in self.windows for kind in KINDS} | set(self.flags)
+        for kind, window in sorted(keys):
+            flags = self.flags.get((kind, window))
+            if flags is None or flags.shape[1] != len(self.codes) or first == 0:
+                self.flags[(kind, window)] = extreme_flags(self.high, self.low, window, kind)
+                continue
+            start = max(first - window + 1, 0)
+            values = self.high if kind == 'high' else self.low
+            prior = (~np.isnan(values[:start])).sum(axis=0, dtype=np.int32)
+            tail = extreme_flags(self.high[start:], self.low[start:], window, kind, prior=prior)
+            # 从 start 起计算时前 first-start 行的窗口不完整，只保留 first 之后的结果
+            self.flags[(kind, window)] = np.vstack([flags[:first], tail[first - start:]])[:size]
+
+    def save(self):
+        self.store.save_array('new_high_high', self.high)
+        self.store.save_array('new_high_low', self.low)
+        self.store.save_meta('new_high', {'dates': self.dates, 'codes': self.codes, 'ingested': self.ingested})
+
+    def load(self):
+        """从本地存储恢复K线矩阵并计算全部标志，返回是否成功"""
+        meta = self.store.load_meta('new_high')
+        high = self.store.load_array('new_high_high')
+        low = self.store.load_array('new_high_low')
+        if meta is None or high is None or low is None:
+            return False
+        self.dates = list(meta['dates'])
+        self.codes = list(meta['codes'])
+        self.code_index = {code: i for i, code in enumerate(self.codes)}
+        self.ingested = meta.get('ingested', '')
+        self.high, self.low = np.array(high), np.array(low)
+        self.compute()
+        return True
+
+    def new_extremes(self, day, window, kind='high'):
+        """某日创 window 日新高/新低的代码，返回 (个股列表, 板块列表)"""
+        if (kind, window) not in self.flags:
+            self.flags[(kind, window)] = extreme_flags(self.high, self.low, window, kind)
+        day = normalize_day(day)
+        if day not in self.dates:
+            return [], []
+        hits = np.flatnonzero(self.flags[(kind, window)][self.dates.index(day)])
+        codes = [self.codes[i] for i in hits]
+        return ([c for c in codes if not c.startswith(PLATE_PREFIX)],
+                [c for c in codes if c.startswith(PLATE_PREFIX)])
+
+    def counts(self, window, kind='high'):
+        """各日创新高/新低的个股家数，与 self.dates 对齐"""
+        stocks = np.array([not code.startswith(PLATE_PREFIX) for code in self.codes], dtype=bool)
+        return self.flags[(kind, window)][:, stocks].sum(axis=1)
+
+    def report(self, day, windows=None, kind='high'):
+        """某日各窗口的新高名单和各板块成分股新高家数"""
+        result = {}
+        for window in windows or self.windows:
+            stocks, plates = self.new_extremes(day, window, kind)
+            item = {'stocks': stocks, 'plates': plates}
+            if self.index is not None:
+                item['plate_counts'] = [{'plate_id': c['plate_id'], 'name': c['name'], 'count': c['count']}
+                                        for c in self.index.cluster(stocks, kind='plate', top=len(self.index.plates),
+                                                                    min_count=1)]
+            result[window] = item
+        return result
+
+
+def main(argv=None):
+    """主函数：汇总本地K线，打印某日（默认最新）各窗口的新高家数和新高最多的板块"""
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="N日新高/新低本地计算")
+    parser.add_argument('--date')
+    parser.add_argument('--windows', type=int, nargs='*', default=list(WINDOWS))
+    parser.add_argument('--low', action='store_true', help="统计新低")
+    args = parser.parse_args(argv)
+
+    from plate_index import PlateMembershipIndex
+
+    store = LocalStore()
+    index = PlateMembershipIndex(store)
+    kernel = NewHighKernel(store, windows=args.windows, index=index if index.load() else None)
+    kernel.load()
+    kernel.update()
+    if not kernel.dates:
+        print("本地存储中没有日K线数据，请先调用 refresh 拉取")
+        return
+
+    day = args.date or kernel.dates[-1]
+    label = '新低' if args.low else '新高'
+    print(f"\n📈 {day} N日{label}:")
+    for window, item in kernel.report(day, args.windows, 'low' if args.low else 'high').items():
+        top = ', '.join(f"{c['name'] or c['plate_id']}({c['count']})" for c in item.get('plate_counts', [])[:5])
+        print(f"   {window}日: 个股 {len(item['stocks'])} 只，板块 {len(item['plates'])} 个  {top}")
+
+
+if __name__ == "__main__":
+    main()
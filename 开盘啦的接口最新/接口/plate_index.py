@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+股票与板块/概念的倒排索引
+功能：把所属板块、板块成分股、子版块、F10精选概念等接口的返回在本地汇总成双向索引
+      (股票 -> 板块/子版块/概念，板块 -> 股票)，以CSR整数数组保存并内存映射加载，
+      "今日涨停集中在哪些概念"之类的问题改为本地集合运算
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from functools import reduce
+
+import numpy as np
+
+from kpl_client import extract_rows, row_code, row_name
+from local_store import LocalStore
+
+# 数据来源：接口 -> (关系类型, key的含义, 请求参数名)
+SOURCES = {
+    'GetStockIDPlate': ('plate', 'stock', 'StockID'),      # 所属板块.txt / 打板所属板块.txt
+    'ZhiShuStockList_W8': ('plate', 'plate', 'PlateID'),   # 子版块.txt：板块成分股
+    'SonPlate_Info': ('sub_plate', 'stock', 'PlateID'),    # 股票对应的子版块强度.txt，PlateID为股票代码
+    'GetConceptJXBKw23': ('concept', 'stock', 'StockID'),  # f10概念题材-精选板块.txt
+}
+
+KINDS = ('plate', 'sub_plate', 'concept')
+
+
+class PlateMembershipIndex:
+    def __init__(self, store=None):
+        self.store = store or LocalStore()
+        self.logger = logging.getLogger(__name__)
+
+        self.stocks = []
+        self.plates = []
+        self.plate_names = {}
+        self.stock_index = {}
+        self.plate_index = {}
+        self.arrays = {}  # (kind, 方向) -> (indptr, indices)
+
+    def refresh(self, client, stock_codes=(), plate_ids=(), max_age_days=7, max_workers=8):
+        """拉取过期或缺失的成员关系数据，返回实际请求次数"""
+        today = date.today().isoformat()
+        cutoff = (date.today() - timedelta(days=max_age_days)).isoformat()
+        tasks = []
+        for endpoint, (_, key_type, param) in SOURCES.items():
+            fresh = {key for key, day, _ in self.store.latest_payloads(endpoint) if day >= cutoff}
+            keys = stock_codes if key_type == 'stock' else plate_ids
+            tasks.extend((endpoint, param, key) for key in keys if key not in fresh)
+
+        def fetch(task):
+            endpoint, param, key = task
+            try:
+                if endpoint == 'ZhiShuStockList_W8':
+                    rows = client.fetch_all_pages(endpoint, **{param: key})
+                else:
+                    rows = client.fetch_rows(endpoint, **{param: key})
+            except Exception as e:
+                self.logger.warning(f"{endpoint} {key} 拉取失败: {str(e)}")
+                return False
+            self.store.put_payload(endpoint, today, {'list': rows}, key=key)
+            return True
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            done = sum(executor.map(fetch, tasks))
+        self.logger.info(f"成员关系刷新完成: 请求 {len(tasks)} 次，成功 {done} 次")
+        return len(tasks)
+
+    def _id(self, vocab, index, value):
+        if value not in index:
+            index[value] = len(vocab)
+            vocab.append(value)
+        return index[value]
+
+    @staticmethod
+    def _csr(keys, values, size):
+        """由 (key, value) 对构造按key分组的CSR数组"""
+        order = np.lexsort((values, keys))
+        indptr = np.zeros(size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(keys, minlength=size), out=indptr[1:])
+        return indptr, values[order].astype(np.int32)
+
+    def build(self):
+        """由本地存储中的最新返回重建索引并保存"""
+        self.stocks, self.plates, self.plate_names = [], [], {}
+        self.stock_index, self.plate_index = {}, {}
+        pairs = {kind: ([], []) for kind in KINDS}
+
+        for endpoint, (kind, key_type, _) in SOURCES.items():
+            for key, _, payload in self.store.latest_payloads(endpoint):
+                for row in extract_rows(payload):
+                    member = row_code(row)
+                    if not member:
+                        continue
+                    if key_type == 'stock':
+                        stock, plate = key, member
+                        self.plate_names.setdefault(plate, row_name(row))
+                    else:
+                        stock, plate = member, key
+                    pairs[kind][0].append(self._id(self.stocks, self.stock_index, stock))
+                    pairs[kind][1].append(self._id(self.plates, self.plate_index, plate))
+
+        self.arrays = {}
+        for kind, (stock_ids, plate_ids) in pairs.items():
+            combined = np.unique(np.asarray(stock_ids, dtype=np.int64) * max(len(self.plates), 1) + np.asarray(plate_ids, dtype=np.int64))
+            stock_ids = combined // max(len(self.plates), 1)
+            plate_ids = combined % max(len(self.plates), 1)
+            self.arrays[(kind, 'stock')] = self._csr(stock_ids, plate_ids, len(self.stocks))
+            self.arrays[(kind, 'plate')] = self._csr(plate_ids, stock_ids, len(self.plates))
+
+        self.save()
+        self.logger.info(f"成员关系索引已重建: {len(self.stocks)} 只股票, {len(self.plates)} 个板块")
+
+    def save(self):
+        for (kind, direction), (indptr, indices) in self.arrays.items():
+            self.store.save_array(f"plate_index_{kind}_{direction}_indptr", indptr)
+            self.store.save_array(f"plate_index_{kind}_{direction}_indices", indices)
+        self.store.save_meta('plate_index', {
+            'stocks': self.stocks,
+            'plates': self.plates,
+            'plate_names': self.plate_names,
+        })
+
+    def load(self):
+        """内存映射加载索引，返回是否成功"""
+        meta = self.store.load_meta('plate_index')
+        if meta is None:
+            return False
+        arrays = {}
+        for kind in KINDS:
+            for direction in ('stock', 'plate'):
+                indptr = self.store.load_array(f"plate_index_{kind}_{direction}_indptr", mmap=True)
+                indices = self.store.load_array(f"plate_index_{kind}_{direction}_indices", mmap=True)
+                if indptr is None or indices is None:
+                    return False
+                arrays[(kind, direction)] = (indptr, indices)
+
+        self.arrays = arrays
+        self.stocks = meta['stocks']
+        self.plates = meta['plates']
+        self.plate_names = meta['plate_names']
+        self.stock_index = {code: i for i, code in enumerate(self.stocks)}
+        self.plate_index = {plate: i for i, plate in enumerate(self.plates)}
+        return True
+
+    def _members(self, kind, direction, i):
+        indptr, indices = self.arrays[(kind, direction)]
+        return indices[indptr[i]:indptr[i + 1]]
+
+    def _stock_ids(self, codes):
+        """已知股票的编号，去重并升序，重复传入的代码只计一次"""
+        return np.unique(np.asarray([self.stock_index[code] for code in codes if code in self.stock_index],
+                                    dtype=np.int32))
+
+    def plates_of(self, code, kind='plate'):
+        """某只股票所属的板块/子版块/概念"""
+        if code not in self.stock_index:
+            return []
+        return [self.plates[i] for i in self._members(kind, 'stock', self.stock_index[code])]
+
+    def stocks_of(self, plate_id, kind='plate'):
+        """某个板块/概念的成分股"""
+        if plate_id not in self.plate_index:
+            return []
+        return [self.stocks[i] for i in self._members(kind, 'plate', self.plate_index[plate_id])]
+
+    def cluster(self, codes, kind='concept', top=20, min_count=2):
+        """统计一组股票集中在哪些板块/概念，按命中家数降序"""
+        stock_ids = self._stock_ids(codes)
+        if stock_ids.size == 0:
+            return []
+        hits = np.concatenate([self._members(kind, 'stock', i) for i in stock_ids])
+        counts = np.bincount(hits, minlength=len(self.plates))
+        ranked = np.argsort(-counts, kind='stable')[:top]
+
+        result = []
+        for plate in ranked:
+            if counts[plate] < min_count:
+                break
+            members = np.intersect1d(self._members(kind, 'plate', plate), stock_ids, assume_unique=True)
+            result.append({
+                'plate_id': self.plates[plate],
+                'name': self.plate_names.get(self.plates[plate], ''),
+                'count': int(counts[plate]),
+                'stocks': [self.stocks[i] for i in members],
+            })
+        return result
+
+    def common_plates(self, codes, kind='plate'):
+        """一组股票共同所属的板块/概念"""
+        stock_ids = self._stock_ids(codes)
+        if stock_ids.size == 0:
+            return []
+        common = reduce(np.intersect1d, (np.sort(self._members(kind, 'stock', i)) for i in stock_ids))
+        return [self.plates[i] for i in common]
+
+
+def main():
+    """主函数：重建索引并统计最近一日涨停股的概念分布"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    from limit_up_ladder import LimitUpLadder
+
+    store = LocalStore()
+    index = PlateMembershipIndex(store)
+    index.build()
+
+    ladder = LimitUpLadder(store)
+    if not ladder.load() or not ladder.dates:
+        print("本地没有涨停数据")
+        return
+    day = ladder.dates[-1]
+    codes = [ladder.codes[i] for i in np.nonzero(ladder.limit_up[-1])[0]]
+    print(f"\n📊 {day} 涨停股概念分布:")
+    for item in index.cluster(codes):
+        print(f"   {item['name'] or item['plate_id']}: {item['count']} 家")
+
+
+if __name__ == "__main__":
+    main()
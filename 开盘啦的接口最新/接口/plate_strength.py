@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+板块强度与风向标本地计算引擎
+功能：用一次全市场快照(RealRankingInfo_W8)加本地板块成分索引，一次向量化分组聚合算出
+      所有板块的涨停家数、平均涨幅、主力净额、上涨比例，支持自定义排名公式，
+      并给出每个板块的风向标个股，替代逐个板块调用综合强度/最强风口/风向标接口
+"""
+
+import logging
+
+import numpy as np
+
+from market_snapshot import MarketSnapshot
+from plate_index import PlateMembershipIndex
+
+
+def default_strength(aggregates):
+    """默认强度公式：涨停家数为主，平均涨幅和上涨比例为辅"""
+    return (aggregates['limit_up_count'] * 10.0
+            + np.nan_to_num(aggregates['mean_change']) * 2.0
+            + np.nan_to_num(aggregates['breadth']) * 10.0)
+
+
+class PlateStrengthEngine:
+    def __init__(self, index=None, kind='plate', min_members=3):
+        self.index = index or PlateMembershipIndex()
+        self.kind = kind
+        self.min_members = min_members
+        self.logger = logging.getLogger(__name__)
+        if not self.index.arrays:
+            self.index.load()
+
+    def _pairs(self, snapshot):
+        """展开 (板块, 快照行号) 对，成分股不在快照中的被剔除"""
+        indptr, indices = self.index.arrays[(self.kind, 'plate')]
+        positions = np.full(len(self.index.stocks), -1, dtype=np.int64)
+        stock_index = self.index.stock_index
+        for row, code in enumerate(snapshot.codes.tolist()):
+            stock_id = stock_index.get(code)
+            if stock_id is not None:
+                positions[stock_id] = row
+
+        plate_ids = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+        rows = positions[np.asarray(indices)]
+        valid = rows >= 0
+        return plate_ids[valid], rows[valid]
+
+    def aggregate(self, snapshot):
+        """对全部板块做一次分组聚合，返回各指标数组（按板块编号排列）"""
+        plate_ids, rows = self._pairs(snapshot)
+        size = len(self.index.plates)
+
+        change = np.nan_to_num(snapshot['change_pct'])[rows]
+        main_net = np.nan_to_num(snapshot['main_net'])[rows]
+        amount = np.nan_to_num(snapshot['amount'])[rows]
+        limit_up = snapshot.is_limit_up()[rows]
+
+        count = np.bincount(plate_ids, minlength=size)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            aggregates = {
+                'member_count': count,
+                'limit_up_count': np.bincount(plate_ids, weights=limit_up, minlength=size).astype(np.int32),
+                'mean_change': np.bincount(plate_ids, weights=change, minlength=size) / count,
+                'main_net': np.bincount(plate_ids, weights=main_net, minlength=size),
+                'amount': np.bincount(plate_ids, weights=amount, minlength=size),
+                'breadth': np.bincount(plate_ids, weights=change > 0, minlength=size) / count,
+            }
+        return aggregates
+
+    def rank(self, snapshot, formula=None, top=20):
+        """按强度公式给板块排名，formula 接收聚合结果返回分数数组"""
+        aggregates = self.aggregate(snapshot)
+        score = (formula or default_strength)(aggregates).astype(np.float64)
+        score[aggregates['member_count'] < self.min_members] = -np.inf
+
+        ranked = np.argsort(-score, kind='stable')[:top]
+        result = []
+        for plate in ranked:
+            if not np.isfinite(score[plate]):
+                break
+            plate_id = self.index.plates[plate]
+            result.append({
+                'plate_id': plate_id,
+                'name': self.index.plate_names.get(plate_id, ''),
+                'score': float(score[plate]),
+                'limit_up_count': int(aggregates['limit_up_count'][plate]),
+                'mean_change': float(aggregates['mean_change'][plate]),
+                'main_net': float(aggregates['main_net'][plate]),
+                'breadth': float(aggregates['breadth'][plate]),
+            })
+        return result
+
+    def vanes(self, snapshot, top=3):
+        """每个板块的风向标：按涨幅、成交额降序取前 top 只"""
+        plate_ids, rows = self._pairs(snapshot)
+        change = np.nan_to_num(snapshot['change_pct'], nan=-np.inf)[rows]
+        amount = np.nan_to_num(snapshot['amount'])[rows]
+        order = np.lexsort((-amount, -change, plate_ids))
+        plate_ids, rows = plate_ids[order], rows[order]
+
+        # 每组内的名次 = 位置 - 组起点
+        starts = np.r_[0, np.flatnonzero(np.diff(plate_ids)) + 1]
+        group_start = np.repeat(starts, np.diff(np.r_[starts, len(plate_ids)]))
+        keep = (np.arange(len(plate_ids)) - group_start) < top
+
+        codes = snapshot.codes
+        result = {}
+        for plate, row in zip(plate_ids[keep].tolist(), rows[keep].tolist()):
+            result.setdefault(self.index.plates[plate], []).append(str(codes[row]))
+        return result
+
+
+def main():
+    """主函数：拉取一次全市场快照并打印板块强度前20"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    from kpl_client import KPLClient
+
+    engine = PlateStrengthEngine()
+    snapshot = MarketSnapshot.fetch(KPLClient())
+    vanes = engine.vanes(snapshot)
+
+    print(f"\n📊 板块强度排名（{len(snapshot)} 只个股）:")
+    for i, item in enumerate(engine.rank(snapshot), 1):
+        print(f"   {i}. {item['name'] or item['plate_id']}  强度 {item['score']:.1f}  涨停 {item['limit_up_count']}  "
+              f"均涨幅 {item['mean_change']:.2f}%  风向标 {', '.join(vanes.get(item['plate_id'], []))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+板块分时增量拉取
+功能：盘中轮询 GetVolTurIncremental(板块历史分时) 时按板块记录已收到的最后一分钟，
+      只保留新增的分钟点追加进每个板块固定容量的环形缓冲区，全部801xxx板块的分时图都从内存读取
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from intraday_codec import GRID_SIZE, TREND_LAYOUTS, minute_of, trend_rows
+from local_store import normalize_day
+from trading_calendar import market_time
+
+ENDPOINT = 'GetVolTurIncremental'
+LAYOUT = TREND_LAYOUTS[ENDPOINT]
+
+
+class MinuteRing:
+    """单个板块的分钟环形缓冲区，时间戳为 yyyymmddHHMM 整数，跨日单调递增"""
+
+    def __init__(self, capacity, channels):
+        self.capacity = capacity
+        self.stamps = np.zeros(capacity, dtype=np.int64)
+        self.values = np.zeros((capacity, channels))
+        self.head = 0   # 下一个写入位置
+        self.count = 0
+
+    @property
+    def last_stamp(self):
+        return int(self.stamps[self.head - 1]) if self.count else 0
+
+    def append(self, stamps, values):
+        """追加一批按时间升序的点，超出容量时覆盖最旧的点"""
+        n = len(stamps)
+        if n >= self.capacity:
+            stamps, values, n = stamps[-self.capacity:], values[-self.capacity:], self.capacity
+        slots = (self.head + np.arange(n)) % self.capacity
+        self.stamps[slots] = stamps
+        self.values[slots] = values
+        self.head = (self.head + n) % self.capacity
+        self.count = min(self.count + n, self.capacity)
+
+    def snapshot(self, last=None):
+        """按时间顺序取出最近 last 个点，返回 (时间戳, 数值) 副本"""
+        n = self.count if last is None else min(last, self.count)
+        slots = (self.head - n + np.arange(n)) % self.capacity
+        return self.stamps[slots], self.values[slots]
+
+
+class PlateTrendFeed:
+    def __init__(self, client, capacity=GRID_SIZE, max_workers=8, since_param=None):
+        self.client = client
+        self.capacity = capacity
+        self.max_workers = max_workers
+        # 服务端按分钟增量返回的参数名未在接口说明中给出，默认不传，只在本地裁剪
+        self.since_param = since_param
+        self.logger = logging.getLogger(__name__)
+        self.rings = {}
+        self.stats = {'polls': 0, 'received_points': 0, 'new_points': 0}
+        self._lock = threading.Lock()
+
+    def ring(self, plate_id):
+        with self._lock:
+            if plate_id not in self.rings:
+                self.rings[plate_id] = MinuteRing(self.capacity, len(LAYOUT))
+            return self.rings[plate_id]
+
+    @staticmethod
+    def parse_stamps(rows, day):
+        """分钟行的时间戳数组，无法解析的时间记为0"""
+        base = int(normalize_day(day).replace('-', '')) * 10000
+        stamps = np.empty(len(rows), dtype=np.int64)
+        for i, row in enumerate(rows):
+            minute = minute_of(row.get('Time', row.get('time')) if isinstance(row, dict) else row[0])
+            stamps[i] = base + minute if minute >= 0 else 0
+        return stamps
+
+    @staticmethod
+    def parse_values(rows):
+        """分钟行的数值矩阵 (点×通道)"""
+        values = np.full((len(rows), len(LAYOUT)), np.nan)
+        for i, row in enumerate(rows):
+            is_dict = isinstance(row, dict)
+            for c, (_, index, key, _) in enumerate(LAYOUT):
+                value = row.get(key) if is_dict else (row[index] if index < len(row) else None)
+                try:
+                    values[i, c] = float(value)
+                except (TypeError, ValueError):
+                    pass
+        return values
+
+    def apply(self, plate_id, payload, day):
+        """只把比已收到的最后一分钟更新的点写入缓冲区，返回新增点数"""
+        ring = self.ring(plate_id)
+        rows = trend_rows(payload)
+        stamps = self.parse_stamps(rows, day)
+        # 先按时间裁剪，只解析新增的行
+        fresh = np.nonzero(stamps > ring.last_stamp)[0]
+        new_points = 0
+        if len(fresh):
+            fresh = fresh[np.argsort(stamps[fresh], kind='stable')]
+            stamps = stamps[fresh]
+            # 同一分钟重复出现时保留最后一条
+            keep = np.append(stamps[1:] != stamps[:-1], True)
+            values = self.parse_values([rows[i] for i in fresh[keep]])
+            ring.append(stamps[keep], values)
+            new_points = int(keep.sum())
+        with self._lock:
+            self.stats['received_points'] += len(rows)
+            self.stats['new_points'] += new_points
+        return new_points
+
+    def poll_plate(self, plate_id, day=None):
+        day = normalize_day(day or market_time().date())
+        params = {'StockID': plate_id, 'Day': day}
+        ring = self.ring(plate_id)
+        if self.since_param and ring.last_stamp // 10000 == int(day.replace('-', '')):
+            params[self.since_param] = f"{ring.last_stamp % 10000:04d}"
+        payload = self.client.fetch_json(ENDPOINT, **params)
+        return self.apply(plate_id, payload, day)
+
+    def poll(self, plate_ids, day=None):
+        """并发轮询一批板块，返回 {板块: 新增点数}，失败的板块记为-1"""
+        results = {}
+
+        def task(plate_id):
+            try:
+                return plate_id, self.poll_plate(plate_id, day)
+            except Exception as e:
+                self.logger.warning(f"{plate_id} 分时拉取失败: {str(e)}")
+                return plate_id, -1
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for plate_id, added in executor.map(task, plate_ids):
+                results[plate_id] = added
+        with self._lock:
+            self.stats['polls'] += 1
+        return results
+
+    def series(self, plate_id, last=None):
+        """某板块缓冲区中的分时，返回 (时间戳, 数值矩阵 点×通道)"""
+        if plate_id not in self.rings:
+            return np.zeros(0, dtype=np.int64), np.zeros((0, len(LAYOUT)))
+        return self.rings[plate_id].snapshot(last)
+
+    def run(self, plate_ids, interval=60, until='1500'):
+        """按固定间隔轮询直到收盘（北京时间）"""
+        while market_time().strftime('%H%M') <= until:
+            started = time.time()
+            results = self.poll(plate_ids)
+            added = sum(n for n in results.values() if n > 0)
+            self.logger.info(f"本轮 {len(plate_ids)} 个板块新增 {added} 个分钟点")
+            time.sleep(max(interval - (time.time() - started), 0))
+
+
+def main():
+    """主函数：轮询本地板块索引中的全部801xxx板块"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    from kpl_client import KPLClient
+    from plate_index import PlateMembershipIndex
+
+    index = PlateMembershipIndex()
+    if not index.load():
+        print("本地没有板块索引，请先运行 plate_index 刷新")
+        return
+    plate_ids = [plate for plate in index.plates if plate.startswith('801')]
+    feed = PlateTrendFeed(KPLClient())
+    try:
+        feed.run(plate_ids)
+    except KeyboardInterrupt:
+        pass
+    print(f"\n📊 轮询统计: {feed.stats}")
+
+
+if __name__ == "__main__":
+    main()
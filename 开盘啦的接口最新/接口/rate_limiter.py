@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+跨进程共享限流
+功能：同一台机器上的脚本、分析工具和定时任务共用一个SQLite文件中的令牌桶（GCRA实现），
+      按域名和按接口两级限流；每次请求在一个事务内同时向两级桶预约发出时刻，
+      调用方只需睡到该时刻，不轮询、不重试，总吞吐贴近上限而不超过；
+      桶表中同时累计各桶的请求数、总等待和最大等待，供查看等待指标
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import urlsplit
+
+# 各域名的 (每秒请求数, 突发容量)，键与 kpl_client.HOSTS 一致。
+# 厂商没有公开上限，以下为实测未触发限流的保守值，可在模块目录的 data/rate_limits.json 中覆盖
+DEFAULT_HOST_LIMITS = {
+    'hq': (8.0, 8),
+    'his': (8.0, 8),
+    'hwhq': (5.0, 5),
+    'article': (5.0, 5),
+}
+
+# 需要单独限流的接口，未列出的只受域名限流
+DEFAULT_ENDPOINT_LIMITS = {
+    'GetMainMonitor_w30': (4.0, 4),
+}
+
+# 桶数据库和限流配置固定放在模块目录下，从不同工作目录启动的进程也共用同一组桶
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+LIMITS_PATH = os.path.join(DATA_DIR, "rate_limits.json")
+BUCKETS_PATH = os.path.join(DATA_DIR, "rate_limit.db")
+
+
+def load_limits(path=LIMITS_PATH):
+    """读取限流配置 {"hosts": {域名: [速率, 突发]}, "endpoints": {接口: [速率, 突发]}}，覆盖默认值"""
+    hosts, endpoints = dict(DEFAULT_HOST_LIMITS), dict(DEFAULT_ENDPOINT_LIMITS)
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        hosts.update({k: tuple(v) for k, v in config.get('hosts', {}).items()})
+        endpoints.update({k: tuple(v) for k, v in config.get('endpoints', {}).items()})
+    return hosts, endpoints
+
+
+class RateLimiter:
+    """多个进程打开同一个数据库文件即共享同一组桶"""
+
+    def __init__(self, path=BUCKETS_PATH, host_limits=None, endpoint_limits=None):
+        self.path = path
+        if host_limits is None or endpoint_limits is None:
+            hosts, endpoints = load_limits()
+            host_limits = hosts if host_limits is None else host_limits
+            endpoint_limits = endpoints if endpoint_limits is None else endpoint_limits
+        self.host_limits = host_limits
+        self.endpoint_limits = endpoint_limits
+        self.logger = logging.getLogger(__name__)
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.setup_database()
+
+        # 本进程的等待统计
+        self.local_acquires = 0
+        self.local_waited = 0.0
+        self.local_max_wait = 0.0
+
+    def setup_database(self):
+        with self._lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS buckets (
+                    name TEXT PRIMARY KEY,
+                    tat REAL NOT NULL DEFAULT 0,
+                    acquires INTEGER NOT NULL DEFAULT 0,
+                    waited REAL NOT NULL DEFAULT 0,
+                    max_wait REAL NOT NULL DEFAULT 0
+                )
+            """)
+
+    def _buckets(self, host, endpoint):
+        buckets = []
+        if host in self.host_limits:
+            buckets.append((f'host:{host}',) + tuple(self.host_limits[host]))
+        if endpoint in self.endpoint_limits:
+            buckets.append((f'endpoint:{endpoint}',) + tuple(self.endpoint_limits[endpoint]))
+        return buckets
+
+    def reserve(self, host, endpoint=None):
+        """预约一次请求，返回需要等待的秒数（不睡眠）。
+
+        GCRA：桶的 tat 为理论到达时间，间隔 T=1/速率，容差 tau=(突发-1)*T，
+        最早发出时刻为 max(现在, 各桶 tat - tau)，随后各桶 tat = max(tat, 发出时刻) + T
+        """
+        buckets = self._buckets(host, endpoint)
+        if not buckets:
+            return 0.0
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                names = [name for name, _, _ in buckets]
+                rows = dict(self.conn.execute(
+                    f"SELECT name, tat FROM buckets WHERE name IN ({','.join('?' * len(names))})", names).fetchall())
+                start = now
+                for name, rate, burst in buckets:
+                    start = max(start, rows.get(name, 0.0) - (burst - 1) / rate)
+                wait = start - now
+                for name, rate, _ in buckets:
+                    tat = max(rows.get(name, 0.0), start) + 1.0 / rate
+                    self.conn.execute(
+                        "INSERT INTO buckets (name, tat, acquires, waited, max_wait) VALUES (?, ?, 1, ?, ?) "
+                        "ON CONFLICT(name) DO UPDATE SET tat = excluded.tat, acquires = acquires + 1, "
+                        "waited = waited + excluded.waited, max_wait = MAX(max_wait, excluded.max_wait)",
+                        (name, tat, wait, wait))
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.local_acquires += 1
+            self.local_waited += wait
+            self.local_max_wait = max(self.local_max_wait, wait)
+        return wait
+
+    def acquire(self, host, endpoint=None):
+        """预约并睡到可以发出请求的时刻，返回实际等待的秒数"""
+        wait = self.reserve(host, endpoint)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def acquire_url(self, url):
+        """按URL的域名限流，供不经过 KPLClient 直接请求的工具使用"""
+        from kpl_client import HOSTS
+
+        netloc = urlsplit(url).netloc
+        for host, base in HOSTS.items():
+            if urlsplit(base).netloc == netloc:
+                return self.acquire(host)
+        return 0.0
+
+    def stats(self):
+        """各桶累计的请求数、平均等待和最大等待（所有进程），以及本进程的等待统计"""
+        with self._lock:
+            rows = self.conn.execute("SELECT name, acquires, waited, max_wait FROM buckets ORDER BY name").fetchall()
+        return {
+            'buckets': {name: {'acquires': acquires, 'avg_wait': waited / acquires if acquires else 0.0,
+                               'max_wait': max_wait, 'total_wait': waited}
+                        for name, acquires, waited, max_wait in rows},
+            'process': {'acquires': self.local_acquires, 'total_wait': self.local_waited,
+                        'avg_wait': self.local_waited / self.local_acquires if self.local_acquires else 0.0,
+                        'max_wait': self.local_max_wait},
+        }
+
+    def reset_stats(self):
+        with self._lock:
+            self.conn.execute("UPDATE buckets SET acquires = 0, waited = 0, max_wait = 0")
+            self.local_acquires, self.local_waited, self.local_max_wait = 0, 0.0, 0.0
+
+
+_default_limiter = None
+
+
+def default_rate_limiter():
+    """进程内共享的限流器，KPLClient 默认使用"""
+    global _default_limiter
+    if _default_limiter is None:
+        _default_limiter = RateLimiter()
+    return _default_limiter
+
+
+def main():
+    """主函数：打印各桶的等待指标"""
+    limiter = default_rate_limiter()
+    print("\n⏱️ 限流等待指标:")
+    for name, item in limiter.stats()['buckets'].items():
+        print(f"   {name}: 请求 {item['acquires']} 次，平均等待 {item['avg_wait'] * 1000:.1f} ms，"
+              f"最大等待 {item['max_wait'] * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,440 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+涨停原因全文索引
+功能：把历史涨停列表、个股历史涨停原因、盘面亮点等接口返回的原因/题材文本按 (日期, 股票) 建立文档，
+      中文按单字和二元组切分、英文数字按词切分，倒排表为升序文档号的差分序列，
+      按最小整数宽度排列后zlib压缩；每天的新文档写成一个增量段，段数超过上限时自动 compact 合并；
+      同一 (日期, 股票, 来源) 重新入库时新文本替换旧文档，旧文档标记作废、查询时过滤，compact 时清除；
+      "所有提到X的涨停"和题材按日频次序列在本地毫秒级回答，不再逐日重新拉取
+"""
+
+import logging
+import os
+import re
+import sqlite3
+import struct
+import threading
+import zlib
+from datetime import date
+
+import numpy as np
+
+from kpl_client import extract_rows, row_code, row_name
+from local_store import LocalStore, normalize_day
+from trading_calendar import market_time
+
+# 文本来源：名称 -> (本地存储接口, key, key是否为股票/板块代码)
+SOURCES = {
+    'limit_up': ('HisDaBanList', 'PidType=1', False),             # 历史涨停.txt，当日每只涨停股一行
+    'highlight': ('GetPMSL_PMLD', '', False),                     # 盘面亮点.txt
+    'history': ('GetDayZhangTing', None, True),                   # 所有的涨停原因.txt，key 为股票代码
+    'plate_reason': ('GetDayBaseFaceListZDEvnArt', None, True),   # 爆发原因和涨停原因.txt，key 为板块代码
+}
+
+# 字典行中可能保存原因/题材文本的字段，找不到时取除名称外所有含中文的字符串
+REASON_KEYS = ('Reason', 'ZTYY', 'LimitReason', 'ZhangTingYuanYin', 'BoomReason', 'PlateName',
+               'Theme', 'Tag', 'Title', 'Content', 'Desc')
+
+_CJK = re.compile(r'[\u3400-\u9fff]+')
+_WORD = re.compile(r'[A-Za-z0-9]+')
+_DAY = re.compile(r'^(\d{4})-?(\d{2})-?(\d{2})')
+
+POSTING_HEADER = struct.Struct('<IB')  # 文档数、整数宽度
+WIDTH_DTYPES = {1: np.uint8, 2: np.uint16, 4: np.uint32}
+
+# 增量段超过这个数量时写入后自动合并，避免每次查询都要解码大量小段
+MAX_SEGMENTS = 32
+
+
+def tokenize(text):
+    """索引用的词项：中文单字和相邻二元组，英文数字按词（小写）"""
+    terms = set()
+    for run in _CJK.findall(text):
+        terms.update(run)
+        terms.update(run[i:i + 2] for i in range(len(run) - 1))
+    terms.update(word.lower() for word in _WORD.findall(text))
+    return terms
+
+
+def query_terms(text):
+    """查询词拆成词项：单个汉字用单字，更长的中文用二元组，全部命中后再核对原文"""
+    terms = set()
+    for run in _CJK.findall(text):
+        if len(run) == 1:
+            terms.add(run)
+        else:
+            terms.update(run[i:i + 2] for i in range(len(run) - 1))
+    terms.update(word.lower() for word in _WORD.findall(text))
+    return terms
+
+
+def encode_postings(ids):
+    """升序文档号 -> 差分后按最小宽度排列的字节平面，再zlib压缩"""
+    ids = np.asarray(ids, dtype=np.int64)
+    gaps = np.diff(ids, prepend=0)
+    top = int(gaps.max()) if gaps.size else 0
+    width = next(w for w in (1, 2, 4) if top < 1 << (8 * w))
+    planes = gaps.astype(WIDTH_DTYPES[width]).view(np.uint8).reshape(-1, width).T
+    return POSTING_HEADER.pack(len(ids), width) + zlib.compress(planes.tobytes(), 6)
+
+
+def decode_postings(blob):
+    count, width = POSTING_HEADER.unpack_from(blob, 0)
+    body = zlib.decompress(blob[POSTING_HEADER.size:])
+    planes = np.frombuffer(body, dtype=np.uint8).reshape(width, count)
+    gaps = np.ascontiguousarray(planes.T).view(WIDTH_DTYPES[width]).ravel()
+    return np.cumsum(gaps, dtype=np.int64)
+
+
+def row_text(row, skip=2):
+    """取出一行中的原因/题材文本，兼容字典行与数组行；数组行从下标 skip 起取（默认跳过代码和名称）"""
+    if isinstance(row, dict):
+        texts = [str(row[key]) for key in REASON_KEYS if row.get(key)]
+        if not texts:
+            name = row_name(row)
+            texts = [v for v in row.values() if isinstance(v, str) and v != name and _CJK.search(v)]
+    elif isinstance(row, (list, tuple)):
+        texts = [v for v in row[skip:] if isinstance(v, str) and _CJK.search(v)]
+    else:
+        texts = []
+    return ' | '.join(dict.fromkeys(texts))
+
+
+def row_day(row):
+    """个股历史涨停原因的行自带日期：取第一个像日期或时间戳的字段"""
+    values = row.values() if isinstance(row, dict) else row if isinstance(row, (list, tuple)) else ()
+    for value in values:
+        text = str(value)
+        match = _DAY.match(text)
+        if match and 1990 <= int(match.group(1)) <= 2100:
+            try:
+                return normalize_day(''.join(match.groups()))
+            except ValueError:
+                continue
+        if text.isdigit() and len(text) in (10, 13):
+            return market_time(int(text) / (1000 if len(text) == 13 else 1)).date().isoformat()
+    return None
+
+
+class ReasonIndex:
+    def __init__(self, path=os.path.join("data", "reason_index.db"), store=None):
+        self.path = path
+        self.store = store
+        self.logger = logging.getLogger(__name__)
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.setup_database()
+
+        # 文档号 -> 日期序数、小写文本、文档行，查询时在内存中过滤、核对和返回，首次查询时加载
+        self._doc_day = None
+        self._doc_text = None
+        self._doc_rows = None
+
+    def setup_database(self):
+        with self._lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS docs (
+                    id INTEGER PRIMARY KEY,
+                    day TEXT NOT NULL,
+                    code TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    source TEXT NOT NULL,
+                    text TEXT NOT NULL,
+                    dead INTEGER NOT NULL DEFAULT 0,
+                    UNIQUE (day, code, source, text)
+                )
+            """)
+            # segment 0 为合并段，其余为每次增量写入的段
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS postings (
+                    term TEXT NOT NULL,
+                    segment INTEGER NOT NULL,
+                    blob BLOB NOT NULL,
+                    PRIMARY KEY (term, segment)
+                )
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS ingested (
+                    source TEXT NOT NULL,
+                    day TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    fetched_at TEXT NOT NULL DEFAULT '',
+                    PRIMARY KEY (source, day, key)
+                )
+            """)
+            # 旧库的入库记录没有保存时间，升级后这些返回会按新版本重新入库一次（文档去重）
+            columns = [row[1] for row in self.conn.execute("PRAGMA table_info(ingested)").fetchall()]
+            if 'fetched_at' not in columns:
+                self.conn.execute("ALTER TABLE ingested ADD COLUMN fetched_at TEXT NOT NULL DEFAULT ''")
+            # 旧库的文档没有作废标记，全部视为有效
+            columns = [row[1] for row in self.conn.execute("PRAGMA table_info(docs)").fetchall()]
+            if 'dead' not in columns:
+                self.conn.execute("ALTER TABLE docs ADD COLUMN dead INTEGER NOT NULL DEFAULT 0")
+            self.conn.commit()
+
+    def add_documents(self, docs, source, marks=()):
+        """写入一批 (日期, 代码, 名称, 文本) 文档并作为一个增量段写入倒排表，返回新增文档数。
+        一批文档是其中每个 (日期, 代码) 在该来源下的全部文本：已有文档中不在这批里的标记作废
+        （同日 refresh 改写了原因时频次不会重复计数），作废后又出现的文本恢复原文档。
+        marks 为同一事务中记为已入库的 (日期, key, 保存时间)"""
+        batch = {}
+        for day, code, name, text in docs:
+            if text:
+                batch.setdefault((normalize_day(day), code), {}).setdefault(text, name)
+        with self._lock:
+            cursor = self.conn.cursor()
+            segment = (cursor.execute("SELECT MAX(segment) FROM postings").fetchone()[0] or 0) + 1
+            postings = {}
+            added = 0
+            for (day, code), texts in batch.items():
+                existing = {text: (doc_id, dead) for doc_id, text, dead in cursor.execute(
+                    "SELECT id, text, dead FROM docs WHERE day = ? AND code = ? AND source = ?",
+                    (day, code, source)).fetchall()}
+                cursor.executemany("UPDATE docs SET dead = 1 WHERE id = ?",
+                                   [(doc_id,) for text, (doc_id, dead) in existing.items()
+                                    if text not in texts and not dead])
+                for text, name in texts.items():
+                    if text in existing:
+                        doc_id, dead = existing[text]
+                        if dead:
+                            # 作废的文档在 compact 之前倒排表仍然保留，直接恢复
+                            cursor.execute("UPDATE docs SET dead = 0 WHERE id = ?", (doc_id,))
+                            added += 1
+                        continue
+                    cursor.execute("INSERT INTO docs (day, code, name, source, text) VALUES (?, ?, ?, ?, ?)",
+                                   (day, code, name, source, text))
+                    for term in tokenize(text):
+                        postings.setdefault(term, []).append(cursor.lastrowid)
+                    added += 1
+            cursor.executemany("INSERT INTO postings (term, segment, blob) VALUES (?, ?, ?)",
+                               [(term, segment, encode_postings(ids)) for term, ids in postings.items()])
+            cursor.executemany("INSERT OR REPLACE INTO ingested (source, day, key, fetched_at) VALUES (?, ?, ?, ?)",
+                               [(source, normalize_day(day), key, fetched_at) for day, key, fetched_at in marks])
+            self.conn.commit()
+            segments = cursor.execute("SELECT COUNT(DISTINCT segment) FROM postings").fetchone()[0]
+        self._doc_day = self._doc_text = self._doc_rows = None
+        if segments > MAX_SEGMENTS:
+            self.compact()
+        return added
+
+    def refresh(self, client, store=None, stock_codes=(), plate_codes=()):
+        """保存今天的盘面亮点、给定股票的历史涨停原因和给定板块的爆发原因到本地存储，随后 ingest_from_store 入库"""
+        store = store or self.store or LocalStore()
+        today = market_time().date().isoformat()
+        store.put_payload('GetPMSL_PMLD', today, {'list': client.fetch_all_pages('GetPMSL_PMLD')})
+        for code in stock_codes:
+            try:
+                rows = client.fetch_all_pages('GetDayZhangTing', StockID=code)
+            except Exception as e:
+                self.logger.warning(f"{code} 历史涨停原因获取失败: {str(e)}")
+                continue
+            store.put_payload('GetDayZhangTing', today, {'list': rows}, key=str(code))
+        for plate in plate_codes:
+            try:
+                rows = client.fetch_all_pages('GetDayBaseFaceListZDEvnArt', StockID=plate)
+            except Exception as e:
+                self.logger.warning(f"{plate} 板块爆发原因获取失败: {str(e)}")
+                continue
+            store.put_payload('GetDayBaseFaceListZDEvnArt', today, {'list': rows}, key=str(plate))
+
+    def ingest_from_store(self, store=None):
+        """把本地存储中尚未入库或入库后被重新保存的返回按来源增量入库，返回新增文档数。
+        入库记录带返回的保存时间，同一天再次 refresh 的返回会重新入库（替换同一日期、股票的旧文档）"""
+        store = store or self.store or LocalStore()
+        with self._lock:
+            done = {(source, day, key): fetched_at for source, day, key, fetched_at in
+                    self.conn.execute("SELECT source, day, key, fetched_at FROM ingested").fetchall()}
+        added = 0
+        for source, (endpoint, key, key_is_stock) in SOURCES.items():
+            stamps = store.payload_stamps(endpoint, key=key)
+            if key_is_stock:
+                # 个股/板块的历史每次都是全量，只取每个 key 最新一天的返回
+                stamps = list({row_key: (day, row_key, fetched_at) for day, row_key, fetched_at in stamps}.values())
+            for day, row_key, fetched_at in stamps:
+                if done.get((source, day, row_key)) == fetched_at:
+                    continue
+                payload = store.get_payload(endpoint, day, key=row_key)
+                docs = []
+                for row in extract_rows(payload):
+                    if key_is_stock:
+                        # 个股/板块自己的历史：数组行不含代码和名称，第一列起即为日期和原因
+                        doc_day, code, name, text = row_day(row), row_key, '', row_text(row, skip=0)
+                    else:
+                        doc_day, code, name, text = day, row_code(row), row_name(row), row_text(row)
+                    if doc_day:
+                        docs.append((doc_day, code, name, text))
+                added += self.add_documents(docs, source, marks=[(day, row_key, fetched_at)])
+        if added:
+            self.logger.info(f"涨停原因索引新增 {added} 条文档")
+        return added
+
+    def compact(self):
+        """把每个词项的所有段合并为 segment 0 并去掉作废的文档，返回合并的词项数。
+        作废文档的行在这里才删除，此前它们的文档号一直占用，新文档不会复用仍在倒排表中的文档号"""
+        with self._lock:
+            dead = np.array([row[0] for row in self.conn.execute("SELECT id FROM docs WHERE dead = 1").fetchall()],
+                            dtype=np.int64)
+            if len(dead):
+                terms = [row[0] for row in self.conn.execute("SELECT DISTINCT term FROM postings").fetchall()]
+            else:
+                terms = [row[0] for row in self.conn.execute(
+                    "SELECT term FROM postings GROUP BY term HAVING COUNT(*) > 1").fetchall()]
+            for term in terms:
+                blobs = self.conn.execute("SELECT blob FROM postings WHERE term = ?", (term,)).fetchall()
+                ids = np.unique(np.concatenate([decode_postings(blob) for blob, in blobs]))
+                if len(dead):
+                    ids = np.setdiff1d(ids, dead, assume_unique=True)
+                self.conn.execute("DELETE FROM postings WHERE term = ?", (term,))
+                if len(ids):
+                    self.conn.execute("INSERT INTO postings (term, segment, blob) VALUES (?, 0, ?)",
+                                      (term, encode_postings(ids)))
+            self.conn.execute("DELETE FROM docs WHERE dead = 1")
+            self.conn.commit()
+            if terms:
+                self.conn.execute("VACUUM")
+        return len(terms)
+
+    def postings(self, term):
+        """一个词项的全部文档号（升序）"""
+        with self._lock:
+            blobs = self.conn.execute("SELECT blob FROM postings WHERE term = ? ORDER BY segment", (term,)).fetchall()
+        if not blobs:
+            return np.zeros(0, dtype=np.int64)
+        if len(blobs) == 1:
+            return decode_postings(blobs[0][0])
+        return np.unique(np.concatenate([decode_postings(blob) for blob, in blobs]))
+
+    def _load_docs(self):
+        if self._doc_day is None:
+            with self._lock:
+                rows = self.conn.execute("SELECT id, day, code, name, source, text FROM docs WHERE dead = 0").fetchall()
+            size = max((row[0] for row in rows), default=0) + 1
+            self._doc_day = np.zeros(size, dtype=np.int32)
+            self._doc_text = [''] * size
+            self._doc_rows = [None] * size
+            ordinals = {}
+            for row in rows:
+                doc_id, day, text = row[0], row[1], row[5]
+                if day not in ordinals:
+                    ordinals[day] = date.fromisoformat(day).toordinal()
+                self._doc_day[doc_id] = ordinals[day]
+                self._doc_text[doc_id] = text.lower()
+                self._doc_rows[doc_id] = row[1:]
+        return self._doc_day, self._doc_text
+
+    def match(self, query, start=None, end=None):
+        """匹配查询的文档号：空格分隔的多个词全部出现（AND），可按日期范围过滤"""
+        words = query.split()
+        if not words:
+            return np.zeros(0, dtype=np.int64)
+        ids = None
+        for word in words:
+            for term in query_terms(word):
+                found = self.postings(term)
+                ids = found if ids is None else np.intersect1d(ids, found, assume_unique=True)
+                if not len(ids):
+                    return ids
+        doc_day, doc_text = self._load_docs()
+        # 作废文档的倒排表要到 compact 才清除：只保留有效文档（日期序数非零）
+        ids = ids[ids < len(doc_day)]
+        ids = ids[doc_day[ids] > 0]
+        if start is not None:
+            ids = ids[doc_day[ids] >= date.fromisoformat(normalize_day(start)).toordinal()]
+        if end is not None:
+            ids = ids[doc_day[ids] <= date.fromisoformat(normalize_day(end)).toordinal()]
+        # 二元组都命中不代表原词连续出现，多字查询核对原文
+        check = [word.lower() for word in words if len(query_terms(word)) > 1]
+        if check:
+            keep = [all(word in doc_text[i] for word in check) for i in ids.tolist()]
+            ids = ids[np.array(keep, dtype=bool)]
+        return ids
+
+    def search(self, query, start=None, end=None, limit=None):
+        """所有提到查询词的涨停，按日期倒序返回 [{day, code, name, source, text}]"""
+        ids = self.match(query, start, end)
+        if not len(ids):
+            return []
+        self._load_docs()
+        # 按日期倒序（同日按入库先后倒序），只为前 limit 条构造字典
+        order = np.lexsort((-ids, -self._doc_day[ids]))[:limit]
+        rows = [self._doc_rows[i] for i in ids[order].tolist()]
+        return [dict(zip(('day', 'code', 'name', 'source', 'text'), row)) for row in rows]
+
+    def frequency(self, query, start=None, end=None):
+        """题材按日频次：返回 (日期列表, 每日命中文档数)，只包含有文档的日期"""
+        ids = self.match(query, start, end)
+        doc_day, _ = self._load_docs()
+        days = np.unique(doc_day[doc_day > 0])
+        if start is not None:
+            days = days[days >= date.fromisoformat(normalize_day(start)).toordinal()]
+        if end is not None:
+            days = days[days <= date.fromisoformat(normalize_day(end)).toordinal()]
+        counts = np.zeros(len(days), dtype=np.int64)
+        if len(ids):
+            hit_days, hit_counts = np.unique(doc_day[ids], return_counts=True)
+            counts[np.searchsorted(days, hit_days)] = hit_counts
+        return [date.fromordinal(int(day)).isoformat() for day in days], counts
+
+    def stats(self):
+        with self._lock:
+            docs = self.conn.execute("SELECT COUNT(*) FROM docs WHERE dead = 0").fetchone()[0]
+            terms, segments, size = self.conn.execute(
+                "SELECT COUNT(DISTINCT term), COUNT(*), COALESCE(SUM(LENGTH(blob)), 0) FROM postings").fetchone()
+        return {'docs': docs, 'terms': terms, 'segments': segments, 'posting_bytes': size}
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+def main(argv=None):
+    """主函数：增量入库后按查询词打印匹配的涨停和按日频次"""
+    import argparse
+    import time
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="涨停原因全文索引")
+    parser.add_argument('query', nargs='*', help="查询词，多个词为同时出现")
+    parser.add_argument('--start')
+    parser.add_argument('--end')
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--compact', action='store_true', help="入库后合并增量段")
+    parser.add_argument('--refresh', nargs='*', metavar='STOCK', help="先拉取今天的盘面亮点和这些股票的历史涨停原因")
+    parser.add_argument('--plates', nargs='*', default=[], metavar='PLATE', help="随 --refresh 拉取这些板块的爆发原因")
+    args = parser.parse_args(argv)
+
+    store = LocalStore()
+    index = ReasonIndex(store=store)
+    if args.refresh is not None:
+        from kpl_client import KPLClient
+
+        index.refresh(KPLClient(), store, args.refresh, args.plates)
+    index.ingest_from_store(store)
+    if args.compact:
+        index.compact()
+    print(f"\n📚 索引: {index.stats()}")
+    if not args.query:
+        return
+
+    query = ' '.join(args.query)
+    started = time.perf_counter()
+    results = index.search(query, args.start, args.end)
+    days, counts = index.frequency(query, args.start, args.end)
+    elapsed = (time.perf_counter() - started) * 1000
+    print(f"\n🔎 {query}: {len(results)} 条，耗时 {elapsed:.1f} ms")
+    for item in results[:args.limit]:
+        print(f"   {item['day']} {item['code']} {item['name']}: {item['text']}")
+    active = np.flatnonzero(counts)
+    if len(active):
+        print("\n📈 按日频次:")
+        for i in active[-args.limit:]:
+            print(f"   {days[i]}: {counts[i]}")
+
+
+if __name__ == "__main__":
+    main()
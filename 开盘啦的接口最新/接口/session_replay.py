@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+盘中快照录制与回放
+功能：RecordingClient 在正常请求的同时把实时接口的每次返回连同时间戳追加写入日志文件；
+      ReplayClient 读取日志，以相同的客户端接口按N倍速或尽可能快地回放，
+      轮询和告警逻辑可以在没有网络的机器上用一整天的数据确定性地压测
+"""
+
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from kpl_client import KPLAPIError, KPLClient, request_key
+from trading_calendar import market_time
+
+# 默认录制的实时接口：实时涨停、市场情绪指标、大单、精选板块排行、个股排行
+RECORDED_ENDPOINTS = ('DailyLimitPerformance', 'ChangeStatistics', 'GetMainMonitor_w30',
+                      'RealRankingInfo', 'RealRankingInfo_W8')
+
+
+def default_log_path(day=None):
+    """录制日志按北京时间的日期命名"""
+    return os.path.join("data", "recordings", f"{day or market_time().date().isoformat()}.jsonl")
+
+
+class RecordingClient(KPLClient):
+    def __init__(self, log_path=None, endpoints=RECORDED_ENDPOINTS, **kwargs):
+        super().__init__(**kwargs)
+        self.log_path = log_path or default_log_path()
+        self.endpoints = set(endpoints)
+        directory = os.path.dirname(self.log_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self._log = open(self.log_path, 'a', encoding='utf-8')
+        self._log_lock = threading.Lock()
+
+    def fetch_json(self, endpoint, **params):
+        """请求接口，并把实时接口的返回追加写入日志"""
+        payload = super().fetch_json(endpoint, **params)
+        if endpoint in self.endpoints:
+            line = json.dumps({'t': time.time(), 'endpoint': endpoint,
+                               'params': {k: str(v) for k, v in params.items() if v is not None},
+                               'payload': payload}, ensure_ascii=False)
+            with self._log_lock:
+                self._log.write(line + '\n')
+                self._log.flush()
+        return payload
+
+    def close(self):
+        with self._log_lock:
+            self._log.close()
+
+
+class ReplayClient(KPLClient):
+    def __init__(self, log_path, speed=None, **kwargs):
+        """speed 为回放倍速，None 表示尽可能快：每次请求直接取该请求的下一条录制结果"""
+        super().__init__(**kwargs)
+        self.speed = speed
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+
+        self.times = defaultdict(list)
+        self.payloads = defaultdict(list)
+        with open(log_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # 录制中断时最后一行可能不完整
+                key = request_key(record['endpoint'], record['params'])
+                self.times[key].append(record['t'])
+                self.payloads[key].append(record['payload'])
+        for key in self.times:
+            order = sorted(range(len(self.times[key])), key=self.times[key].__getitem__)
+            self.times[key] = [self.times[key][i] for i in order]
+            self.payloads[key] = [self.payloads[key][i] for i in order]
+
+        starts = [times[0] for times in self.times.values()]
+        self.start_time = min(starts) if starts else 0.0
+        self.end_time = max(times[-1] for times in self.times.values()) if starts else 0.0
+        self._virtual = self.start_time
+        self._wall_start = None
+        self._cursors = defaultdict(int)
+
+    def now(self):
+        """回放中的虚拟时间（录制时的时间戳）"""
+        with self._lock:
+            if self.speed is None:
+                return self._virtual
+            if self._wall_start is None:
+                self._wall_start = time.monotonic()
+            return self.start_time + (time.monotonic() - self._wall_start) * self.speed
+
+    def finished(self):
+        """回放是否结束：倍速模式看虚拟时间，极速模式看请求过的录制是否都已取完"""
+        if self.speed is None:
+            with self._lock:
+                requested = [key for key in self._cursors if key in self.times]
+                return bool(requested) and all(self._cursors[key] >= len(self.times[key]) for key in requested)
+        return self.now() > self.end_time
+
+    def fetch_json(self, endpoint, **params):
+        """按虚拟时间返回录制的结果，不发起网络请求"""
+        key = request_key(endpoint, params)
+        times = self.times.get(key)
+        if not times:
+            raise KPLAPIError(f"{endpoint} 没有匹配的录制: {key}")
+
+        if self.speed is None:
+            with self._lock:
+                i = min(self._cursors[key], len(times) - 1)
+                self._cursors[key] = i + 1
+                self._virtual = max(self._virtual, times[i])
+            return self.payloads[key][i]
+
+        # 按倍速：取虚拟时间之前最近的一条，录制开始前请求的返回第一条
+        i = max(bisect.bisect_right(times, self.now()) - 1, 0)
+        return self.payloads[key][i]
+
+
+def main():
+    """主函数：录制模式下轮询实时接口写日志；回放模式下按倍速重放并统计"""
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="盘中快照录制与回放")
+    parser.add_argument('mode', choices=('record', 'replay'))
+    parser.add_argument('--log', default=default_log_path())
+    parser.add_argument('--interval', type=float, default=3.0, help="录制轮询间隔（秒）")
+    parser.add_argument('--speed', type=float, default=None, help="回放倍速，不填为尽可能快")
+    args = parser.parse_args()
+
+    polls = [('DailyLimitPerformance', {'PidType': pid}) for pid in range(1, 6)]
+    polls += [('ChangeStatistics', {}), ('RealRankingInfo', {})]
+
+    if args.mode == 'record':
+        client = RecordingClient(args.log)
+        try:
+            while market_time().strftime('%H%M') <= '1500':
+                started = time.time()
+                for endpoint, params in polls:
+                    try:
+                        client.fetch_json(endpoint, **params)
+                    except KPLAPIError as e:
+                        logging.warning(str(e))
+                time.sleep(max(args.interval - (time.time() - started), 0))
+        except KeyboardInterrupt:
+            pass
+        client.close()
+        return
+
+    client = ReplayClient(args.log, speed=args.speed)
+    if not any(request_key(endpoint, params) in client.times for endpoint, params in polls):
+        print(f"{args.log} 中没有可回放的录制")
+        return
+    started = time.perf_counter()
+    served = 0
+    while not client.finished():
+        for endpoint, params in polls:
+            try:
+                client.fetch_json(endpoint, **params)
+                served += 1
+            except KPLAPIError:
+                pass
+        if args.speed is not None:
+            time.sleep(args.interval / args.speed)
+    elapsed = time.perf_counter() - started
+    print(f"\n⏩ 回放 {client.end_time - client.start_time:.0f} 秒的录制，返回 {served} 次，耗时 {elapsed:.2f} 秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多进程分片扫描
+功能：同一台机器上的多个工作进程从SQLite工作队列中租用工作单元，
+      执行期间发送心跳续租，进程死掉后租约过期由其他进程回收；
+      各进程把结果写入各自的分片存储，最后合并进本地存储。
+      队列依赖SQLite的文件锁，只面向单机：网络文件系统（NFS/SMB）上的锁不可靠，不要把队列库放在共享目录
+"""
+
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+from backfill_orchestrator import BACKFILL_JOBS, run_job
+from local_store import LocalStore
+from trading_calendar import default_calendar
+
+# 扫描任务：在回补任务基础上加入只有实时接口的大单监控，date_param为None表示不带日期参数，
+# 这类单元的日期只用于分组存储（即扫描当日）
+SWEEP_JOBS = dict(BACKFILL_JOBS, **{
+    'GetMainMonitor_w30': {'date_param': None, 'date_format': None, 'symbol_param': 'StockID', 'paged': True},
+})
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+SHARD_DIR = os.path.join(DATA_DIR, "shards")
+QUEUE_PATH = os.path.join(DATA_DIR, "sweep_queue.db")
+
+
+class WorkQueue:
+    """SQLite实现的租约队列，供同一台机器上的多个进程共用；
+    使用默认的回滚日志而不是WAL，每次写都以 BEGIN IMMEDIATE 取得库级写锁"""
+
+    def __init__(self, path=QUEUE_PATH, lease_seconds=60, max_attempts=3):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.setup_database()
+
+    def setup_database(self):
+        with self._lock:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS work (
+                    endpoint TEXT NOT NULL,
+                    day TEXT NOT NULL,
+                    symbol TEXT NOT NULL DEFAULT '',
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    worker TEXT,
+                    lease_until REAL NOT NULL DEFAULT 0,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    PRIMARY KEY (endpoint, day, symbol)
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_work_status_lease ON work (status, lease_until)")
+
+    def add(self, units):
+        """加入工作单元 (endpoint, day, symbol)，已存在的忽略，返回新增数量"""
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            before = self.conn.total_changes
+            self.conn.executemany("INSERT OR IGNORE INTO work (endpoint, day, symbol) VALUES (?, ?, ?)", units)
+            self.conn.execute("COMMIT")
+            return self.conn.total_changes - before
+
+    def lease(self, worker, size=10):
+        """租用一批单元：待办的，或租约已过期的（持有者已死）。每次租用计一次尝试，
+        让执行时把进程带崩的单元不会被无限重租；用完尝试次数的过期单元记为失败"""
+        now = time.time()
+        with self._lock:
+            # BEGIN IMMEDIATE 取得写锁，保证多个进程不会租到同一单元
+            self.conn.execute("BEGIN IMMEDIATE")
+            self.conn.execute(
+                "UPDATE work SET status = 'failed', error = COALESCE(error, '租约过期') "
+                "WHERE status = 'leased' AND lease_until < ? AND attempts >= ?",
+                (now, self.max_attempts)
+            )
+            rows = self.conn.execute(
+                "SELECT endpoint, day, symbol FROM work WHERE attempts < ? AND "
+                "(status = 'pending' OR (status = 'leased' AND lease_until < ?)) "
+                "ORDER BY day DESC LIMIT ?",
+                (self.max_attempts, now, size)
+            ).fetchall()
+            self.conn.executemany(
+                "UPDATE work SET status = 'leased', worker = ?, lease_until = ?, attempts = attempts + 1 "
+                "WHERE endpoint = ? AND day = ? AND symbol = ?",
+                ((worker, now + self.lease_seconds) + tuple(row) for row in rows)
+            )
+            self.conn.execute("COMMIT")
+        return [tuple(row) for row in rows]
+
+    def heartbeat(self, worker):
+        """续租该进程持有的全部单元"""
+        with self._lock:
+            self.conn.execute(
+                "UPDATE work SET lease_until = ? WHERE worker = ? AND status = 'leased'",
+                (time.time() + self.lease_seconds, worker)
+            )
+
+    def complete(self, worker, unit):
+        with self._lock:
+            self.conn.execute(
+                "UPDATE work SET status = 'done', error = NULL WHERE endpoint = ? AND day = ? AND symbol = ? AND worker = ?",
+                tuple(unit) + (worker,)
+            )
+
+    def fail(self, worker, unit, error):
+        """失败的单元放回待办（尝试次数已在租用时累计），用完尝试次数的记为失败"""
+        with self._lock:
+            self.conn.execute(
+                "UPDATE work SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "error = ?, lease_until = 0 WHERE endpoint = ? AND day = ? AND symbol = ? AND worker = ?",
+                (self.max_attempts, error[:500]) + tuple(unit) + (worker,)
+            )
+
+    def counts(self):
+        with self._lock:
+            return dict(self.conn.execute("SELECT status, COUNT(*) FROM work GROUP BY status").fetchall())
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+class SweepWorker:
+    def __init__(self, client, queue_path, shard_dir=SHARD_DIR, worker_id=None,
+                 lease_seconds=60, batch_size=10):
+        self.client = client
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.queue = WorkQueue(queue_path, lease_seconds)
+        self.batch_size = batch_size
+        self.heartbeat_interval = max(lease_seconds / 3.0, 1.0)
+        self.shard_store = LocalStore(os.path.join(shard_dir, self.worker_id))
+        self.logger = logging.getLogger(__name__)
+        self._stop = threading.Event()
+
+    def _heartbeat_loop(self):
+        while not self._stop.wait(self.heartbeat_interval):
+            try:
+                self.queue.heartbeat(self.worker_id)
+            except sqlite3.Error as e:
+                self.logger.warning(f"心跳失败: {str(e)}")
+
+    def run_unit(self, unit):
+        """执行单元，结果写入本进程的分片存储"""
+        run_job(self.client, self.shard_store, SWEEP_JOBS[unit[0]], unit)
+
+    def run(self):
+        """循环租用并执行单元，直到队列为空，返回完成数量"""
+        heartbeat = threading.Thread(target=self._heartbeat_loop, daemon=True)
+        heartbeat.start()
+        done = 0
+        try:
+            while not self._stop.is_set():
+                units = self.queue.lease(self.worker_id, self.batch_size)
+                if not units:
+                    break
+                for unit in units:
+                    try:
+                        self.run_unit(unit)
+                        self.queue.complete(self.worker_id, unit)
+                        done += 1
+                    except Exception as e:
+                        self.queue.fail(self.worker_id, unit, str(e))
+                        self.logger.warning(f"[{self.worker_id}] 单元失败 {unit}: {str(e)}")
+        finally:
+            self._stop.set()
+            heartbeat.join()
+        self.logger.info(f"[{self.worker_id}] 完成 {done} 个单元")
+        return done
+
+    def stop(self):
+        self._stop.set()
+
+
+def plan_sweep(queue, endpoint, start, end, symbols=()):
+    """把扫描任务展开加入队列，实时接口只展开最近一个交易日"""
+    if endpoint not in SWEEP_JOBS:
+        raise ValueError(f"不支持扫描的接口: {endpoint}")
+    job = SWEEP_JOBS[endpoint]
+    calendar = default_calendar()
+    if job['date_param']:
+        calendar.require_known(end)
+        days = calendar.trading_days_between(start, end)
+    else:
+        days = [calendar.latest_trading_day()]
+    targets = list(symbols or job.get('default_symbols', ())) if job['symbol_param'] else ['']
+    return queue.add([(endpoint, day, symbol) for day in days for symbol in targets])
+
+
+def merge_shards(store, shard_dir=SHARD_DIR):
+    """把各进程分片存储中上次合并之后写入的结果合并进本地存储，返回合并条数。
+    每个分片合并到的保存时间记在本地存储的 shard_merge 元数据中"""
+    merged = 0
+    if not os.path.exists(shard_dir):
+        return merged
+    marks = store.load_meta('shard_merge') or {}
+    for name in sorted(os.listdir(shard_dir)):
+        db_path = os.path.join(shard_dir, name, "kpl_store.db")
+        if not os.path.exists(db_path):
+            continue
+        mark_key = os.path.abspath(db_path)
+        shard = sqlite3.connect(db_path)
+        try:
+            rows = shard.execute(
+                "SELECT endpoint, day, key, fetched_at, body FROM payloads WHERE fetched_at > ? ORDER BY fetched_at",
+                (marks.get(mark_key, ''),)
+            )
+            for endpoint, day, key, fetched_at, body in rows:
+                store.put_payload(endpoint, day, json.loads(body), key=key)
+                marks[mark_key] = fetched_at
+                merged += 1
+        finally:
+            shard.close()
+    if merged:
+        store.save_meta('shard_merge', marks)
+    return merged
+
+
+def _worker_process(queue_path, shard_dir, lease_seconds):
+    """子进程入口：每个进程独立创建客户端和数据库连接"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    from kpl_client import KPLClient
+
+    SweepWorker(KPLClient(), queue_path, shard_dir, lease_seconds=lease_seconds).run()
+
+
+def run_local(queue_path, workers=4, shard_dir=SHARD_DIR, lease_seconds=60):
+    """在本机启动多个工作进程"""
+    import multiprocessing
+
+    processes = [multiprocessing.Process(target=_worker_process, args=(queue_path, shard_dir, lease_seconds))
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+
+def main(argv=None):
+    """主函数：单机多进程扫描当日分时，完成后合并分片"""
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="分片扫描当日分时/大单等接口")
+    parser.add_argument('--queue', default=QUEUE_PATH, help="队列数据库路径（须在本机磁盘上）")
+    parser.add_argument('--endpoint', default='GetStockTrend')
+    parser.add_argument('--start', default=None, help="默认为最近一个交易日")
+    parser.add_argument('--end', default=None)
+    parser.add_argument('--symbols', default='', help="逗号分隔的代码")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--shards', default=SHARD_DIR, help="各进程分片存储所在目录")
+    parser.add_argument('--worker-only', action='store_true', help="只作为工作进程加入本机已有的队列")
+    args = parser.parse_args(argv)
+
+    if args.worker_only:
+        _worker_process(args.queue, args.shards, 60)
+        return
+
+    queue = WorkQueue(args.queue)
+    start = args.start or default_calendar().latest_trading_day()
+    end = args.end or start
+    symbols = [s for s in args.symbols.split(',') if s]
+    print(f"新增 {plan_sweep(queue, args.endpoint, start, end, symbols)} 个工作单元")
+    run_local(args.queue, args.workers, args.shards)
+    print(f"队列状态: {queue.counts()}")
+    print(f"合并 {merge_shards(LocalStore(), args.shards)} 条结果")
+
+
+if __name__ == "__main__":
+    main()
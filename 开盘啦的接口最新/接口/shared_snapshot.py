@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+共享内存快照
+功能：发布进程把解码后的列式快照（全市场 RealRankingInfo_W8、板块聚合表）写入
+      multiprocessing.shared_memory，网关、告警、分析等读取进程直接映射为NumPy视图，
+      不复制也不反序列化；数据区双缓冲，头部 begin/end 两个计数器构成顺序锁，
+      读取方据此判断读到的版本是否被改写，内存占用与读取方数量无关
+
+段布局：
+    头部 HEADER_SIZE 字节：int64[6] = begin, end, 槽位0行数, 槽位0时间戳(微秒), 槽位1行数, 槽位1时间戳，
+                           随后是布局JSON的长度(int64)和内容（列名、dtype、两个槽位的偏移）
+    数据区：每列按容量分配两个槽位，版本 v 的数据、行数和时间戳都在槽位 v % 2，
+            与数据一起受顺序锁保护
+"""
+
+import json
+import logging
+import os
+import time
+
+import numpy as np
+
+from market_snapshot import MarketSnapshot
+from trading_calendar import market_time
+
+HEADER_SIZE = 4096
+ALIGN = 64
+MARKET_SEGMENT = 'kpl_market'
+PLATE_SEGMENT = 'kpl_plates'
+
+_BEGIN, _END = range(2)
+_HEADER_FIELDS = 6
+_META_OFFSET = _HEADER_FIELDS * 8
+
+
+def _slot_fields(slot):
+    """槽位的 (行数, 时间戳) 在头部数组中的下标"""
+    return 2 + 2 * slot, 3 + 2 * slot
+
+
+# 本进程创建的段，由创建方负责删除
+_created = set()
+
+
+def _attach(name):
+    """只读方式挂接已有的段，不让本进程的资源跟踪器在退出时删除它"""
+    from multiprocessing import shared_memory
+
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python 3.13 之前没有 track 参数，挂接也会登记，需要手动注销
+        shm = shared_memory.SharedMemory(name=name)
+        if os.name == 'posix' and name not in _created:
+            from multiprocessing import resource_tracker
+
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+
+def _layout(schema, capacity):
+    """按列的 dtype 和容量计算两个槽位的偏移，返回 (布局列表, 段总大小)"""
+    layout = []
+    offset = HEADER_SIZE
+    for name, dtype in schema.items():
+        dtype = np.dtype(dtype)
+        slots = []
+        for _ in range(2):
+            slots.append(offset)
+            offset += -(-capacity * dtype.itemsize // ALIGN) * ALIGN
+        layout.append({'name': name, 'dtype': dtype.str, 'slots': slots})
+    return layout, offset
+
+
+def _views(buf, layout, capacity):
+    """每列两个槽位的NumPy视图"""
+    return {item['name']: [np.ndarray((capacity,), dtype=item['dtype'], buffer=buf, offset=slot)
+                           for slot in item['slots']]
+            for item in layout}
+
+
+class SharedTablePublisher:
+    """单一写入方：创建共享段，每次 publish 写入空闲槽位后推进版本"""
+
+    def __init__(self, name, schema, capacity):
+        from multiprocessing import shared_memory
+
+        self.name = name
+        self.capacity = capacity
+        self.logger = logging.getLogger(__name__)
+        layout, size = _layout(schema, capacity)
+        encoded = json.dumps({'capacity': capacity, 'columns': layout}).encode('utf-8')
+        if len(encoded) + _META_OFFSET + 8 > HEADER_SIZE:
+            raise ValueError(f"列过多，布局超出头部大小: {len(encoded)} 字节")
+
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # 不能判断是正在运行的发布进程还是异常退出留下的段，不擅自删除
+            raise FileExistsError(f"共享段 {name} 已存在：可能已有发布进程在运行；"
+                                  f"确认没有后用 --unlink 删除残留的段再启动") from None
+        _created.add(name)
+        self.header = np.ndarray((_HEADER_FIELDS,), dtype=np.int64, buffer=self.shm.buf)
+        self.header[:] = 0
+        np.ndarray((1,), dtype=np.int64, buffer=self.shm.buf, offset=_META_OFFSET)[0] = len(encoded)
+        self.shm.buf[_META_OFFSET + 8:_META_OFFSET + 8 + len(encoded)] = encoded
+        self.columns = _views(self.shm.buf, layout, capacity)
+
+    @property
+    def version(self):
+        return int(self.header[_END])
+
+    def publish(self, columns, timestamp=None):
+        """写入一版数据，columns 为 {列名: 一维数组}，缺少的列填默认值；返回新版本号"""
+        rows = len(next(iter(columns.values()))) if columns else 0
+        if rows > self.capacity:
+            raise ValueError(f"{self.name} 行数 {rows} 超过容量 {self.capacity}")
+
+        version = int(self.header[_END]) + 1
+        slot = version % 2
+        # 先推进 begin：持有 version-2（同一槽位）的读取方据此得知数据将被改写
+        self.header[_BEGIN] = version
+        for name, views in self.columns.items():
+            target = views[slot]
+            if name in columns:
+                target[:rows] = columns[name]
+            else:
+                target[:rows] = np.zeros((), dtype=target.dtype)
+        rows_field, stamp_field = _slot_fields(slot)
+        self.header[rows_field] = rows
+        self.header[stamp_field] = int((time.time() if timestamp is None else timestamp) * 1e6)
+        self.header[_END] = version
+        return version
+
+    def close(self, unlink=True):
+        self.header = None
+        self.columns = None
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+            _created.discard(self.name)
+
+
+class SharedTableReader:
+    """读取方：挂接共享段，按当前版本返回零拷贝视图，并可校验读取期间未被改写"""
+
+    def __init__(self, name):
+        self.name = name
+        self.shm = _attach(name)
+        self.header = np.ndarray((_HEADER_FIELDS,), dtype=np.int64, buffer=self.shm.buf)
+        length = int(np.ndarray((1,), dtype=np.int64, buffer=self.shm.buf, offset=_META_OFFSET)[0])
+        meta = json.loads(bytes(self.shm.buf[_META_OFFSET + 8:_META_OFFSET + 8 + length]).decode('utf-8'))
+        self.capacity = meta['capacity']
+        self.columns = _views(self.shm.buf, meta['columns'], self.capacity)
+
+    @property
+    def version(self):
+        return int(self.header[_END])
+
+    def view(self):
+        """当前版本的 (版本号, 时间戳, {列名: 视图})，视图在再发布两版之前保持有效"""
+        while True:
+            version = int(self.header[_END])
+            slot = version % 2
+            rows_field, stamp_field = _slot_fields(slot)
+            rows = int(self.header[rows_field])
+            stamp = int(self.header[stamp_field]) / 1e6
+            # 读行数和时间戳期间同一槽位已开始写 version+2 时重读
+            if self.valid(version):
+                return version, stamp, {name: views[slot][:rows] for name, views in self.columns.items()}
+
+    def valid(self, version):
+        """版本 version 的视图是否仍未被改写：写入方尚未开始写同一槽位的 version+2"""
+        return int(self.header[_BEGIN]) < version + 2
+
+    def _read(self, func, retries):
+        for _ in range(retries):
+            version, stamp, columns = self.view()
+            if version == 0:
+                raise LookupError(f"{self.name} 尚未发布数据")
+            result = func(columns)
+            if self.valid(version):
+                return version, stamp, result
+        raise RuntimeError(f"{self.name} 连续 {retries} 次读取被改写")
+
+    def read(self, func, retries=100):
+        """在一致的视图上执行 func(columns)，读取期间槽位被改写则重试"""
+        return self._read(func, retries)[2]
+
+    def snapshot(self, retries=100):
+        """复制当前版本为 MarketSnapshot，供需要长期持有数据的调用方使用"""
+        _, stamp, columns = self._read(lambda views: {name: np.array(view) for name, view in views.items()}, retries)
+        return MarketSnapshot(columns, stamp)
+
+    def wait(self, after_version, timeout=None, interval=0.0005):
+        """等待版本号超过 after_version，返回新版本号，超时返回None"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            version = int(self.header[_END])
+            if version > after_version:
+                return version
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            time.sleep(interval)
+
+    def close(self):
+        self.header = None
+        self.columns = None
+        self.shm.close()
+
+
+def market_schema(columns=None):
+    """全市场快照的列和 dtype，与 MarketSnapshot 解码结果一致"""
+    from market_snapshot import STOCK_RANKING_COLUMNS
+
+    return {name: dtype for name, (_, _, dtype) in (columns or STOCK_RANKING_COLUMNS).items()}
+
+
+PLATE_SCHEMA = {
+    'plate_id': 'U8',
+    'name': 'U16',
+    'member_count': np.int64,
+    'limit_up_count': np.int32,
+    'mean_change': np.float64,
+    'main_net': np.float64,
+    'amount': np.float64,
+    'breadth': np.float64,
+}
+
+
+def plate_table(engine, snapshot):
+    """板块聚合表：PlateStrengthEngine 的聚合结果加上板块代码和名称"""
+    table = dict(engine.aggregate(snapshot))
+    plates = engine.index.plates
+    table['plate_id'] = np.asarray(plates, dtype=PLATE_SCHEMA['plate_id'])
+    table['name'] = np.asarray([engine.index.plate_names.get(p, '') for p in plates], dtype=PLATE_SCHEMA['name'])
+    return table
+
+
+def remove_segments(names=(MARKET_SEGMENT, PLATE_SEGMENT)):
+    """删除发布进程异常退出后残留的共享段，只应在确认没有发布进程运行时调用"""
+    from multiprocessing import shared_memory
+
+    for name in names:
+        try:
+            stale = shared_memory.SharedMemory(name=name)
+        except FileNotFoundError:
+            continue
+        stale.close()
+        stale.unlink()
+        logging.info(f"已删除残留的共享段 {name}")
+
+
+def main():
+    """主函数：默认作为发布进程定时拉取并发布；加 --read 参数则作为读取方打印最新版本，
+    加 --unlink 参数删除异常退出后残留的共享段"""
+    import sys
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if '--unlink' in sys.argv:
+        remove_segments()
+        return
+    if '--read' in sys.argv:
+        reader = SharedTableReader(MARKET_SEGMENT)
+        version = 0
+        try:
+            while True:
+                version = reader.wait(version)
+                top = reader.read(lambda c: (c['code'][np.argsort(-np.nan_to_num(c['change_pct']))[:5]]).tolist())
+                print(f"版本 {version} 延迟 {(time.time() - reader.view()[1]) * 1000:.2f} ms  涨幅前五 {top}")
+        except KeyboardInterrupt:
+            reader.close()
+        return
+
+    from data_quality import DataValidator
+    from kpl_client import KPLClient
+    from plate_strength import PlateStrengthEngine
+
+    client = KPLClient()
+    validator = DataValidator()
+    engine = PlateStrengthEngine()
+    market = SharedTablePublisher(MARKET_SEGMENT, market_schema(), capacity=8192)
+    # 板块索引盘中刷新可能新增板块，与 auction_capture 一样预留余量
+    plates = SharedTablePublisher(PLATE_SEGMENT, PLATE_SCHEMA, capacity=int(len(engine.index.plates) * 1.05) + 64)
+    try:
+        while market_time().strftime('%H%M') <= '1500':
+            started = time.time()
+            try:
+                snapshot = MarketSnapshot.fetch(client, validator=validator)
+                market.publish(snapshot.columns, snapshot.timestamp)
+                plates.publish(plate_table(engine, snapshot), snapshot.timestamp)
+            except Exception as e:
+                logging.warning(f"快照发布失败: {str(e)}")
+            time.sleep(max(3 - (time.time() - started), 0))
+    except KeyboardInterrupt:
+        pass
+    market.close()
+    plates.close()
+    validator.save_scores()
+
+
+if __name__ == "__main__":
+    main()
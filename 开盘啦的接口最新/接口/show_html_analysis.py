@@ -9,9 +9,46 @@ import os
 import re
 from urllib.parse import urlparse
 
-def analyze_html_simple():
+from url_templates import URLTemplateIndex
+
+DEFAULT_HTML_PATH = r"C:\吴QQ的AIR\BaiduSyncdisk\600 - 原桌面\7-25-2.html"
+
+def print_templates(index, describe):
+    """打印归纳出的URL模板及出现次数、参数样例，返回模板列表"""
+    templates = index.templates()
+    for i, item in enumerate(templates, 1):
+        print(f"   {i}. {item['template']}  ×{item['count']}")
+        print(f"      域名: {urlparse(item['sample_urls'][0]).netloc}")
+        print(f"      用途: {describe(item['sample_urls'][0])}")
+        varying = list(item['params'].items()) + list(item['path_values'].items())
+        for name, values in varying:
+            more = '+' if values['more'] else ''
+            print(f"      取值 {name}: {values['distinct']}{more} 种，如 {', '.join(values['samples'])}")
+        print()
+    return templates
+
+def guess_api_purpose(url):
+    url = url.lower()
+    if 'longhuvip.com' in url:
+        if 'getytfp_bkhx' in url:
+            return "获取板块行情数据"
+        return "龙虎榜数据接口"
+    if 'szse.cn' in url:
+        return "深交所交易日历数据"
+    if 'kpl.php' in url:
+        return "历史数据查询接口"
+    return ""
+
+def guess_image_purpose(url):
+    url = url.lower()
+    if 'sinajs.cn' in url:
+        if 'newchart/daily' in url:
+            return "新浪财经K线图表"
+        return "新浪财经图表"
+    return ""
+
+def analyze_html_simple(file_path=DEFAULT_HTML_PATH):
     """简化的HTML分析"""
-    file_path = r"C:\吴QQ的AIR\BaiduSyncdisk\600 - 原桌面\7-25-2.html"
     
     print("="*80)
     print("HTML文件数据来源分析结果")
@@ -25,8 +62,8 @@ def analyze_html_simple():
         print(f"   文件路径: {file_path}")
         print(f"   文件大小: {len(html_content)} 字符")
         
-        # 提取API端点
-        api_endpoints = []
+        # 提取API端点，同一接口只差参数的URL归并为一个模板
+        api_index = URLTemplateIndex()
         
         # fetch请求模式
         fetch_patterns = [
@@ -35,35 +72,16 @@ def analyze_html_simple():
         ]
         
         print(f"\nAPI端点分析:")
-        endpoint_count = 1
-        
         for pattern in fetch_patterns:
-            matches = re.findall(pattern, html_content, re.IGNORECASE)
-            for match in matches:
-                domain = urlparse(match).netloc
-                purpose = ""
-                
-                if 'longhuvip.com' in match.lower():
-                    if 'getytfp_bkhx' in match.lower():
-                        purpose = "获取板块行情数据"
-                    else:
-                        purpose = "龙虎榜数据接口"
-                elif 'szse.cn' in match.lower():
-                    purpose = "深交所交易日历数据"
-                elif 'kpl.php' in match.lower():
-                    purpose = "历史数据查询接口"
-                
-                print(f"   {endpoint_count}. {match}")
-                print(f"      域名: {domain}")
-                print(f"      用途: {purpose}")
-                print()
-                
-                api_endpoints.append({
-                    'url': match,
-                    'domain': domain,
-                    'purpose': purpose
-                })
-                endpoint_count += 1
+            for match in re.findall(pattern, html_content, re.IGNORECASE):
+                api_index.add(match)
+        
+        api_endpoints = [{
+            'url': item['template'],
+            'domain': urlparse(item['sample_urls'][0]).netloc,
+            'purpose': guess_api_purpose(item['sample_urls'][0]),
+            'count': item['count'],
+        } for item in print_templates(api_index, guess_api_purpose)]
         
         # 提取图片数据源
         print(f"图片数据源分析:")
@@ -72,27 +90,13 @@ def analyze_html_simple():
             r'src=[\'\"](https?://[^\'\"\s]+\.(?:jpg|jpeg|png|gif|svg|webp))[\'\"]\)',
         ]
         
-        image_count = 1
+        image_index = URLTemplateIndex()
         for pattern in img_patterns:
-            matches = re.findall(pattern, html_content, re.IGNORECASE)
-            for match in matches:
+            for match in re.findall(pattern, html_content, re.IGNORECASE):
                 if isinstance(match, tuple):
                     match = match[0]
-                
-                domain = urlparse(match).netloc if match.startswith('http') else 'image.sinajs.cn'
-                purpose = ""
-                
-                if 'sinajs.cn' in match.lower():
-                    if 'newchart/daily' in match.lower():
-                        purpose = "新浪财经K线图表"
-                    else:
-                        purpose = "新浪财经图表"
-                
-                print(f"   {image_count}. {match}")
-                print(f"      域名: {domain}")
-                print(f"      用途: {purpose}")
-                print()
-                image_count += 1
+                image_index.add(match)
+        print_templates(image_index, guess_image_purpose)
         
         # 提取外部脚本资源
         print(f"外部脚本资源:")
@@ -140,7 +144,7 @@ def analyze_html_simple():
             # 统计API使用
             for endpoint in api_endpoints:
                 if endpoint['domain'] == domain:
-                    domain_info['api_count'] += 1
+                    domain_info['api_count'] += endpoint['count']
                     if endpoint['purpose']:
                         domain_info['purposes'].add(endpoint['purpose'])
             
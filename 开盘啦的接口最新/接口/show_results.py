@@ -7,11 +7,10 @@
 import json
 import os
 
-def show_results():
+def show_results(log_dir="log"):
     """显示API分析结果"""
     
     # 读取最新的诊断报告
-    log_dir = "log"
     if not os.path.exists(log_dir):
         print("错误: log目录不存在")
         return
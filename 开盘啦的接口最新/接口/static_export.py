@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+静态快照导出
+功能：收盘后把每个交易日的涨停、连板梯队、板块、情绪视图渲染为JSON，
+      文件名带内容哈希并预压缩为 gzip（装了 brotli 时再加 .br），另写一份清单 manifest.json，
+      api/historical-limit-up.js 先按清单取当日涨停视图，没有再调用接口，CDN可永久缓存；
+      被新版本取代的文件保留 PRUNE_GRACE_DAYS 天再删除，仍持有旧清单的页面和CDN缓存不会取到404；
+      每个日期的输入指纹按日期顺序链式累积（连板高度和滚动指标依赖之前的日期），只重新生成指纹变化的日期
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import math
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from kpl_client import extract_rows, row_code, row_name
+from limit_up_ladder import BROKEN_KEY, LIMIT_UP_KEY, LimitUpLadder
+from local_store import LocalStore
+
+# 视图格式有变化时加一，所有日期重新生成
+EXPORT_VERSION = 2
+
+VIEWS = ('limit_up', 'ladder', 'plates', 'sentiment')
+
+# 各视图依赖的本地存储接口，其保存时间参与输入指纹
+INPUT_ENDPOINTS = ('HisDaBanList', 'HisRealRankingInfo', 'ZhangTingExpression', 'DiskReview',
+                   'HisZhangFuDetail', 'GetMoneyDate')
+
+# 不再被清单引用的文件保留的天数（收盘后每天导出一次，至少跨过一个导出周期）
+PRUNE_GRACE_DAYS = 2
+
+DEFAULT_OUTPUT_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                   '..', '..', 'public', 'snapshots'))
+
+# 精选板块历史排行(HisRealRankingInfo)数组行的字段下标：代码、名称、强度、主力净额
+PLATE_RANKING_COLUMNS = {'plate_id': 0, 'name': 1, 'strength': 2, 'main_net': 6}
+
+# 历史涨停列表(HisDaBanList)的字段：名称 -> (数组行下标, 字典行字段名)，字典行字段与 api/historical-limit-up.js 一致。
+# 历史涨停.txt 只有请求URL，数组行下标按同一组接口的排列（涨幅与个股排行同在第6列）推测，接入真实返回后需核对
+LIMIT_UP_COLUMNS = {
+    'code': (0, ('Code', 'code', 'ts_code')),
+    'name': (1, ('Name', 'name')),
+    'pct_chg': (6, ('PctChg', 'pctChg', 'pct_chg')),
+    'limit_times': (9, ('LimitTimes', 'limitTimes', 'limit_times')),
+    'plate_name': (11, ('PlateName', 'plateName', 'plate_name')),
+    'plate_id': (12, ('PlateID', 'plateId', 'plate_id')),
+}
+
+
+def _clean(value):
+    """转换为可写入JSON的值：NumPy标量转Python类型，nan/inf 转 null"""
+    if isinstance(value, dict):
+        return {str(k): _clean(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_clean(v) for v in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def _first(row, keys, default=None):
+    if isinstance(row, dict):
+        for key in keys:
+            if row.get(key) not in (None, ''):
+                return row[key]
+    return default
+
+
+def _limit_up_field(row, name, default=None):
+    """按 LIMIT_UP_COLUMNS 取涨停行的字段，兼容数组行与字典行"""
+    index, keys = LIMIT_UP_COLUMNS[name]
+    if isinstance(row, (list, tuple)):
+        value = row[index] if index < len(row) else None
+        return default if value in (None, '') else value
+    return _first(row, keys, default)
+
+
+def _number(value, cast, default):
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def encode_view(view):
+    """确定性序列化：键排序、紧凑分隔，相同内容得到相同字节和哈希"""
+    return json.dumps(_clean(view), ensure_ascii=False, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+
+def compress(body):
+    """返回 {后缀: 压缩后字节}，brotli 为可选依赖"""
+    variants = {'.gz': gzip.compress(body, compresslevel=9, mtime=0)}
+    try:
+        import brotli
+    except ImportError:
+        return variants
+    variants['.br'] = brotli.compress(body, quality=11)
+    return variants
+
+
+class StaticExporter:
+    def __init__(self, store=None, output_dir=DEFAULT_OUTPUT_DIR, ladder=None, emotion=None):
+        self.store = store or LocalStore()
+        self.output_dir = output_dir
+        self.ladder = ladder
+        self.emotion = emotion  # 可选的 EmotionCyclePipeline，没有时不导出情绪视图
+        self.logger = logging.getLogger(__name__)
+        self.manifest_path = os.path.join(output_dir, 'manifest.json')
+
+    def load_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return {'version': EXPORT_VERSION, 'dates': {}}
+        with open(self.manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def fingerprints(self, dates):
+        """按日期顺序链式累积输入指纹：某日输入变化会让之后所有日期的指纹一起变化"""
+        result = {}
+        chain = hashlib.sha256(f"v{EXPORT_VERSION}".encode('utf-8')).hexdigest()
+        for day in dates:
+            versions = self.store.payload_versions(day, INPUT_ENDPOINTS)
+            chain = hashlib.sha256((chain + json.dumps(versions)).encode('utf-8')).hexdigest()
+            result[day] = chain
+        return result
+
+    def limit_up_view(self, day):
+        """当日涨停股按板块分组，字段与 api/historical-limit-up.js 返回的 categories 一致"""
+        rows = extract_rows(self.store.get_payload('HisDaBanList', day, key=LIMIT_UP_KEY))
+        streak = {}
+        if self.ladder is not None and day in self.ladder.dates:
+            streak_row = self.ladder.streak[self.ladder.dates.index(day)]
+            streak = {code: int(streak_row[i]) for i, code in enumerate(self.ladder.codes) if streak_row[i]}
+
+        categories = {}
+        for row in rows:
+            code = str(_limit_up_field(row, 'code', row_code(row)))
+            plate_id = _limit_up_field(row, 'plate_id')
+            plate_name = _limit_up_field(row, 'plate_name', plate_id or '未分类')
+            category = categories.setdefault(plate_name, {'count': 0, 'stocks': []})
+            category['stocks'].append({
+                'ts_code': code,
+                'name': str(_limit_up_field(row, 'name', row_name(row))),
+                'plate_id': plate_id,
+                'plate_name': plate_name,
+                'limit_times': streak.get(code, _number(_limit_up_field(row, 'limit_times'), int, 1)),
+                'pct_chg': _number(_limit_up_field(row, 'pct_chg'), float, None),
+            })
+            category['count'] += 1
+        broken = extract_rows(self.store.get_payload('HisDaBanList', day, key=BROKEN_KEY))
+        return {'date': day, 'total_count': len(rows), 'broken_count': len(broken), 'categories': categories}
+
+    def ladder_view(self, day):
+        if self.ladder is None:
+            return None
+        return self.ladder.day_summary(day)
+
+    def plates_view(self, day, top=50):
+        """精选板块历史排行的前 top 个板块"""
+        payload = self.store.get_payload('HisRealRankingInfo', day)
+        if payload is None:
+            return None
+        plates = []
+        for row in extract_rows(payload)[:top]:
+            if isinstance(row, (list, tuple)):
+                item = {name: row[i] if i < len(row) else None for name, i in PLATE_RANKING_COLUMNS.items()}
+            else:
+                item = {'plate_id': row_code(row), 'name': row_name(row),
+                        'strength': _first(row, ('QiangDu', 'Strength')), 'main_net': _first(row, ('ZhuLiJingE',))}
+            plates.append(item)
+        return {'date': day, 'plates': plates}
+
+    def sentiment_view(self, day):
+        if self.emotion is None or day not in self.emotion.dates:
+            return None
+        row = self.emotion.dates.index(day)
+        values = {name: self.emotion.raw[row, i] for i, name in enumerate(self.emotion.raw_names)}
+        values.update({name: self.emotion.derived[row, i] for i, name in enumerate(self.emotion.derived_names)})
+        return {'date': day, 'phase': self.emotion.phase_of(day), 'values': values}
+
+    def render(self, day):
+        """渲染某日全部视图，返回 {视图: 数据}，无数据的视图不包含在内"""
+        views = {
+            'limit_up': self.limit_up_view(day),
+            'ladder': self.ladder_view(day),
+            'plates': self.plates_view(day),
+            'sentiment': self.sentiment_view(day),
+        }
+        return {name: view for name, view in views.items() if view is not None}
+
+    def write_view(self, name, day, view):
+        """写入带内容哈希的文件及其压缩版本，内容未变时文件已存在直接复用"""
+        body = encode_view(view)
+        digest = hashlib.sha256(body).hexdigest()[:16]
+        relative = f"{name}/{day}.{digest}.json"
+        path = os.path.join(self.output_dir, name, f"{day}.{digest}.json")
+        entry = {'path': relative, 'sha256': digest, 'bytes': len(body)}
+        variants = compress(body)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            for suffix, data in [('', body)] + list(variants.items()):
+                tmp_path = path + suffix + '.tmp'
+                with open(tmp_path, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, path + suffix)
+        for suffix, data in variants.items():
+            entry[suffix.lstrip('.')] = len(data)
+        return entry
+
+    def prune(self, manifest, now=None, grace_days=PRUNE_GRACE_DAYS):
+        """删除清单不再引用的旧文件：首次发现不再引用时记入清单的 superseded（路径 -> 时间），
+        超过 grace_days 天才删除，期间又被引用的移出记录。调用方随后写入清单"""
+        now = now or datetime.now()
+        referenced = {entry['path'] for item in manifest['dates'].values() for entry in item['files'].values()}
+        superseded = {path: stamp for path, stamp in manifest.get('superseded', {}).items() if path not in referenced}
+        expired = (now - timedelta(days=grace_days)).isoformat(timespec='seconds')
+        removed = 0
+        pending = set()
+        for name in VIEWS:
+            directory = os.path.join(self.output_dir, name)
+            if not os.path.isdir(directory):
+                continue
+            for filename in os.listdir(directory):
+                base = filename
+                for suffix in ('.gz', '.br'):
+                    if base.endswith(suffix):
+                        base = base[:-len(suffix)]
+                relative = f"{name}/{base}"
+                if relative in referenced:
+                    continue
+                superseded.setdefault(relative, now.isoformat(timespec='seconds'))
+                if superseded[relative] <= expired:
+                    os.remove(os.path.join(directory, filename))
+                    removed += 1
+                else:
+                    pending.add(relative)
+        manifest['superseded'] = {path: superseded[path] for path in sorted(pending)}
+        return removed
+
+    def export(self, dates=None, force=False, prune=True):
+        """导出指纹变化的日期并更新清单，返回 {'exported': 重新生成的日期数, 'skipped': 跳过数}"""
+        if dates is None:
+            dates = set(self.store.list_days('HisDaBanList', key=LIMIT_UP_KEY))
+            if self.emotion is not None:
+                dates.update(self.emotion.dates)
+        dates = sorted(dates)
+        manifest = self.load_manifest()
+        if manifest.get('version') != EXPORT_VERSION:
+            manifest = {'version': EXPORT_VERSION, 'dates': {}}
+
+        exported = skipped = 0
+        for day, fingerprint in self.fingerprints(dates).items():
+            previous = manifest['dates'].get(day)
+            if not force and previous is not None and previous['fingerprint'] == fingerprint:
+                skipped += 1
+                continue
+            files = {name: self.write_view(name, day, view) for name, view in self.render(day).items()}
+            manifest['dates'][day] = {'fingerprint': fingerprint, 'files': files}
+            exported += 1
+
+        manifest['dates'] = dict(sorted(manifest['dates'].items()))
+        manifest['generated_at'] = datetime.now().isoformat(timespec='seconds')
+        manifest['views'] = list(VIEWS)
+        removed = self.prune(manifest) if prune else 0
+        os.makedirs(self.output_dir, exist_ok=True)
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, self.manifest_path)
+        self.logger.info(f"静态快照导出完成: 生成 {exported} 个日期，跳过 {skipped} 个，清理 {removed} 个旧文件")
+        return {'exported': exported, 'skipped': skipped, 'removed': removed}
+
+
+def main(argv=None):
+    """主函数：收盘后增量更新梯队和情绪指标，再导出有变化的日期"""
+    import argparse
+
+    from emotion_cycle import EmotionCyclePipeline
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="导出前端使用的静态快照")
+    parser.add_argument('--out', default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument('--force', action='store_true', help="忽略指纹，全部重新生成")
+    args = parser.parse_args(argv)
+
+    store = LocalStore()
+    ladder = LimitUpLadder(store)
+    ladder.load()
+    ladder.ingest_from_store()
+    ladder.save()
+    emotion = EmotionCyclePipeline(store, ladder=ladder)
+    emotion.load()
+    emotion.update()
+
+    result = StaticExporter(store, args.out, ladder, emotion).export(force=args.force)
+    print(f"\n📦 静态快照: 生成 {result['exported']} 个日期，跳过 {result['skipped']} 个，输出目录 {args.out}")
+
+
+if __name__ == "__main__":
+    main()
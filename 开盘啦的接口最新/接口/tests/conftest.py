@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+"""测试公共设置：各模块按脚本目录平铺导入，把接口目录加入 sys.path"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def store(tmp_path):
+    from local_store import LocalStore
+
+    store = LocalStore(str(tmp_path / "data"))
+    yield store
+    store.close()
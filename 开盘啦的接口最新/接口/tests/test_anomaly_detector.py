@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime
+
+import numpy as np
+
+from anomaly_detector import AnomalyDetector
+from market_snapshot import MarketSnapshot
+from trading_calendar import MARKET_TZ
+
+CODES = np.array([f"{600000 + i:06d}" for i in range(50)])
+
+
+def stamp(day, hhmm):
+    return datetime.strptime(f"{day} {hhmm}", '%Y-%m-%d %H:%M').replace(tzinfo=MARKET_TZ).timestamp()
+
+
+def minutes_since_open(hhmm):
+    hour, minute = int(hhmm[:2]), int(hhmm[3:])
+    total = (hour - 9) * 60 + minute - 30
+    return total if hour < 13 else total - 90
+
+
+def snapshot(day, hhmm, volume_per_minute=1000.0, surge=None):
+    volume = np.full(len(CODES), volume_per_minute * max(minutes_since_open(hhmm), 0))
+    if surge is not None:
+        volume[surge] *= 20
+    columns = {
+        'code': CODES,
+        'name': np.array(['股票'] * len(CODES)),
+        'price': np.full(len(CODES), 10.0),
+        'prev_close': np.full(len(CODES), 10.0),
+        'change_pct': np.zeros(len(CODES)),
+        'volume': volume,
+    }
+    return MarketSnapshot(columns, stamp(day, hhmm))
+
+
+def session(hhmm_from, hhmm_to):
+    start, end = minutes_since_open(hhmm_from), minutes_since_open(hhmm_to)
+    for minute in range(start, end + 1):
+        total = minute + 30 + (90 if minute > 120 else 0)
+        yield f"{9 + total // 60:02d}:{total % 60:02d}"
+
+
+def trained_detector(store):
+    detector = AnomalyDetector(store, min_baseline_days=3)
+    for day in ('2024-03-04', '2024-03-05', '2024-03-06'):
+        for hhmm in session('09:30', '15:00'):
+            detector.update(snapshot(day, hhmm))
+    return detector
+
+
+def test_mid_session_start_does_not_fire_volume_surge(store):
+    detector = trained_detector(store)
+    fired = []
+    for hhmm in session('10:30', '11:00'):
+        fired += [a for a in detector.update(snapshot('2024-03-07', hhmm)) if a['kind'] == 'volume_surge']
+    assert fired == []
+
+
+def test_volume_surge_fires_after_warmup(store):
+    detector = trained_detector(store)
+    for hhmm in session('10:30', '10:40'):
+        detector.update(snapshot('2024-03-07', hhmm))
+    fired = detector.update(snapshot('2024-03-07', '10:41', surge=[3]))
+    assert [a['code'] for a in fired if a['kind'] == 'volume_surge'] == [CODES[3]]
+
+
+def test_missing_minutes_are_not_merged_into_baseline(store):
+    detector = trained_detector(store)
+    before = detector.baseline[:detector.size].copy()
+    for hhmm in session('10:30', '10:35'):
+        detector.update(snapshot('2024-03-07', hhmm, volume_per_minute=0.0))
+    detector.end_of_day()
+    after = detector.baseline[:detector.size]
+    opening = minutes_since_open('10:29')
+    assert np.array_equal(after[:, :opening], before[:, :opening])
+    assert (after[:, opening + 2] < before[:, opening + 2]).all()
+
+
+def test_low_price_limit_break_and_reseal(store):
+    detector = AnomalyDetector(store)
+
+    def tick(hhmm, price):
+        columns = {
+            'code': np.array(['600000']), 'name': np.array(['低价股']),
+            'price': np.array([price]), 'prev_close': np.array([3.33]),
+            'change_pct': np.array([(price / 3.33 - 1) * 100]), 'volume': np.array([1000.0]),
+        }
+        return [a['kind'] for a in detector.update(MarketSnapshot(columns, stamp('2024-03-07', hhmm)))]
+
+    # 3.33 的涨停价为 3.66，涨幅只有 9.91%
+    tick('09:35', 3.66)
+    assert detector.sealed[0]
+    assert 'limit_break' in tick('09:40', 3.60)
+    assert 'limit_reseal' in tick('09:45', 3.66)
+
+
+def test_replay_does_not_learn(store):
+    detector = trained_detector(store)
+    replay = AnomalyDetector(store, min_baseline_days=3, learn=False)
+    assert replay.load()
+    before = replay.baseline[:replay.size].copy()
+    for day in ('2024-03-07', '2024-03-08'):
+        for hhmm in session('09:30', '10:00'):
+            replay.update(snapshot(day, hhmm, volume_per_minute=50.0))
+    replay.end_of_day()
+    np.testing.assert_array_equal(replay.baseline[:replay.size], before)
+    assert detector.baseline_days[0] == replay.baseline_days[0]
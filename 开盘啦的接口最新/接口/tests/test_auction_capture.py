@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+import pytest
+
+from auction_capture import AuctionCapture, clock_today
+from trading_calendar import market_time
+
+ROWS = 5400
+
+
+def ranking_row(i):
+    row = [''] * 80
+    row[0] = f"{600000 + i:06d}"
+    return row
+
+
+class FakeLimiter:
+    host_limits = {'hq': (8.0, 8)}
+    endpoint_limits = {}
+
+    def reserve(self, host, endpoint=None):
+        return 0.0
+
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def json(self):
+        return {'list': self.rows}
+
+
+class FakeSession:
+    def __init__(self, delay):
+        self.delay = delay
+        self.running = 0
+        self.lock = threading.Lock()
+
+    def mount(self, prefix, adapter):
+        pass
+
+    def get(self, url, timeout):
+        with self.lock:
+            self.running += 1
+        try:
+            if self.delay > timeout:
+                time.sleep(timeout)
+                raise TimeoutError("read timed out")
+            time.sleep(self.delay)
+            return FakeResponse([ranking_row(0)])
+        finally:
+            with self.lock:
+                self.running -= 1
+
+
+class FakeClient:
+    def __init__(self, delay=0.0):
+        self.rate_limiter = FakeLimiter()
+        self.session = FakeSession(delay)
+
+    def build_url(self, endpoint, **params):
+        return endpoint
+
+    def fetch_json(self, endpoint, **params):
+        return {'list': [ranking_row(params['index'])]}
+
+    def fetch_all_pages(self, endpoint, index_key='Index', **params):
+        return [ranking_row(i) for i in range(ROWS)]
+
+
+def test_default_interval_fits_rate_limit(store):
+    capture = AuctionCapture(FakeClient(), store, workers=2, page_size=60)
+    capture.prepare()
+    assert capture.pages == 90
+    assert capture.interval >= 90 / 8.0
+    assert capture.tick_budget() <= capture.interval
+
+
+def test_infeasible_interval_is_refused(store):
+    capture = AuctionCapture(FakeClient(), store, interval=3.0, workers=2, page_size=60)
+    with pytest.raises(ValueError):
+        capture.prepare()
+
+
+def test_slow_pages_do_not_outlive_their_tick(store):
+    client = FakeClient()
+    capture = AuctionCapture(client, store, interval=60.0, workers=4, page_size=60)
+    capture.prepare(expected_rows=240)
+    client.session.delay = 1.0
+    deadline = time.time() + 0.2
+    assert not capture.tick(0, deadline)
+    time.sleep(0.1)
+    assert client.session.running == 0
+    capture.executor.shutdown()
+
+
+@pytest.mark.skipif(not hasattr(time, 'tzset'), reason="需要 time.tzset")
+def test_clock_today_is_beijing_time(monkeypatch):
+    try:
+        monkeypatch.setenv('TZ', 'America/New_York')
+        time.tzset()
+        opening = market_time(clock_today('09:15:00'))
+        assert (opening.hour, opening.minute, opening.date()) == (9, 15, market_time().date())
+    finally:
+        monkeypatch.undo()
+        time.tzset()
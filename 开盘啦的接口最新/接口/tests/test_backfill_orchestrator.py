@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from backfill_orchestrator import DONE, FAILED, BackfillOrchestrator
+
+
+class FakeClient:
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.calls = []
+
+    def fetch_json(self, endpoint, **params):
+        self.calls.append((endpoint, params['StockID'], params['Day']))
+        if params['StockID'] in self.failing:
+            raise RuntimeError("boom")
+        return {'trend': [params['Day']]}
+
+
+@pytest.fixture
+def checkpoint(tmp_path):
+    return str(tmp_path / "checkpoint.db")
+
+
+def test_plan_run_and_resume(store, checkpoint):
+    client = FakeClient(failing={'000001'})
+    orchestrator = BackfillOrchestrator(client, store, checkpoint, max_workers=2, max_attempts=2)
+    # 2024-03-04 ~ 03-08 共5个交易日
+    assert orchestrator.plan('GetStockTrend', '2024-03-04', '2024-03-10', ['600000', '000001']) == 10
+    assert orchestrator.plan('GetStockTrend', '2024-03-04', '2024-03-10', ['600000', '000001']) == 0
+    assert orchestrator.run() == 5
+    assert orchestrator.progress() == {DONE: 5, FAILED: 5}
+    # 失败单元重试到上限为止
+    assert sum(1 for _, code, _ in client.calls if code == '000001') == 10
+    assert store.get_payload('GetStockTrend', '2024-03-08', key='600000') == {'trend': ['20240308']}
+    orchestrator.close()
+
+    # 从检查点继续：已完成和用完尝试次数的单元不再执行
+    resumed = BackfillOrchestrator(FakeClient(), store, checkpoint, max_attempts=2)
+    assert resumed.run() == 0
+    resumed.close()
+
+
+def test_plan_beyond_calendar_is_refused(store, checkpoint):
+    orchestrator = BackfillOrchestrator(FakeClient(), store, checkpoint)
+    with pytest.raises(ValueError):
+        orchestrator.plan('GetStockTrend', '2099-01-01', '2099-01-10', ['600000'])
+    with pytest.raises(ValueError):
+        orchestrator.plan('NoSuchEndpoint', '2024-03-04', '2024-03-05')
+    orchestrator.close()
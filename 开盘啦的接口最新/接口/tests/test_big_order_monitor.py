@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+import time
+from datetime import datetime
+
+import pytest
+
+from big_order_monitor import seconds_of
+from trading_calendar import MARKET_TZ
+
+
+def test_clock_strings():
+    assert seconds_of('10:31:05') == seconds_of('103105') == 10 * 3600 + 31 * 60 + 5
+    assert seconds_of('10:31') == 10 * 3600 + 31 * 60
+    assert seconds_of('') == -1
+
+
+@pytest.mark.skipif(not hasattr(time, 'tzset'), reason="需要 time.tzset")
+def test_timestamps_use_market_time(monkeypatch):
+    stamp = datetime(2024, 3, 4, 10, 31, 5, tzinfo=MARKET_TZ).timestamp()
+    try:
+        for zone in ('UTC', 'America/New_York'):
+            monkeypatch.setenv('TZ', zone)
+            time.tzset()
+            assert seconds_of(int(stamp)) == seconds_of(int(stamp * 1000)) == 10 * 3600 + 31 * 60 + 5
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+
+
+class _Client:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def fetch_json(self, endpoint, **params):
+        return {'list': self.rows if params['Index'] == 0 else []}
+
+
+def test_trade_ids_keep_identical_prints():
+    from big_order_monitor import BigOrderMonitor
+
+    monitor = BigOrderMonitor(_Client([]), ['600000'])
+    same = {'Time': '10:31:05', 'Price': 10.0, 'Money': 3e6, 'Type': 1}
+    assert monitor.add_trades('600000', [dict(same, ID=1), dict(same, ID=2), dict(same, ID=2)]) == 2
+    # 没有序号的完全相同的两笔在同一秒内被合并
+    assert monitor.add_trades('600000', [same, same]) == 1
+
+
+def test_new_session_resets_windows(monkeypatch):
+    import big_order_monitor
+    from big_order_monitor import BigOrderMonitor
+
+    rows = [{'Time': '14:59:00', 'Price': 10.0, 'Money': 3e6, 'Type': 1}]
+    monitor = BigOrderMonitor(_Client(rows), ['600000'])
+    monkeypatch.setattr(big_order_monitor, 'market_time', lambda: datetime(2024, 3, 4, 14, 59, tzinfo=MARKET_TZ))
+    assert monitor.poll() == 1
+    monitor.client.rows = [{'Time': '09:31:00', 'Price': 10.0, 'Money': 5e6, 'Type': 2}]
+    monkeypatch.setattr(big_order_monitor, 'market_time', lambda: datetime(2024, 3, 5, 9, 31, tzinfo=MARKET_TZ))
+    # 前一日的最新分钟 14:59 不会让次日早盘的大单被当作过期丢弃
+    assert monitor.poll() == 1
+    assert monitor.latest_minute == 9 * 60 + 31
+    assert monitor.stock_window('600000', 15) == {'net_buy': -5e6, 'count': 1, 'largest': 5e6}
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+import cache_warmer
+from cache_warmer import CachedClient
+from kpl_client import KPLClient
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = []
+
+    def fetch_json(self, endpoint, **params):
+        calls.append(endpoint)
+        return {'list': [[endpoint, len(calls)]]}
+
+    monkeypatch.setattr(KPLClient, 'fetch_json', fetch_json)
+    monkeypatch.setattr(cache_warmer, 'session_day', lambda day=None: '2024-03-04')
+    return calls
+
+
+def test_only_warmed_endpoints_are_cached(store, calls):
+    client = CachedClient(store)
+    first = client.fetch_json('GetDayZhangTing', StockID='600000')
+    assert client.fetch_json('GetDayZhangTing', StockID='600000') == first
+    client.fetch_json('RealRankingInfo_W8')
+    client.fetch_json('RealRankingInfo_W8')
+    assert calls == ['GetDayZhangTing', 'RealRankingInfo_W8', 'RealRankingInfo_W8']
+    assert client.hits.sum() == 1 and client.misses.sum() == 1
+
+
+def test_session_day_follows_the_clock(store, calls, monkeypatch):
+    client = CachedClient(store)
+    client.fetch_json('GetDayZhangTing', StockID='600000')
+    monkeypatch.setattr(cache_warmer, 'session_day', lambda day=None: '2024-03-05')
+    client.fetch_json('GetDayZhangTing', StockID='600000')
+    assert len(calls) == 2
+    # 换日前的计数已保存到前一交易日
+    assert client.stored_stats('2024-03-04').sum() == 1
+
+
+def test_stats_accumulate_across_processes(store, calls):
+    for _ in range(2):
+        client = CachedClient(store)
+        client.fetch_json('GetDayZhangTing', StockID='600000')
+        client.save_stats()
+        client.save_stats()
+    report = CachedClient(store)
+    report.load_stats()
+    assert int(report.hits.sum()) == 1 and int(report.misses.sum()) == 1
+
+
+def test_stats_are_bucketed_by_beijing_minute(store, calls, monkeypatch):
+    from datetime import datetime
+
+    from trading_calendar import MARKET_TZ
+
+    monkeypatch.setattr(cache_warmer, 'market_time', lambda: datetime(2024, 3, 4, 9, 31, tzinfo=MARKET_TZ))
+    client = CachedClient(store)
+    client.fetch_json('GetDayZhangTing', StockID='600000')
+    assert client.misses[9 * 60 + 31] == 1
+
+
+def test_concurrent_saves_keep_every_count(store, calls):
+    from concurrent.futures import ThreadPoolExecutor
+
+    def one_process(_):
+        client = CachedClient(store)
+        client.fetch_json('GetDayZhangTing', StockID='600000')
+        client.save_stats()
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(one_process, range(16)))
+    report = CachedClient(store)
+    report.load_stats()
+    assert int(report.hits.sum() + report.misses.sum()) == 16
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime
+
+import numpy as np
+
+from data_quality import FLAG, DataValidator, describe_flags
+from market_snapshot import limit_prices
+from trading_calendar import MARKET_TZ
+
+
+def stock_row(code, name, price, change, prev_close, volume=1000.0, turnover=1.0):
+    row = [None] * 19
+    row[0], row[1], row[5], row[6], row[7], row[8], row[9], row[13], row[17], row[18] = (
+        code, name, price, change, price * volume, turnover, volume, 0.0, prev_close, price)
+    return row
+
+
+ROWS = [
+    stock_row('600000', '浦发银行', 11.0, 10.0, 10.0),       # 正常涨停
+    stock_row('300001', '特锐德', 12.0, 20.0, 10.0),         # 创业板20%
+    stock_row('600001', '邯郸钢铁', 11.5, 15.0, 10.0),       # 主板超过10%
+    stock_row('600002', '齐鲁石化', 10.5, 1.0, 10.0),        # 涨幅与价格不一致
+    stock_row('600003', '东北高速', 10.0, 0.0, 10.0, volume=-1.0),
+    stock_row('600000', '浦发银行', 11.0, 10.0, 10.0),       # 重复代码
+    stock_row('', '', float('nan'), 0.0, 10.0),
+]
+
+
+def test_limit_prices_round_to_cents():
+    assert limit_prices(np.array([10.0, 9.99, 3.33]), np.array([10.0, 10.0, 20.0])).tolist() == [11.0, 10.99, 4.0]
+
+
+def test_each_check_is_flagged(store):
+    validator = DataValidator(store)
+    stamp = datetime(2024, 3, 4, 23, 30, tzinfo=MARKET_TZ).timestamp()
+    clean, flags = validator.validate('RealRankingInfo_W8', ROWS, timestamp=stamp)
+    assert clean.codes.tolist() == ['600000', '300001']
+    assert [describe_flags(flag) for flag in flags.tolist()] == [
+        [], [], ['out_of_range', 'limit_price'], ['inconsistent'], ['negative'], ['duplicate'],
+        ['null'],
+    ]
+    assert flags[2] & FLAG['limit_price']
+    # 隔离区按快照的北京时间日期保存
+    quarantined = list(store.iter_payloads('quarantine:RealRankingInfo_W8'))
+    assert [day for day, _, _ in quarantined] == ['2024-03-04']
+    assert len(quarantined[0][2]['rows']) == 5
+    score = validator.scores()['RealRankingInfo_W8']
+    assert (score['rows'], score['failed']) == (7, 5)
+
+
+def test_unknown_endpoint_passes_through(store):
+    clean, flags = DataValidator(store).validate('SomethingElse', ROWS[:2])
+    assert len(clean) == 2 and not flags.any()
+
+
+def test_scores_are_saved_per_day(store):
+    validator = DataValidator(store)
+    validator.validate('RealRankingInfo_W8', ROWS[:2], day='2024-03-04')
+    validator.validate('RealRankingInfo_W8', ROWS, day='2024-03-05')
+    validator.save_scores()
+    assert store.load_meta('data_quality_2024-03-04')['RealRankingInfo_W8']['failed'] == 0
+    assert store.load_meta('data_quality_2024-03-05')['RealRankingInfo_W8']['failed'] == 5
+    assert validator.scores()['RealRankingInfo_W8']['rows'] == 9
+
+
+def test_scores_can_be_saved_without_quarantine(tmp_path, monkeypatch):
+    import data_quality
+    from local_store import LocalStore
+
+    monkeypatch.setattr(data_quality, 'LocalStore', lambda: LocalStore(str(tmp_path / "data")))
+    validator = DataValidator(quarantine=False)
+    validator.validate('RealRankingInfo_W8', ROWS, day='2024-03-04')
+    validator.save_scores()
+    assert validator.store.load_meta('data_quality_2024-03-04')['RealRankingInfo_W8']['rows'] == 7
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from date_range_splitter import DateRangePlanner
+from kpl_client import ENDPOINTS
+from trading_calendar import TradingCalendar
+
+DATED = 'DatedRange'
+
+
+class RangeClient:
+    """按区间返回的假客户端：每个区间每只股票一行数组，第三列为请求的区间"""
+
+    def __init__(self, codes=('600000', '000001'), cap=None):
+        self.codes = codes
+        self.cap = cap
+        self.calls = []
+
+    def fetch_rows(self, endpoint, DStart, DEnd):
+        self.calls.append((DStart, DEnd))
+        if self.cap and DStart != DEnd:
+            return [[str(i), 'x', 0] for i in range(self.cap)]
+        return [[code, 'name', f"{DStart}~{DEnd}"] for code in self.codes]
+
+    def fetch_all_pages(self, endpoint, **params):
+        return self.fetch_rows(endpoint, **params)
+
+
+@pytest.fixture(autouse=True)
+def dated_endpoint(monkeypatch):
+    """逐日返回、可以分段的区间接口"""
+    monkeypatch.setitem(ENDPOINTS, DATED, {'page_size': 1000})
+
+
+def make_planner(client, store, rows_per_day=200, endpoint=DATED):
+    calendar = TradingCalendar(cache_path=None)
+    return DateRangePlanner(client, store, endpoint=endpoint, rows_per_day=rows_per_day, max_workers=2,
+                            calendar=calendar)
+
+
+def test_summary_endpoints_are_not_split(store):
+    client = RangeClient()
+    planner = make_planner(client, store, endpoint='GetInterviewsByDateZS')
+    rows = planner.fetch('2024-03-01', '2024-05-31')
+    # 多日统计每只股票一行整个区间的汇总，不会按分段重复
+    assert client.calls == [('2024-03-01', '2024-05-31')]
+    assert [row[0] for row in rows] == ['600000', '000001']
+
+
+def test_range_rows_are_kept_per_chunk(store):
+    client = RangeClient()
+    planner = make_planner(client, store)
+    chunks = planner.plan('2024-03-01', '2024-05-31')
+    assert len(chunks) > 1
+
+    rows = planner.fetch('2024-03-01', '2024-05-31')
+    assert len(rows) == 2 * len(chunks)
+    assert {row[2] for row in rows} == {f"{start}~{end}" for start, end, _ in chunks}
+
+
+def test_cached_chunks_are_reused_with_stable_grid(store):
+    client = RangeClient()
+    planner = make_planner(client, store)
+    planner.fetch('2024-03-01', '2024-05-31')
+    first_calls = len(client.calls)
+
+    # 新建的实例沿用持久化的网格，重叠区间全部命中缓存
+    again = make_planner(client, store, rows_per_day=5)
+    assert again.chunk_size() == planner.chunk_size()
+    assert again.plan('2024-03-01', '2024-05-31') == planner.plan('2024-03-01', '2024-05-31')
+    again.fetch('2024-03-01', '2024-05-31')
+    assert len(client.calls) == first_calls
+
+
+def test_split_chunk_is_cached(store):
+    client = RangeClient(cap=1000)
+    planner = make_planner(client, store)
+    start, end, _ = planner.plan('2024-03-04', '2024-03-29')[0]
+    pieces = planner.fetch_chunks(start, end)
+    assert len(pieces) == len(planner.trading_days(start, end))
+
+    client.calls.clear()
+    again = planner.fetch_chunks(start, end)
+    assert client.calls == []
+    assert again == pieces
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from dragon_tiger_store import HISTORY_ENDPOINT, DragonTigerStore, parse_records
+
+DAY_PAYLOAD = {'list': [
+    {'StockID': '600000', 'Name': '浦发银行',
+     'BuyList': [['甲营业部', 1000, 0], ['乙营业部', 500, 0]], 'SellList': [['丙营业部', 0, 800]]},
+    {'StockID': '000001', 'Name': '平安银行', 'BuyList': [['甲营业部', 300, 0]], 'SellList': []},
+]}
+
+
+def ranking(changes):
+    return {'list': [[code, '', 0, 0, 0, 10.0, change] for code, change in changes.items()]}
+
+
+@pytest.fixture
+def dragon_tiger(tmp_path):
+    dragon_tiger = DragonTigerStore(str(tmp_path / "dragon_tiger.db"))
+    yield dragon_tiger
+    dragon_tiger.close()
+
+
+def test_parse_nested_and_flat_rows():
+    assert parse_records(DAY_PAYLOAD)[:2] == [('600000', '浦发银行', '甲营业部', 'buy', 1000.0, 0.0),
+                                              ('600000', '浦发银行', '乙营业部', 'buy', 500.0, 0.0)]
+    flat = {'list': [{'StockID': '600000', 'StockName': '浦发银行', 'YybName': '丁营业部', 'BuyMoney': 1, 'SellMoney': 9}]}
+    assert parse_records(flat) == [('600000', '浦发银行', '丁营业部', 'sell', 1.0, 9.0)]
+
+
+def test_incremental_seat_stats(store, dragon_tiger):
+    store.put_payload(HISTORY_ENDPOINT, '2024-03-04', DAY_PAYLOAD)
+    store.put_payload('HisRankingInfo_W8', '2024-03-05', ranking({'600000': 2.5, '000001': -1.0}))
+    assert dragon_tiger.ingest_from_store(store) == 1
+    assert dragon_tiger.ingest_from_store(store) == 0
+
+    stats = dragon_tiger.seat_stats('甲营业部')
+    assert (stats['appearances'], stats['buy_count'], stats['total_buy']) == (2, 2, 1300.0)
+    assert stats['win_rate'] == 0.5 and stats['avg_next_change'] == 0.75
+    assert dragon_tiger.seat_stats('丙营业部')['win_rate'] is None
+    assert sorted(item['code'] for item in dragon_tiger.seat_appearances('甲营业部')) == ['000001', '600000']
+    assert {item['seat'] for item in dragon_tiger.stock_seats('600000')} == {'甲营业部', '乙营业部', '丙营业部'}
+    # 同一日再次评估不重复累计
+    assert dragon_tiger.evaluate_day('2024-03-05', {'600000': 2.5}) == 0
+    assert dragon_tiger.top_seats(min_evaluated=1)[0]['seat'] == '乙营业部'
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+from datetime import date, timedelta
+
+import numpy as np
+
+from emotion_cycle import EmotionCyclePipeline, extract_value, rolling_zscore
+
+
+def put_day(store, day, rng):
+    store.put_payload('ZhangTingExpression', day, {'info': [f"{rng.uniform(10, 50):.2f}%"] + list(rng.normal(0, 3, 3))})
+    store.put_payload('DiskReview', day, {'info': {'strong': rng.uniform(0, 100)}})
+    store.put_payload('HisZhangFuDetail', day, {'info': {'SZJS': int(rng.integers(500, 4000)),
+                                                        'XDJS': int(rng.integers(500, 4000))}})
+    store.put_payload('GetMoneyDate', day, {'value': rng.uniform(0, 100)})
+
+
+def test_extract_value():
+    payload = {'info': ['12.5%', {'x': '3'}]}
+    assert extract_value(payload, ('info', 0)) == 12.5
+    assert extract_value(payload, ('info', 1, 'x')) == 3.0
+    assert np.isnan(extract_value(payload, ('info', 5)))
+
+
+def test_rolling_zscore_matches_brute_force():
+    rng = np.random.default_rng(0)
+    values = rng.normal(size=(40, 2))
+    values[5, 0] = np.nan
+    z = rolling_zscore(values, 10)
+    for t in range(40):
+        for c in range(2):
+            window = values[max(t - 9, 0):t + 1, c]
+            window = window[~np.isnan(window)]
+            if len(window) < 5 or np.isnan(values[t, c]):
+                assert np.isnan(z[t, c])
+            else:
+                assert np.isclose(z[t, c], (values[t, c] - window.mean()) / window.std())
+
+
+def test_tail_update_matches_full_recompute(store):
+    rng = np.random.default_rng(1)
+    days = [(date(2024, 1, 1) + timedelta(days=i)).isoformat() for i in range(60)]
+    for day in days[:45]:
+        put_day(store, day, rng)
+    pipeline = EmotionCyclePipeline(store, window=10)
+    assert pipeline.update() == 45
+    for day in days[45:]:
+        put_day(store, day, rng)
+    assert pipeline.update() == 15
+
+    _, full = pipeline.compute_indicators(pipeline.raw)
+    np.testing.assert_allclose(pipeline.derived, full, equal_nan=True)
+    restored = EmotionCyclePipeline(store, window=10)
+    assert restored.load() and restored.dates == days
+    assert restored.phase_of(days[-1]) == pipeline.phase_of(days[-1])
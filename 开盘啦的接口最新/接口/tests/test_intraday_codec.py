@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+import json
+import time
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from intraday_codec import (GRID_SIZE, MINUTE_GRID, TREND_LAYOUTS, IntradayStore, decode, encode, minute_of, to_grid,
+                            trend_rows)
+from trading_calendar import MARKET_TZ
+
+
+def trend_payload(seed=0):
+    rng = np.random.default_rng(seed)
+    price = 10 + np.cumsum(rng.integers(-2, 3, GRID_SIZE)) / 100
+    rows = [[f"{t // 100:02d}:{t % 100:02d}", round(p, 2), round(p - 0.01, 2), int(v)]
+            for t, p, v in zip(MINUTE_GRID, price, rng.integers(0, 5000, GRID_SIZE))]
+    # 去掉两分钟模拟缺失
+    return {'trend': rows[:50] + rows[52:]}
+
+
+def test_round_trip_on_grid():
+    layout = TREND_LAYOUTS['GetStockTrend']
+    scaled, mask = to_grid(trend_payload()['trend'], layout)
+    assert mask.sum() == GRID_SIZE - 2 and not mask[50] and not mask[51]
+    # 缺失分钟：价格沿用上一分钟，成交量补0
+    assert scaled[0, 50] == scaled[0, 49] and scaled[2, 50] == 0
+    values, decoded_mask = decode(encode(scaled, mask), [scale for _, _, _, scale in layout])
+    np.testing.assert_allclose(values * np.array([[100], [100], [1]]), scaled)
+    np.testing.assert_array_equal(decoded_mask, mask)
+
+
+def test_store_get_and_load_day(tmp_path):
+    intraday = IntradayStore(str(tmp_path / "intraday.db"))
+    payloads = {'600000': trend_payload(0), '000001': trend_payload(1)}
+    intraday.put_many('GetStockTrend', [(code, '20240304', payload, 0) for code, payload in payloads.items()])
+    values, mask = intraday.get('GetStockTrend', '600000', '2024-03-04')
+    assert values[0, 0] == payloads['600000']['trend'][0][1]
+    symbols, day_values, masks = intraday.load_day('GetStockTrend', '2024-03-04')
+    assert symbols == ['000001', '600000']
+    np.testing.assert_array_equal(day_values[1], values)
+    intraday.close()
+
+
+@pytest.mark.skipif(not hasattr(time, 'tzset'), reason="需要 time.tzset")
+def test_timestamp_minutes_use_market_time(monkeypatch):
+    stamp = datetime(2024, 3, 4, 9, 31, tzinfo=MARKET_TZ).timestamp()
+    try:
+        for zone in ('UTC', 'America/New_York'):
+            monkeypatch.setenv('TZ', zone)
+            time.tzset()
+            assert minute_of(int(stamp)) == 931
+            assert minute_of(int(stamp * 1000)) == 931
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+    assert minute_of('09:31') == minute_of('0931') == minute_of(931) == 931
+
+
+def test_clock_strings_with_seconds():
+    assert minute_of('09:30:00') == minute_of('093000') == minute_of('93000') == 930
+    assert minute_of('14:59:59') == 1459
+    assert minute_of('202403041431') == minute_of('20240304143100') == 1431
+    assert minute_of('12345678') == minute_of('2500') == minute_of('0975') == minute_of('') == -1
+
+
+def realistic_payload(seed):
+    """价格按最小变动价位随机游走，成交量对数正态且早盘尾盘放量，均价为成交量加权"""
+    rng = np.random.default_rng(seed)
+    start = rng.uniform(3, 80)
+    tick = max(round(start * 0.0015, 2), 0.01)
+    price = np.round(start + np.cumsum(rng.choice([-1, 0, 0, 1], GRID_SIZE)) * tick, 2)
+    minutes = np.arange(GRID_SIZE)
+    shape = 1 + 2 * np.exp(-minutes / 15) + np.exp(-(GRID_SIZE - minutes) / 10)
+    volume = (rng.lognormal(np.log(rng.uniform(200, 20000)), 0.8, GRID_SIZE) * shape).astype(int)
+    average = np.round(np.cumsum(price * volume) / np.cumsum(volume), 2)
+    return {'trend': [[f"{t // 100:02d}:{t % 100:02d}", float(p), float(a), int(v)]
+                      for t, p, a, v in zip(MINUTE_GRID, price, average, volume)]}
+
+
+def test_compression_ratio_floor():
+    # 模块说明中记录的压缩比：成交量近乎随机，约 9.7x，这里守住下限防止退化
+    raw = packed = 0
+    for seed in range(100):
+        payload = realistic_payload(seed)
+        raw += len(json.dumps(payload, ensure_ascii=False).encode('utf-8'))
+        packed += len(encode(*to_grid(trend_rows(payload), TREND_LAYOUTS['GetStockTrend'])))
+    assert raw / packed >= 9.0
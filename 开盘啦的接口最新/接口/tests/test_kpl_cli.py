@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+import os
+import signal
+import socket
+import stat
+import subprocess
+import sys
+import time
+
+import pytest
+
+import kpl_cli
+
+posix_only = pytest.mark.skipif(os.name != 'posix', reason="文件权限和 SIGTERM 按 POSIX 检查")
+
+
+@posix_only
+def test_daemon_key_is_private(tmp_path, monkeypatch):
+    path = tmp_path / "kpl_cli.key"
+    path.write_bytes(b'old')
+    path.chmod(0o644)
+    monkeypatch.setattr(kpl_cli, 'DAEMON_KEY_PATH', str(path))
+    kpl_cli._save_daemon_key(b'k' * 32)
+    assert stat.S_IMODE(path.stat().st_mode) == 0o600
+    assert path.read_bytes() == b'k' * 32
+
+
+@posix_only
+def test_daemon_removes_key_on_sigterm(tmp_path):
+    path = tmp_path / "kpl_cli.key"
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    script = (f"import sys; sys.path.insert(0, {os.path.dirname(kpl_cli.__file__)!r}); import kpl_cli; "
+              f"kpl_cli.DAEMON_KEY_PATH = {str(path)!r}; kpl_cli.DAEMON_PORT = {port}; "
+              f"sys.exit(kpl_cli.cmd_daemon(None))")
+    process = subprocess.Popen([sys.executable, '-c', script], stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.time() + 10
+        while not path.exists() and time.time() < deadline:
+            time.sleep(0.05)
+        assert path.exists()
+        process.send_signal(signal.SIGTERM)
+        assert process.wait(timeout=10) == 0
+        assert not path.exists()
+    finally:
+        if process.poll() is None:
+            process.kill()
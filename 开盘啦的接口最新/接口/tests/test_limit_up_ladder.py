@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+from limit_up_ladder import BROKEN_KEY, LIMIT_UP_KEY, LimitUpLadder
+
+DAYS = {
+    '2024-03-04': (['A', 'B', 'C'], ['D']),
+    '2024-03-05': (['A', 'B', 'D'], ['C']),
+    '2024-03-06': (['A', 'E'], []),
+}
+
+
+def test_streaks_match_day_by_day_append(store):
+    ladder = LimitUpLadder(store)
+    for day, (limit_up, broken) in DAYS.items():
+        ladder.append_day(day, limit_up, broken)
+    incremental = ladder.streak.copy()
+    ladder.rebuild()
+    np.testing.assert_array_equal(ladder.streak, incremental)
+    assert dict(zip(ladder.codes, ladder.streak[-1].tolist())) == {'A': 3, 'B': 0, 'C': 0, 'D': 0, 'E': 1}
+
+
+def test_summary_rates(store):
+    ladder = LimitUpLadder(store)
+    for day, (limit_up, broken) in DAYS.items():
+        ladder.append_day(day, limit_up, broken)
+    summary = ladder.day_summary('2024-03-05')
+    assert summary['ladder'] == {1: 1, 2: 2}
+    # 前一日3只首板晋级2只
+    assert summary['promotion_rates'] == {1: 2 / 3}
+    assert summary['broken_rate'] == 0.25
+    assert ladder.day_summary('2024-03-06')['highest_stocks'] == ['A']
+
+
+def test_same_day_refresh_overwrites(store):
+    ladder = LimitUpLadder(store)
+    ladder.append_day('2024-03-04', ['A'])
+    ladder.append_day('2024-03-04', ['A', 'B'], ['A'])
+    assert ladder.dates == ['2024-03-04']
+    # 涨停与炸板互斥
+    assert ladder.limit_up[0].tolist() == [True, True] and not ladder.broken.any()
+
+
+def test_ingest_save_load(store):
+    for day, (limit_up, broken) in DAYS.items():
+        store.put_payload('HisDaBanList', day, {'list': [[code] for code in limit_up]}, key=LIMIT_UP_KEY)
+        store.put_payload('HisDaBanList', day, {'list': [[code] for code in broken]}, key=BROKEN_KEY)
+    ladder = LimitUpLadder(store)
+    assert ladder.ingest_from_store() == 3
+    assert ladder.ingest_from_store() == 0
+    ladder.save()
+    restored = LimitUpLadder(store)
+    assert restored.load()
+    np.testing.assert_array_equal(restored.streak, ladder.streak)
+
+
+def test_resaved_days_are_ingested_again(store):
+    store.put_payload('HisDaBanList', '2024-03-04', {'list': [['A']]}, key=LIMIT_UP_KEY)
+    store.put_payload('HisDaBanList', '2024-03-05', {'list': [['A']]}, key=LIMIT_UP_KEY)
+    ladder = LimitUpLadder(store)
+    assert ladder.ingest_from_store() == 2
+    # 收盘后重新保存最后一天，以及补拉更正前一天
+    store.put_payload('HisDaBanList', '2024-03-05', {'list': [['A'], ['B']]}, key=LIMIT_UP_KEY)
+    store.put_payload('HisDaBanList', '2024-03-04', {'list': [['A'], ['B']]}, key=LIMIT_UP_KEY)
+    assert ladder.ingest_from_store() == 2
+    assert dict(zip(ladder.codes, ladder.streak[-1].tolist())) == {'A': 2, 'B': 2}
+    assert ladder.ingest_from_store() == 0
+
+
+def test_skipped_trading_days_break_streaks(store):
+    ladder = LimitUpLadder(store)
+    ladder.append_day('2024-03-04', ['A'])
+    # 2024-03-05 缺数据
+    ladder.append_day('2024-03-06', ['A'])
+    assert ladder.dates == ['2024-03-04', '2024-03-05', '2024-03-06']
+    assert ladder.streak[:, 0].tolist() == [1, 0, 1]
+    # 周末不是交易日，不补行
+    ladder.append_day('2024-03-11', ['A'])
+    assert ladder.dates[-3:] == ['2024-03-07', '2024-03-08', '2024-03-11']
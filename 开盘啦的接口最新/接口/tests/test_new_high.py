@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+from datetime import date, timedelta
+
+import numpy as np
+
+from new_high import ENDPOINT, NewHighKernel, extreme_flags, sliding_max, sliding_min
+
+
+def brute_max(values, window):
+    return np.array([values[max(t - window + 1, 0):t + 1].max(axis=0) for t in range(len(values))])
+
+
+def test_sliding_extremes_match_brute_force():
+    rng = np.random.default_rng(0)
+    values = rng.normal(size=(257, 7))
+    for window in (1, 2, 5, 20, 60, 300):
+        assert np.array_equal(sliding_max(values, window), brute_max(values, window))
+        assert np.array_equal(sliding_min(values, window), -brute_max(-values, window))
+
+
+def test_single_suspension_keeps_new_highs():
+    rows = 400
+    high = np.arange(1, rows + 1, dtype=np.float64)[:, None]
+    high[300] = np.nan
+    flags = extreme_flags(high, high, 20, 'high')
+    assert flags[301:325].sum() == 24
+    flags = extreme_flags(high, high, 250, 'high')
+    assert flags[301:].sum() == rows - 301
+    # 上市不足 window 根K线的不算
+    assert not flags[:249].any() and flags[249]
+
+
+def kline_rows(days, highs):
+    return [[day, h - 1, h - 0.5, h, h - 2] for day, h in zip(days, highs) if not np.isnan(h)]
+
+
+def trading_days(n):
+    start = date(2023, 1, 2)
+    return [(start + timedelta(days=i)).isoformat() for i in range(n)]
+
+
+def test_incremental_update_matches_full_recompute(store):
+    rng = np.random.default_rng(1)
+    days = trading_days(120)
+    codes = ['600000', '000001', '801001']
+    series = {code: np.cumsum(rng.normal(size=len(days))) + 50 for code in codes}
+    series['000001'][60:63] = np.nan
+
+    for code in codes:
+        store.put_payload(ENDPOINT, days[99], {'list': kline_rows(days[:100], series[code][:100])}, key=code)
+    kernel = NewHighKernel(store, windows=(5, 20))
+    kernel.update()
+    kernel.new_extremes(days[99], 10)  # 不在 windows 里的窗口，update 后也要跟着刷新
+
+    for code in codes:
+        store.put_payload(ENDPOINT, days[119], {'list': kline_rows(days[95:], series[code][95:])}, key=code)
+    kernel.update()
+
+    full = NewHighKernel(store, windows=(5, 10, 20))
+    full.ingest_from_store()
+    full.compute()
+    assert ('high', 10) in kernel.flags
+    for key, flags in kernel.flags.items():
+        assert np.array_equal(flags, full.flags[key]), key
+    stocks, plates = kernel.new_extremes(days[119], 10)
+    assert set(stocks) | set(plates) <= set(codes)
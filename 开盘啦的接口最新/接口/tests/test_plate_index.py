@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+from plate_index import PlateMembershipIndex
+
+
+def build(store):
+    store.put_payload('GetConceptJXBKw23', '2024-03-04', {'list': [['801001', '算力'], ['801002', '机器人']]},
+                      key='600000')
+    store.put_payload('GetConceptJXBKw23', '2024-03-04', {'list': [['801001', '算力']]}, key='000001')
+    store.put_payload('GetConceptJXBKw23', '2024-03-04', {'list': [['801002', '机器人']]}, key='300001')
+    index = PlateMembershipIndex(store)
+    index.build()
+    return index
+
+
+def test_membership_both_directions(store):
+    index = build(store)
+    assert index.plates_of('600000', 'concept') == ['801001', '801002']
+    assert sorted(index.stocks_of('801001', 'concept')) == ['000001', '600000']
+    assert index.common_plates(['600000', '000001'], 'concept') == ['801001']
+
+
+def test_cluster_counts_duplicate_codes_once(store):
+    index = build(store)
+    result = index.cluster(['600000', '600000', '000001', '300001', '300001'], 'concept', min_count=1)
+    assert [(item['plate_id'], item['count'], sorted(item['stocks'])) for item in result] == [
+        ('801001', 2, ['000001', '600000']), ('801002', 2, ['300001', '600000'])]
+    assert index.cluster(['300001', '300001'], 'concept') == []
+
+
+def test_load_matches_build(store):
+    build(store)
+    index = PlateMembershipIndex(store)
+    assert index.load()
+    assert index.plates_of('600000', 'concept') == ['801001', '801002']
+    assert index.plate_names['801002'] == '机器人'
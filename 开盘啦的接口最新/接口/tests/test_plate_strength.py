@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+from market_snapshot import MarketSnapshot, code_numbers, limit_ratios
+from plate_index import PlateMembershipIndex
+from plate_strength import PlateStrengthEngine
+
+MEMBERS = {
+    '600000': ['801001'],
+    '600001': ['801001', '801002'],
+    '300001': ['801001', '801002'],
+    '000001': ['801002'],
+}
+
+
+def engine(store, min_members=1):
+    for code, plates in MEMBERS.items():
+        store.put_payload('GetStockIDPlate', '2024-03-04', {'list': [[p, f"板块{p}"] for p in plates]}, key=code)
+    index = PlateMembershipIndex(store)
+    index.build()
+    return PlateStrengthEngine(index, min_members=min_members)
+
+
+def snapshot():
+    rows = [
+        ['600000', '浦发银行', 0, 0, 0, 10.0, 10.0, 100.0],
+        ['600001', '邯郸钢铁', 0, 0, 0, 10.0, 2.0, 300.0],
+        ['300001', '特锐德', 0, 0, 0, 10.0, 20.0, 200.0],
+        ['000001', '平安银行', 0, 0, 0, 10.0, -1.0, 400.0],
+        ['000002', '万科A', 0, 0, 0, 10.0, 5.0, 500.0],
+    ]
+    return MarketSnapshot.from_rows(rows)
+
+
+def test_limit_ratios_by_board():
+    ratios = limit_ratios(['600000', '300001', '688001', '830001', '000001'], ['浦发银行', '特锐德', '中芯', '北交', '*ST平安'])
+    assert ratios.tolist() == [10.0, 20.0, 20.0, 30.0, 5.0]
+    assert code_numbers(['600000', 'abc']).tolist() == [600000, -1]
+
+
+def test_aggregate_matches_per_plate_loop(store):
+    strength = engine(store)
+    snap = snapshot()
+    aggregates = strength.aggregate(snap)
+    change = dict(zip(snap.codes.tolist(), snap['change_pct'].tolist()))
+    limit_up = dict(zip(snap.codes.tolist(), snap.is_limit_up().tolist()))
+    for p, plate in enumerate(strength.index.plates):
+        members = [code for code, plates in MEMBERS.items() if plate in plates]
+        assert aggregates['member_count'][p] == len(members)
+        assert np.isclose(aggregates['mean_change'][p], np.mean([change[c] for c in members]))
+        assert aggregates['limit_up_count'][p] == sum(limit_up[c] for c in members)
+        assert np.isclose(aggregates['breadth'][p], np.mean([change[c] > 0 for c in members]))
+
+
+def test_rank_and_vanes(store):
+    strength = engine(store)
+    snap = snapshot()
+    ranked = strength.rank(snap)
+    assert [item['plate_id'] for item in ranked] == ['801001', '801002']
+    assert ranked[0]['limit_up_count'] == 2
+    assert strength.vanes(snap, top=2) == {'801001': ['300001', '600000'], '801002': ['300001', '600001']}
+    assert engine(store, min_members=4).rank(snap) == []
+
+
+def test_limit_up_uses_rounded_limit_price():
+    rows = [
+        ['600000', '低价股', 0, 0, 0, 3.66, 9.91, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 3.33],
+        ['600001', '*ST低价', 0, 0, 0, 2.13, 4.93, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 2.03],
+        ['600002', '未涨停', 0, 0, 0, 3.65, 9.61, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 3.33],
+        ['300001', '无昨收', 0, 0, 0, 12.0, 20.0],
+    ]
+    assert MarketSnapshot.from_rows(rows).is_limit_up().tolist() == [True, True, False, True]
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+from plate_trend_feed import MinuteRing, PlateTrendFeed
+
+
+def rows(minutes):
+    return {'trend': [[f"{m // 100:02d}:{m % 100:02d}", float(m), 1.0, 2.0] for m in minutes]}
+
+
+def test_ring_wraps_in_time_order():
+    ring = MinuteRing(4, 1)
+    ring.append(np.arange(1, 4), np.arange(1, 4, dtype=float)[:, None])
+    ring.append(np.arange(4, 7), np.arange(4, 7, dtype=float)[:, None])
+    stamps, values = ring.snapshot()
+    assert stamps.tolist() == [3, 4, 5, 6] and values[:, 0].tolist() == [3, 4, 5, 6]
+    assert ring.snapshot(2)[0].tolist() == [5, 6]
+    assert ring.last_stamp == 6
+
+
+def test_only_new_minutes_are_appended():
+    feed = PlateTrendFeed(client=None)
+    assert feed.apply('801001', rows([930, 931, 932]), '2024-03-04') == 3
+    # 每次轮询返回全天数据，只追加新分钟，同一分钟重复时保留最后一条
+    payload = rows([930, 931, 932, 933, 933])
+    payload['trend'][-1][1] = 9999.0
+    assert feed.apply('801001', payload, '2024-03-04') == 1
+    stamps, values = feed.series('801001')
+    assert stamps.tolist() == [202403040930, 202403040931, 202403040932, 202403040933]
+    assert values[-1, 0] == 9999.0
+    # 跨日继续追加
+    assert feed.apply('801001', rows([930]), '2024-03-05') == 1
+    assert feed.stats['new_points'] == 5
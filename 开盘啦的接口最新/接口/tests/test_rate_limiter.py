@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+
+import rate_limiter
+from rate_limiter import RateLimiter
+
+
+def test_reservations_respect_rate_across_instances(tmp_path):
+    path = str(tmp_path / "buckets.db")
+    limits = {'hq': (10.0, 3)}
+    # 两个实例各开一个连接，相当于两个进程共用同一个桶文件
+    first = RateLimiter(path, host_limits=limits, endpoint_limits={})
+    second = RateLimiter(path, host_limits=limits, endpoint_limits={})
+
+    began = time.time()
+    starts = []
+    for i in range(30):
+        limiter = first if i % 2 else second
+        starts.append(time.time() + limiter.reserve('hq'))
+    starts.sort()
+    # 任意时刻前发出的请求数不超过 突发 + 速率 × 经过时间
+    for k, start in enumerate(starts, 1):
+        assert k <= 3 + (start - began + 0.001) * 10.0
+    assert starts[-1] - began >= (30 - 3) / 10.0 - 0.05
+    assert first.stats()['buckets']['host:hq']['acquires'] == 30
+
+
+def test_endpoint_bucket_is_stricter_than_host(tmp_path):
+    limiter = RateLimiter(str(tmp_path / "buckets.db"), host_limits={'hq': (100.0, 100)},
+                          endpoint_limits={'GetMainMonitor_w30': (2.0, 1)})
+    waits = [limiter.reserve('hq', 'GetMainMonitor_w30') for _ in range(3)]
+    assert waits[0] <= 0.0
+    assert waits[2] >= 0.9
+
+
+def test_default_paths_do_not_depend_on_cwd():
+    module_dir = os.path.dirname(os.path.abspath(rate_limiter.__file__))
+    assert rate_limiter.BUCKETS_PATH == os.path.join(module_dir, "data", "rate_limit.db")
+    assert rate_limiter.LIMITS_PATH == os.path.join(module_dir, "data", "rate_limits.json")
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+
+from reason_index import ReasonIndex, decode_postings, encode_postings
+
+
+@pytest.fixture
+def index(store, tmp_path):
+    index = ReasonIndex(str(tmp_path / "reason_index.db"), store=store)
+    yield index
+    index.close()
+
+
+def test_postings_round_trip():
+    ids = np.array([1, 2, 300, 70000, 70001], dtype=np.int64)
+    assert decode_postings(encode_postings(ids)).tolist() == ids.tolist()
+
+
+def test_same_day_refresh_is_indexed_again(store, index):
+    store.put_payload('GetPMSL_PMLD', '2024-03-04', {'list': [{'Code': '600000', 'Name': '浦发银行', 'Reason': '银行 高股息'}]})
+    assert index.ingest_from_store() == 1
+    assert index.ingest_from_store() == 0
+    store.put_payload('GetPMSL_PMLD', '2024-03-04', {'list': [{'Code': '600000', 'Name': '浦发银行', 'Reason': '银行 高股息'},
+                                                             {'Code': '000001', 'Name': '平安银行', 'Reason': '低空经济'}]})
+    assert index.ingest_from_store() == 1
+    assert [item['code'] for item in index.search('低空经济')] == ['000001']
+
+
+def test_plate_reasons_are_indexed(store, index):
+    store.put_payload('GetDayBaseFaceListZDEvnArt', '2024-03-04', {'list': [['2024-03-01', '算力租赁需求爆发']]},
+                      key='801218')
+    assert index.ingest_from_store() == 1
+    assert index.search('算力') == [{'day': '2024-03-01', 'code': '801218', 'name': '',
+                                     'source': 'plate_reason', 'text': '算力租赁需求爆发'}]
+
+
+def test_reworded_reason_replaces_the_old_document(store, index):
+    store.put_payload('GetPMSL_PMLD', '2024-03-04', {'list': [{'Code': '600000', 'Name': '浦发银行', 'Reason': '银行 高股息'}]})
+    index.ingest_from_store()
+    store.put_payload('GetPMSL_PMLD', '2024-03-04', {'list': [{'Code': '600000', 'Name': '浦发银行', 'Reason': '银行 中特估'}]})
+    index.ingest_from_store()
+    days, counts = index.frequency('银行')
+    assert days == ['2024-03-04'] and counts.tolist() == [1]
+    assert index.search('高股息') == []
+    assert index.compact() > 0
+    assert [item['text'] for item in index.search('银行')] == ['银行 中特估']
+    assert index.stats()['docs'] == 1
+
+
+def test_segments_are_compacted_automatically(index, monkeypatch):
+    import reason_index
+
+    monkeypatch.setattr(reason_index, 'MAX_SEGMENTS', 3)
+    for day in range(1, 6):
+        index.add_documents([(f'2024-03-0{day}', '600000', '浦发银行', '银行')], 'limit_up')
+    assert index.conn.execute("SELECT COUNT(DISTINCT segment) FROM postings").fetchone()[0] <= 3
+    assert len(index.search('银行')) == 5
+
+
+def test_timestamp_days_are_beijing_dates():
+    from reason_index import row_day
+
+    # 2024-03-04 16:30 UTC 是北京时间 3月5日 00:30
+    assert row_day(['1709569800', '算力']) == '2024-03-05'
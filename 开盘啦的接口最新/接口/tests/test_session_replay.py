@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+from kpl_client import ENDPOINTS, KPLClient
+from session_replay import RECORDED_ENDPOINTS
+
+
+def test_recorded_endpoints_are_realtime():
+    # 录制的是盘中实时数据，历史接口（apphis）需要 Day 参数，不应出现在录制列表里
+    for endpoint in RECORDED_ENDPOINTS:
+        assert ENDPOINTS[endpoint]['host'] == 'hq', endpoint
+
+
+def test_change_statistics_realtime_and_history_urls():
+    client = KPLClient()
+    realtime = client.build_url('ChangeStatistics')
+    history = client.build_url('HisChangeStatistics', Day='2023-11-13')
+    assert realtime.startswith('https://apphq.longhuvip.com/') and 'c=HomeDingPan' in realtime
+    assert history.startswith('https://apphis.longhuvip.com/') and 'c=HisHomeDingPan' in history
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+import time
+
+from sharded_sweep import SweepWorker, WorkQueue, merge_shards
+
+
+class FakeClient:
+    def fetch_json(self, endpoint, **params):
+        return {'params': params}
+
+
+def test_expired_leases_use_up_attempts(tmp_path):
+    queue = WorkQueue(str(tmp_path / "queue.db"), lease_seconds=0, max_attempts=2)
+    queue.add([('GetStockTrend', '2024-03-04', '600000')])
+    # 持有者每次都在执行中死掉，租约过期后被其他节点回收
+    assert queue.lease('a') == [('GetStockTrend', '2024-03-04', '600000')]
+    time.sleep(0.01)
+    assert len(queue.lease('b')) == 1
+    time.sleep(0.01)
+    assert queue.lease('c') == []
+    assert queue.counts() == {'failed': 1}
+    queue.close()
+
+
+def test_merge_only_new_shard_rows(tmp_path, store):
+    shard_dir = str(tmp_path / "shards")
+    worker = SweepWorker(FakeClient(), str(tmp_path / "queue.db"), shard_dir, worker_id='w1')
+    worker.queue.add([('GetStockTrend', '2024-03-04', '600000'), ('GetStockTrend', '2024-03-05', '600000')])
+    assert worker.run() == 2
+    assert store.get_payload('GetStockTrend', '2024-03-04', key='600000') is None
+    assert merge_shards(store, shard_dir) == 2
+    assert store.get_payload('GetStockTrend', '2024-03-04', key='600000') == {'params': {'Day': '20240304',
+                                                                                        'StockID': '600000'}}
+    assert merge_shards(store, shard_dir) == 0
+    worker.shard_store.put_payload('GetStockTrend', '2024-03-05', {'params': 'again'}, key='600000')
+    assert merge_shards(store, shard_dir) == 1
+    assert store.get_payload('GetStockTrend', '2024-03-05', key='600000') == {'params': 'again'}
+    worker.queue.close()
+    worker.shard_store.close()
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+import os
+import threading
+
+import numpy as np
+import pytest
+
+from shared_snapshot import SharedTablePublisher, SharedTableReader
+
+SCHEMA = {'value': np.int64, 'price': np.float64}
+
+
+@pytest.fixture
+def segment():
+    name = f"kpl_test_{os.getpid()}"
+    publisher = SharedTablePublisher(name, SCHEMA, capacity=64)
+    reader = SharedTableReader(name)
+    yield publisher, reader
+    reader.close()
+    publisher.close()
+
+
+def publish(publisher, version, rows):
+    return publisher.publish({'value': np.full(rows, version), 'price': np.arange(rows, dtype=np.float64)})
+
+
+def test_view_during_publish_keeps_row_count(segment):
+    publisher, reader = segment
+    for version, rows in ((1, 9), (2, 5), (3, 2)):
+        publish(publisher, version, rows)
+
+    # 模拟写入方正在写第4版（另一槽位）：begin 已推进、行数和数据已写入一半
+    publisher.header[0] = 4
+    publisher.columns['value'][0][:9] = 4
+    version, _, columns = reader.view()
+    assert version == 3
+    assert columns['value'].tolist() == [3, 3]
+    assert reader.valid(3)
+
+    # 第5版开始改写第3版所在槽位后，第3版不再有效
+    publisher.header[1] = 4
+    publisher.header[0] = 5
+    assert not reader.valid(3)
+
+
+def test_existing_segment_is_not_replaced(segment):
+    publisher, reader = segment
+    publish(publisher, 1, 3)
+    with pytest.raises(FileExistsError):
+        SharedTablePublisher(publisher.name, SCHEMA, capacity=64)
+    assert reader.read(lambda c: c['value'].tolist()) == [1, 1, 1]
+
+
+def test_concurrent_reads_are_consistent(segment):
+    publisher, reader = segment
+    publish(publisher, 1, 2)
+    stop = threading.Event()
+
+    def writer():
+        version = 1
+        while not stop.is_set():
+            version += 1
+            publish(publisher, version, version % 60 + 1)
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    try:
+        for _ in range(2000):
+            version, _, values = reader._read(lambda c: c['value'].copy(), retries=1000)
+            assert len(values) == version % 60 + 1
+            assert (values == version).all()
+    finally:
+        stop.set()
+        thread.join()
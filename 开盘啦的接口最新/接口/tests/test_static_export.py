@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+from limit_up_ladder import LIMIT_UP_KEY
+from static_export import LIMIT_UP_COLUMNS, StaticExporter
+
+DAY = '2024-03-04'
+
+
+def array_row(code, name, pct, plate_id, plate_name):
+    row = [''] * 14
+    for field, value in (('code', code), ('name', name), ('pct_chg', pct), ('plate_id', plate_id),
+                         ('plate_name', plate_name)):
+        row[LIMIT_UP_COLUMNS[field][0]] = value
+    return row
+
+
+def test_array_rows_are_grouped_by_plate(store, tmp_path):
+    rows = [array_row('600001', '甲', 10.01, '801001', '机器人'),
+            array_row('600002', '乙', 9.98, '801001', '机器人'),
+            array_row('300001', '丙', 20.0, '801002', '算力')]
+    store.put_payload('HisDaBanList', DAY, {'list': rows}, key=LIMIT_UP_KEY)
+    view = StaticExporter(store, output_dir=str(tmp_path)).limit_up_view(DAY)
+
+    assert view['total_count'] == 3
+    assert set(view['categories']) == {'机器人', '算力'}
+    robot = view['categories']['机器人']
+    assert robot['count'] == 2
+    assert robot['stocks'][0] == {'ts_code': '600001', 'name': '甲', 'plate_id': '801001', 'plate_name': '机器人',
+                                  'limit_times': 1, 'pct_chg': 10.01}
+
+
+def test_dict_rows_use_frontend_field_names(store, tmp_path):
+    rows = [{'Code': '600001', 'Name': '甲', 'PlateID': '801001', 'PlateName': '机器人',
+             'LimitTimes': '3', 'PctChg': '10.01'}]
+    store.put_payload('HisDaBanList', DAY, {'list': rows}, key=LIMIT_UP_KEY)
+    stock = StaticExporter(store, output_dir=str(tmp_path)).limit_up_view(DAY)['categories']['机器人']['stocks'][0]
+    assert stock['limit_times'] == 3 and stock['pct_chg'] == 10.01 and stock['plate_id'] == '801001'
+
+
+def test_superseded_files_outlive_the_grace_period(store, tmp_path):
+    import os
+    from datetime import datetime, timedelta
+
+    exporter = StaticExporter(store, output_dir=str(tmp_path))
+    store.put_payload('HisDaBanList', DAY, {'list': [array_row('600001', '甲', 10.01, '801001', '机器人')]},
+                      key=LIMIT_UP_KEY)
+    exporter.export()
+    old = exporter.load_manifest()['dates'][DAY]['files']['limit_up']['path']
+    store.put_payload('HisDaBanList', DAY, {'list': [array_row('600002', '乙', 9.98, '801001', '机器人')]},
+                      key=LIMIT_UP_KEY)
+    exporter.export()
+    manifest = exporter.load_manifest()
+    # 被取代的文件仍在，记入 superseded
+    assert os.path.exists(os.path.join(str(tmp_path), old)) and old in manifest['superseded']
+    assert exporter.prune(manifest, now=datetime.now() + timedelta(days=3)) > 0
+    assert not os.path.exists(os.path.join(str(tmp_path), old)) and manifest['superseded'] == {}
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+import logging
+
+import pytest
+
+from trading_calendar import TradingCalendar
+
+
+@pytest.fixture
+def calendar():
+    return TradingCalendar(cache_path=None)
+
+
+def test_2026_holidays_are_closed(calendar):
+    for day in ('2026-01-02', '2026-02-17', '2026-02-23', '2026-04-06', '2026-05-05', '2026-06-19',
+                '2026-09-25', '2026-10-01', '2026-10-07'):
+        assert not calendar.is_trading_day(day), day
+    assert calendar.is_trading_day('2026-02-24')
+    assert calendar.next_trading_day('2026-09-30') == '2026-10-08'
+    assert calendar.previous_trading_day('2026-02-24') == '2026-02-13'
+
+
+def test_range_lookups_across_new_year(calendar):
+    days = calendar.trading_days_between('2025-12-25', '2026-01-09')
+    assert days == ['2025-12-25', '2025-12-26', '2025-12-29', '2025-12-30', '2025-12-31',
+                    '2026-01-05', '2026-01-06', '2026-01-07', '2026-01-08', '2026-01-09']
+    assert calendar.count_between('2025-12-25', '2026-01-09') == len(days)
+    assert calendar.session_window('2026-01-05', 3) == ['2025-12-30', '2025-12-31', '2026-01-05']
+
+
+def test_outside_coverage_warns_and_planners_refuse(calendar, caplog):
+    with caplog.at_level(logging.WARNING):
+        calendar.is_trading_day('2027-02-10')
+        calendar.is_trading_day('2027-02-11')
+    assert len([r for r in caplog.records if '超出交易日历已确认范围' in r.message]) == 1
+    calendar.require_known('2026-12-31')
+    with pytest.raises(ValueError):
+        calendar.require_known('2027-01-04')
+
+
+def test_stale_cache_is_extended_by_snapshot(tmp_path):
+    cache = tmp_path / "trading_calendar.json"
+    cache.write_text('{"days": ["2025-11-27", "2025-11-28"], "known_end": "2025-11-30"}', encoding='utf-8')
+    calendar = TradingCalendar(cache_path=str(cache))
+    assert calendar.is_known('2026-10-01')
+    assert not calendar.is_trading_day('2026-10-01')
+    assert calendar.is_trading_day('2025-11-28')
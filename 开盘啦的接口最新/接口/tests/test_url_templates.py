@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+from url_templates import URLTemplateIndex, normalize_url, segment_shape
+
+BASE = "https://apphis.longhuvip.com/w1/api/index.php"
+
+
+def test_normalize_and_shape():
+    assert normalize_url("HTTPS://Example.com:443/a//b?x=1&y=") == ('https', 'example.com', ['a', 'b'],
+                                                                   [('x', '1'), ('y', '')])
+    assert segment_shape('stock_600000.html') == 'stock_{n}.html'
+    assert segment_shape('0123456789abcdef0123') == '{hash}'
+
+
+def test_urls_differing_in_params_share_a_template():
+    index = URLTemplateIndex()
+    assert index.add(f"{BASE}?a=GetStockTrend&c=Stock&StockID=600000", kind='api')
+    for code in ('000001', '300001'):
+        assert not index.add(f"{BASE}?a=GetStockTrend&c=Stock&StockID={code}")
+    # 路由参数 a 不同视为不同接口
+    assert index.add(f"{BASE}?a=GetStockBid&c=Stock&StockID=600000")
+    templates = index.templates()
+    assert templates[0]['template'] == f"{BASE}?StockID={{StockID}}&a=GetStockTrend&c=Stock"
+    assert templates[0]['count'] == 3 and templates[0]['kind'] == 'api'
+    assert templates[0]['params']['StockID']['samples'] == ['600000', '000001', '300001']
+    assert len(templates) == 2
+
+
+def test_wide_path_levels_collapse_to_wildcard():
+    index = URLTemplateIndex(max_fanout=3)
+    for name in ('alpha', 'beta', 'gamma', 'delta', 'epsilon'):
+        index.add(f"https://example.com/news/{name}/index.html")
+    templates = index.templates()
+    assert [item['template'] for item in templates] == ["https://example.com/news/{*}/index.html"]
+    assert templates[0]['count'] == 5
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地交易日历
+功能：以有序整数数组(yyyymmdd)保存沪深交易日，提供前后交易日、区间交易日数、
+      交易时段窗口等 O(log n) 二分查询；离线时使用随代码附带的休市快照，
+      联网时可从深交所交易日历接口刷新并缓存到本地；
+      超出已确认范围的日期按工作日外推，查询时告警一次，要据此发请求的调用方用 require_known 拒绝
+"""
+
+import bisect
+import json
+import logging
+import os
+import time
+from array import array
+from datetime import date, datetime, timedelta, timezone
+
+from local_store import normalize_day
+
+# 随代码附带的休市快照
+SNAPSHOT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "trading_calendar_snapshot.json")
+# 深交所交易日历接口，jybz=1 表示交易日
+SZSE_CALENDAR_URL = "https://www.szse.cn/api/report/exchange/onepersistenthour/monthList?month={month}"
+# 交易所所在时区：北京时间固定 UTC+8，没有夏令时，不依赖 tzdata
+MARKET_TZ = timezone(timedelta(hours=8), 'Asia/Shanghai')
+
+
+def market_time(timestamp=None):
+    """时间戳（默认当前时刻）对应的北京时间，分钟网格和交易日都按它换算，与运行机器的时区无关"""
+    return datetime.fromtimestamp(time.time() if timestamp is None else timestamp, MARKET_TZ)
+
+
+def _to_int(day):
+    return int(normalize_day(day).replace('-', ''))
+
+
+def _to_text(value):
+    text = str(value)
+    return f"{text[:4]}-{text[4:6]}-{text[6:]}"
+
+
+def _weekdays(start, end):
+    current = datetime.strptime(start, '%Y-%m-%d').date()
+    last = datetime.strptime(end, '%Y-%m-%d').date()
+    while current <= last:
+        if current.weekday() < 5:
+            yield current.isoformat()
+        current += timedelta(days=1)
+
+
+class TradingCalendar:
+    def __init__(self, cache_path=os.path.join("data", "trading_calendar.json"), horizon_days=366):
+        self.cache_path = cache_path
+        self.horizon_days = horizon_days  # 已知范围之后按工作日外推的天数
+        self.logger = logging.getLogger(__name__)
+        self.days = array('i')
+        self.known_end = 0  # 已确认（快照或刷新）的最后日期，之后的日期为工作日外推
+        self._warned = False
+        self.load()
+
+    def load(self):
+        """优先读取本地缓存，其次读取附带快照；缓存的确认范围早于快照时，之后的部分用快照补齐"""
+        with open(SNAPSHOT_PATH, 'r', encoding='utf-8') as f:
+            snapshot = json.load(f)
+        holidays = set(snapshot['holidays'])
+        days = [day for day in _weekdays(snapshot['start'], snapshot['end']) if day not in holidays]
+        known_end = snapshot['end']
+
+        if self.cache_path and os.path.exists(self.cache_path):
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+            if cached['known_end'] >= known_end:
+                days, known_end = cached['days'], cached['known_end']
+            else:
+                days = list(cached['days']) + [day for day in days if day > cached['known_end']]
+        self._set_days(days, known_end)
+
+    def _set_days(self, days, known_end):
+        """设置已确认交易日，并按工作日外推 horizon_days 天"""
+        horizon_start = max(datetime.strptime(known_end, '%Y-%m-%d').date(), date.today())
+        horizon_end = (horizon_start + timedelta(days=self.horizon_days)).isoformat()
+        next_day = (datetime.strptime(known_end, '%Y-%m-%d').date() + timedelta(days=1)).isoformat()
+        extended = list(days) + list(_weekdays(next_day, horizon_end))
+        self.days = array('i', sorted({_to_int(day) for day in extended}))
+        self.known_end = _to_int(known_end)
+
+    def save(self):
+        """把已确认的交易日写入本地缓存"""
+        directory = os.path.dirname(self.cache_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        known = [_to_text(day) for day in self.days if day <= self.known_end]
+        tmp_path = self.cache_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'days': known, 'known_end': _to_text(self.known_end)}, f)
+        os.replace(tmp_path, self.cache_path)
+
+    def refresh(self, months=None, timeout=10):
+        """从深交所接口刷新交易日，默认补齐已确认范围之后到当月的所有月份，失败时保留原日历"""
+        import requests
+
+        today = date.today()
+        year, month = today.year, today.month
+        if months is None:
+            known_year, known_month = divmod(self.known_end // 100, 100)
+            months = min(max((year - known_year) * 12 + month - known_month, 1), 24)
+        month_starts = []
+        for _ in range(months):
+            month_starts.append(f"{year:04d}-{month:02d}")
+            year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+
+        confirmed = {}
+        for month_text in month_starts:
+            try:
+                response = requests.get(SZSE_CALENDAR_URL.format(month=month_text), timeout=timeout)
+                entries = response.json().get('data') or []
+            except Exception as e:
+                self.logger.warning(f"交易日历刷新失败 {month_text}: {str(e)}")
+                return False
+            for entry in entries:
+                confirmed[entry['jyrq']] = str(entry.get('jybz')) == '1'
+
+        if not confirmed:
+            return False
+        first, last = min(confirmed), max(confirmed)
+        keep = [_to_text(day) for day in self.days if day < _to_int(first) or _to_int(last) < day <= self.known_end]
+        days = keep + [day for day, is_open in confirmed.items() if is_open]
+        self._set_days(days, max(last, _to_text(self.known_end)))
+        self.save()
+        self.logger.info(f"交易日历已刷新至 {last}")
+        return True
+
+    def is_known(self, day):
+        """日期是否在已确认的范围内（否则为工作日外推）"""
+        return _to_int(day) <= self.known_end
+
+    def _check_known(self, value):
+        """查询超出已确认范围时告警一次：节假日未知，工作日都被当作交易日"""
+        if value > self.known_end and not self._warned:
+            self._warned = True
+            self.logger.warning(f"{_to_text(value)} 超出交易日历已确认范围（至 {_to_text(self.known_end)}），"
+                                f"按工作日外推，节假日会被当作交易日；请联网刷新或更新休市快照")
+
+    def require_known(self, day):
+        """据日历发请求前调用：日期超出已确认范围时抛出 ValueError，避免向休市日发请求"""
+        if not self.is_known(day):
+            raise ValueError(f"{normalize_day(day)} 超出交易日历已确认范围（至 {_to_text(self.known_end)}），"
+                             f"请先运行 trading_calendar.py 联网刷新")
+
+    def is_trading_day(self, day):
+        value = _to_int(day)
+        self._check_known(value)
+        i = bisect.bisect_left(self.days, value)
+        return i < len(self.days) and self.days[i] == value
+
+    def day_index(self, day):
+        """交易日序号：不晚于该日的交易日个数减一"""
+        return bisect.bisect_right(self.days, _to_int(day)) - 1
+
+    def next_trading_day(self, day, n=1):
+        """之后第n个交易日（不含当天）"""
+        i = bisect.bisect_right(self.days, _to_int(day)) + n - 1
+        if i < len(self.days):
+            self._check_known(self.days[i])
+        if i >= len(self.days):
+            raise ValueError(f"{normalize_day(day)} 之后第{n}个交易日超出日历范围")
+        return _to_text(self.days[i])
+
+    def previous_trading_day(self, day, n=1):
+        """之前第n个交易日（不含当天）"""
+        i = bisect.bisect_left(self.days, _to_int(day)) - n
+        if i < 0:
+            raise ValueError(f"{normalize_day(day)} 之前第{n}个交易日超出日历范围")
+        return _to_text(self.days[i])
+
+    def latest_trading_day(self, day=None):
+        """不晚于该日的最近交易日"""
+        i = self.day_index(day or date.today())
+        if i < 0:
+            raise ValueError("日期早于日历范围")
+        return _to_text(self.days[i])
+
+    def trading_days_between(self, start, end):
+        """区间内的交易日（含首尾）"""
+        lo = bisect.bisect_left(self.days, _to_int(start))
+        hi = bisect.bisect_right(self.days, _to_int(end))
+        self._check_known(_to_int(end))
+        return [_to_text(day) for day in self.days[lo:hi]]
+
+    def count_between(self, start, end):
+        """区间内的交易日数（含首尾）"""
+        return max(bisect.bisect_right(self.days, _to_int(end)) - bisect.bisect_left(self.days, _to_int(start)), 0)
+
+    def session_window(self, day, n):
+        """截至该日（含）的最近n个交易日"""
+        hi = bisect.bisect_right(self.days, _to_int(day))
+        return [_to_text(value) for value in self.days[max(hi - n, 0):hi]]
+
+
+_default_calendar = None
+
+
+def default_calendar():
+    """进程内共享的交易日历"""
+    global _default_calendar
+    if _default_calendar is None:
+        _default_calendar = TradingCalendar()
+    return _default_calendar
+
+
+def main():
+    """主函数：刷新日历并打印近期交易日"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    calendar = default_calendar()
+    calendar.refresh()
+    today = date.today().isoformat()
+    print(f"\n📅 今天 {today} {'是' if calendar.is_trading_day(today) else '不是'}交易日")
+    print(f"   上一交易日: {calendar.previous_trading_day(today)}")
+    print(f"   下一交易日: {calendar.next_trading_day(today)}")
+    print(f"   最近5个交易日: {', '.join(calendar.session_window(today, 5))}")
+    if not calendar.is_known(today):
+        print("   ⚠️ 今天超出已确认范围，按工作日外推，建议联网刷新")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+URL模板归纳
+功能：把页面中大量只差代码/日期等参数的URL规范化后插入 域名 -> 路径段 的前缀树，
+      叶子按查询参数名集合分组；含长数字串的路径段按形状归一，分叉过多的路径段合并为通配，
+      输出带出现次数和样例取值的参数化模板，插入为线性时间
+"""
+
+import re
+from urllib.parse import parse_qsl, urlsplit
+
+# 决定接口身份的查询参数，取值不同视为不同模板（如开盘啦的 a=方法名、c=控制器）
+ROUTING_KEYS = ('a', 'c', 'act', 'action', 'method', 'm')
+
+WILDCARD = '{*}'
+DIGITS = re.compile(r'\d{4,}')
+HASH = re.compile(r'^[0-9a-fA-F]{16,}$')
+JS_EXPRESSION = re.compile(r'\$\{[^}]*\}')
+
+
+def normalize_url(url):
+    """规范化URL，返回 (协议, 域名, 路径段列表, 查询参数列表)"""
+    parts = urlsplit(url.strip())
+    scheme = (parts.scheme or 'http').lower()
+    host = parts.netloc.lower()
+    if (scheme, host[-3:]) == ('http', ':80') or (scheme, host[-4:]) == ('https', ':443'):
+        host = host.rsplit(':', 1)[0]
+    segments = [segment for segment in parts.path.split('/') if segment]
+    pairs = parse_qsl(parts.query, keep_blank_values=True)
+    return scheme, host, segments, pairs
+
+
+def segment_shape(segment):
+    """路径段的形状：长数字串归一为 {n}，长十六进制串为 {hash}，JS模板表达式为 {expr}"""
+    if HASH.match(segment) and not segment.isdigit():
+        return '{hash}'
+    segment = JS_EXPRESSION.sub('{expr}', segment)
+    return DIGITS.sub('{n}', segment)
+
+
+class _ValueStats:
+    __slots__ = ('values', 'samples', 'overflow')
+
+    def __init__(self):
+        self.values = set()
+        self.samples = []
+        self.overflow = False
+
+    def add(self, value, max_distinct, max_samples):
+        if value in self.values:
+            return
+        if len(self.values) >= max_distinct:
+            self.overflow = True
+            return
+        self.values.add(value)
+        if len(self.samples) < max_samples:
+            self.samples.append(value)
+
+    def merge(self, other, max_distinct, max_samples):
+        for value in other.samples + list(other.values):
+            self.add(value, max_distinct, max_samples)
+        self.overflow = self.overflow or other.overflow
+
+    def describe(self):
+        return {'distinct': len(self.values), 'more': self.overflow, 'samples': self.samples}
+
+
+class _Cluster:
+    __slots__ = ('count', 'params', 'sample_urls', 'info')
+
+    def __init__(self, info):
+        self.count = 0
+        self.params = {}
+        self.sample_urls = []
+        self.info = info
+
+
+class _Node:
+    __slots__ = ('children', 'clusters', 'segment_values')
+
+    def __init__(self):
+        self.children = {}
+        self.clusters = {}
+        self.segment_values = _ValueStats()
+
+
+class URLTemplateIndex:
+    def __init__(self, max_fanout=8, max_samples=3, max_distinct=64, routing_keys=ROUTING_KEYS):
+        self.max_fanout = max_fanout
+        self.max_samples = max_samples
+        self.max_distinct = max_distinct
+        self.routing_keys = set(routing_keys)
+        self.root = _Node()
+        self.total = 0
+
+    def _child(self, node, key):
+        child = node.children.get(key)
+        if child is None:
+            # 已合并为通配的层级，新出现的取值直接进入通配
+            child = node.children.get(WILDCARD)
+            if child is None:
+                child = node.children[key] = _Node()
+        return child
+
+    def add(self, url, **info):
+        """加入一个URL，info 为首次出现时记录的附加信息（类型、用途等）；返回是否为新模板"""
+        scheme, host, segments, pairs = normalize_url(url)
+        node = self._child(self.root, f"{scheme}://{host}")
+        for segment in segments:
+            node = self._child(node, segment_shape(segment))
+            node.segment_values.add(segment, self.max_distinct, self.max_samples)
+
+        keys = tuple(sorted({key for key, _ in pairs}))
+        routing = tuple(sorted((key, value) for key, value in pairs if key in self.routing_keys))
+        signature = (keys, routing)
+        cluster = node.clusters.get(signature)
+        is_new = cluster is None
+        if is_new:
+            cluster = node.clusters[signature] = _Cluster(info)
+        cluster.count += 1
+        for key, value in pairs:
+            stats = cluster.params.get(key)
+            if stats is None:
+                stats = cluster.params[key] = _ValueStats()
+            stats.add(value, self.max_distinct, self.max_samples)
+        if len(cluster.sample_urls) < self.max_samples:
+            cluster.sample_urls.append(url)
+        self.total += 1
+        return is_new
+
+    def _merge(self, target, source):
+        target.segment_values.merge(source.segment_values, self.max_distinct, self.max_samples)
+        for signature, cluster in source.clusters.items():
+            existing = target.clusters.get(signature)
+            if existing is None:
+                target.clusters[signature] = cluster
+                continue
+            existing.count += cluster.count
+            for key, stats in cluster.params.items():
+                if key in existing.params:
+                    existing.params[key].merge(stats, self.max_distinct, self.max_samples)
+                else:
+                    existing.params[key] = stats
+            existing.sample_urls.extend(cluster.sample_urls[:self.max_samples - len(existing.sample_urls)])
+        for key, child in source.children.items():
+            if key in target.children:
+                self._merge(target.children[key], child)
+            else:
+                target.children[key] = child
+
+    def _collapse(self, node):
+        """自底向上把分叉超过 max_fanout 的层级合并为通配"""
+        for child in node.children.values():
+            self._collapse(child)
+        if len(node.children) > self.max_fanout:
+            merged = _Node()
+            for child in node.children.values():
+                self._merge(merged, child)
+            node.children = {WILDCARD: merged}
+            self._collapse(merged)
+
+    def templates(self, min_count=1):
+        """归纳出的模板列表，按出现次数降序"""
+        for host_node in self.root.children.values():
+            self._collapse(host_node)
+
+        results = []
+        stack = [(node, origin, []) for origin, node in self.root.children.items()]
+        while stack:
+            node, origin, path = stack.pop()
+            for (keys, _), cluster in node.clusters.items():
+                if cluster.count < min_count:
+                    continue
+                query = []
+                for key in keys:
+                    stats = cluster.params[key]
+                    if len(stats.values) == 1 and not stats.overflow:
+                        query.append(f"{key}={stats.samples[0]}")
+                    else:
+                        query.append(f"{key}={{{key}}}")
+                template = origin + '/' + '/'.join(segment for segment, _ in path)
+                if query:
+                    template += '?' + '&'.join(query)
+                results.append(dict(cluster.info, **{
+                    'template': template,
+                    'count': cluster.count,
+                    'params': {key: cluster.params[key].describe() for key in keys
+                               if len(cluster.params[key].values) > 1 or cluster.params[key].overflow},
+                    'path_values': {f"{i}:{segment}": stats.describe() for i, (segment, stats) in enumerate(path)
+                                    if len(stats.values) > 1 or stats.overflow},
+                    'sample_urls': cluster.sample_urls,
+                }))
+            for segment, child in node.children.items():
+                stack.append((child, origin, path + [(segment, child.segment_values)]))
+        results.sort(key=lambda item: (-item['count'], item['template']))
+        return results